@@ -0,0 +1,423 @@
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from typing import Optional
+from liouss_python_oracle_cli import bulk_load
+from liouss_python_oracle_cli import oracle_cli
+from liouss_python_oracle_cli import task_metrics
+from liouss_python_oracle_cli.scheduler import TaskScheduler
+from liouss_python_oracle_cli.session_pool import SessionPool
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+STAND_IN_TYPE = "standin"
+# SELECT ... FROM SYNTHETIC_<rows>_<columns>_<width>: rows generated on the fly instead of read from SQLite
+SYNTHETIC_TABLE = re.compile(r"\bSYNTHETIC_(\d+)_(\d+)_(\d+)\b", re.IGNORECASE)
+# Positional binds: like Oracle, each occurrence takes the next value
+_BIND = re.compile(r":(\d+)")
+_STRING_POOL_SIZE = 1024
+
+class StandInDB:
+    """Raw connection side of the stand-in: cursors, commit, rollback, ping and cancel over a SQLite file.
+    Every round trip waits latency seconds plus rows / rows_per_second, and is recorded in calls as (kind, start, end)."""
+
+    def __init__(self, path:str, latency:float=0.0, rows_per_second:Optional[float]=None) -> None:
+        self.sqlite = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        self.sqlite.execute("CREATE TABLE IF NOT EXISTS dual (dummy TEXT)")
+        self.latency = latency
+        self.rows_per_second = rows_per_second
+        self.calls = []
+        self.closed = False
+
+    @contextlib.contextmanager
+    def round_trip(self, kind:str, rows:int=0):
+        start = time.perf_counter()
+        delay = self.latency + (rows / self.rows_per_second if self.rows_per_second else 0)
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            yield
+        finally:
+            self.calls.append((kind, start, time.perf_counter()))
+
+    def cursor(self) -> "StandInCursor":
+        return StandInCursor(self)
+
+    def commit(self) -> None:
+        with self.round_trip("commit"):
+            self.sqlite.commit()
+
+    def rollback(self) -> None:
+        with self.round_trip("rollback"):
+            self.sqlite.rollback()
+
+    def ping(self) -> None:
+        if self.closed:
+            raise sqlite3.ProgrammingError("connection is closed")
+        with self.round_trip("ping"):
+            pass
+
+    def cancel(self) -> None:
+        self.sqlite.interrupt()
+
+    def close(self) -> None:
+        self.closed = True
+        self.sqlite.close()
+
+class _BatchError:
+    def __init__(self, offset:int, message:str) -> None:
+        self.offset = offset
+        self.message = message
+
+def synthetic_description(columns:int, width:int) -> list:
+    description = [("ID", "DB_TYPE_NUMBER", 22, None, 18, 0, False)]
+    for i in range(1, columns):
+        if i % 2:
+            description.append((f"C{i}", "DB_TYPE_VARCHAR", width, width, None, None, True))
+        else:
+            description.append((f"C{i}", "DB_TYPE_NUMBER", 22, None, 38, 4, True))
+    return description
+
+def synthetic_rows(rows:int, columns:int, width:int):
+    strings = [f"{i:0{width}d}"[-width:] for i in range(_STRING_POOL_SIZE)]
+    for n in range(rows):
+        row = [n]
+        for i in range(1, columns):
+            row.append(strings[(n + i) % _STRING_POOL_SIZE] if i % 2 else n * 0.25 + i)
+        yield tuple(row)
+
+class StandInCursor:
+    def __init__(self, db:StandInDB) -> None:
+        self.db = db
+        self.arraysize = 100
+        self.description = None
+        self._cursor = db.sqlite.cursor()
+        self._rows = None
+        self._errors = []
+        # Rows changed by the last statement, or fetched so far for a query, like the Oracle cursor attribute
+        self.rowcount = 0
+
+    def execute(self, sql:str, params=None) -> None:
+        with self.db.round_trip("execute"):
+            self._execute(sql, params)
+
+    def _execute(self, sql:str, params) -> None:
+        self._rows = None
+        self.description = None
+        self.rowcount = 0
+        keyword = sql.strip().rstrip(";").upper()
+        if keyword in ("COMMIT", "ROLLBACK"):
+            getattr(self.db.sqlite, keyword.lower())()
+            return
+        synthetic = SYNTHETIC_TABLE.search(sql)
+        if synthetic:
+            rows, columns, width = (int(v) for v in synthetic.groups())
+            self.description = synthetic_description(columns, width)
+            self._rows = synthetic_rows(rows, columns, width)
+            return
+        if "V$SESSION" in sql.upper():
+            self.description = [("SID",), ("SERIAL#",)]
+            self._rows = iter([(id(self.db) % 100000, 1)])
+            return
+        if "ALL_TAB_COLUMNS" in sql.upper():
+            self.description = [(name,) for name in ("COLUMN_NAME", "DATA_TYPE", "DATA_LENGTH", "DATA_PRECISION", "DATA_SCALE", "CHAR_LENGTH")]
+            self._rows = iter(self._table_columns(params[0]))
+            return
+        self._cursor.execute(_BIND.sub("?", sql), list(params or []))
+        if self._cursor.description is not None:
+            self.description = [(col[0], None, None, None, None, None, True) for col in self._cursor.description]
+        else:
+            self.rowcount = max(self._cursor.rowcount, 0)
+
+    def _table_columns(self, table:str) -> list:
+        columns = []
+        for _, name, declared, *_ in self.db.sqlite.execute(f"PRAGMA table_info({table})").fetchall():
+            declared = declared.upper()
+            if "INT" in declared:
+                columns.append((name.upper(), "NUMBER", 22, 38, 0, None))
+            elif "REAL" in declared or "NUM" in declared:
+                columns.append((name.upper(), "NUMBER", 22, None, None, None))
+            else:
+                columns.append((name.upper(), "VARCHAR2", 4000, None, None, 4000))
+        return columns
+
+    def _fetch(self, size:Optional[int]) -> list:
+        if self._rows is not None:
+            rows = list(self._rows if size is None else itertools.islice(self._rows, size))
+        else:
+            rows = self._cursor.fetchall() if size is None else self._cursor.fetchmany(size)
+        self.rowcount += len(rows)
+        return rows
+
+    def fetchmany(self, size:Optional[int]=None) -> list:
+        rows = self._fetch(size or self.arraysize)
+        with self.db.round_trip("fetch", len(rows)):
+            return rows
+
+    def fetchall(self) -> list:
+        rows = self._fetch(None)
+        with self.db.round_trip("fetch", len(rows)):
+            return rows
+
+    def fetchone(self):
+        rows = self._fetch(1)
+        return rows[0] if rows else None
+
+    def setinputsizes(self, *sizes) -> None:
+        pass
+
+    def executemany(self, sql:str, rows:list, batcherrors:bool=False) -> None:
+        sql = _BIND.sub("?", sql)
+        self._errors = []
+        self.rowcount = 0
+        with self.db.round_trip("executemany", len(rows)):
+            if not batcherrors:
+                self._cursor.executemany(sql, rows)
+                self.rowcount = max(self._cursor.rowcount, 0)
+                return
+            # Oracle keeps the rows that succeeded and reports the others
+            self._cursor.execute("SAVEPOINT batch")
+            try:
+                self._cursor.executemany(sql, rows)
+                self.rowcount = max(self._cursor.rowcount, 0)
+            except sqlite3.Error:
+                self._cursor.execute("ROLLBACK TO batch")
+                for offset, row in enumerate(rows):
+                    try:
+                        self._cursor.execute(sql, row)
+                        self.rowcount += max(self._cursor.rowcount, 0)
+                    except sqlite3.Error as e:
+                        self._errors.append(_BatchError(offset, str(e)))
+            self._cursor.execute("RELEASE batch")
+
+    def getbatcherrors(self) -> list:
+        return self._errors
+
+    def close(self) -> None:
+        self._cursor.close()
+
+class StandInConnection:
+    """Local stand-in for SQLConnection, backed by SQLite and synthetic tables, for benchmarks without an Oracle instance.
+    Only the surface used by the CLI is implemented: query_one, query_many, get_db and the context manager."""
+    # Connections opened while run_scenario measures client_gaps, None otherwise so that nothing else keeps them alive
+    instances:Optional[list] = None
+
+    def __init__(self, path:str, latency:float=0.0, rows_per_second:Optional[float]=None) -> None:
+        self.db = StandInDB(path, latency, rows_per_second)
+        if StandInConnection.instances is not None:
+            StandInConnection.instances.append(self)
+
+    def get_db(self) -> StandInDB:
+        return self.db
+
+    def query_one(self, query:str, placeholders=None, print_error:bool=True, ignore_errors:bool=True, include_col_name:bool=False):
+        cursor = self.db.cursor()
+        try:
+            cursor.execute(query, placeholders)
+            if cursor.description is None:
+                return None
+            rows = cursor.fetchall()
+            return [tuple(col[0] for col in cursor.description)] + rows if include_col_name else rows
+        except Exception as e:
+            if not ignore_errors:
+                raise
+            if print_error:
+                print(e)
+            return None
+        finally:
+            cursor.close()
+
+    def query_many(self, query:str, rows:list, ignore_errors:bool=True, print_error:bool=True) -> None:
+        cursor = self.db.cursor()
+        try:
+            cursor.executemany(query, rows)
+        except Exception as e:
+            if not ignore_errors:
+                raise
+            if print_error:
+                print(e)
+        finally:
+            cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.close()
+
+oracle_cli.register_connection_type(STAND_IN_TYPE, lambda identifiers: StandInConnection(**identifiers))
+
+def write_csv(path:str, rows:int, columns:int) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, **bulk_load.CSV_DIALECT)
+        writer.writerow([f"C{i}" for i in range(columns)])
+        for start in range(0, rows, 100000):
+            writer.writerows((n, *(f"value {n % 997}" if i % 2 else n % 10007 for i in range(1, columns))) for n in range(start, min(start + 100000, rows)))
+
+def build_script(statements:int) -> str:
+    queries = []
+    for n in range(statements):
+        step = n % 4
+        if step == 0:
+            queries.append(f"INSERT INTO bench_script (id, v) VALUES ({n}, 'value {n}')")
+        elif step == 1:
+            queries.append(f"UPDATE bench_script SET v = 'updated' WHERE id = {n - 1}")
+        elif step == 2:
+            queries.append(f"SELECT COUNT(*) FROM bench_script WHERE id < {n}")
+        else:
+            queries.append(f"SELECT id, v FROM bench_script WHERE id = {n - 3}")
+    queries.append("COMMIT")
+    return ";\n".join(queries) + ";\n"
+
+SCENARIOS = {
+    "export_narrow": {"path": "export", "rows": 1_000_000, "columns": 3, "width": 10},
+    "export_wide": {"path": "export", "rows": 200_000, "columns": 60, "width": 20},
+    "load_csv": {"path": "load", "rows": 10_000_000, "columns": 5, "fast": False},
+    "load_csv_fast": {"path": "load", "rows": 10_000_000, "columns": 5, "fast": True},
+    "script": {"path": "script", "statements": 1000},
+}
+
+def percentile(values:list, p:float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def client_gaps() -> list:
+    """Seconds the CLI spent between two consecutive database calls of a session: its own per-round-trip cost."""
+    gaps = []
+    for connection in StandInConnection.instances or []:
+        calls = sorted(connection.db.calls, key=lambda call: call[1])
+        gaps.extend(later[1] - earlier[2] for earlier, later in zip(calls, calls[1:]) if later[1] >= earlier[2])
+    return gaps
+
+def peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+def run_scenario(name:str, options:dict, identifiers:dict, csv_path:Optional[str], workspace:str) -> dict:
+    StandInConnection.instances = []
+    with contextlib.closing(sqlite3.connect(identifiers["path"])) as setup:
+        setup.executescript("""
+            CREATE TABLE IF NOT EXISTS bench_load (c0 INTEGER, c1 TEXT, c2 INTEGER, c3 TEXT, c4 INTEGER);
+            CREATE TABLE IF NOT EXISTS bench_script (id INTEGER, v TEXT);
+        """)
+    path = options["path"]
+    with contextlib.redirect_stdout(io.StringIO()), \
+            SessionPool(lambda: oracle_cli.generateConnection(STAND_IN_TYPE, identifiers), max_size=4) as session_pool, \
+            TaskScheduler(4) as pool, \
+            oracle_cli.generateConnection(STAND_IN_TYPE, identifiers) as connection:
+        cli = oracle_cli.OracleCmd(identifiers, connection, STAND_IN_TYPE, pool, session_pool)
+        cli.workspace_path = workspace
+        cli.workspace_config = {"path": workspace}
+        start = time.perf_counter()
+        if path == "export":
+            query = f"SELECT * FROM SYNTHETIC_{options['rows']}_{options['columns']}_{options['width']}"
+            task_id = cli.start_task(name, cli.query_oracle, True, identifiers, [query], False)
+        elif path == "load":
+            task_id = cli.start_task(name, cli.insert_many, True, identifiers, csv_path, "bench_load", oracle_cli.DEFAULT_INSERT_BUFFER_SIZE, True, options["fast"], False)
+        else:
+            task_id = cli.start_task(name, cli.runscript_oracle, True, identifiers, build_script(options["statements"]))
+        seconds = time.perf_counter() - start
+    metrics = task_metrics.load_metrics(cli.find_task_folder(task_id)) or {"sub_tasks": {}}
+    sub_tasks = metrics["sub_tasks"].values()
+    errors = [values["error"] for values in sub_tasks if values.get("error")]
+    rows = len(sub_tasks) if path == "script" else sum(values.get("rows", 0) for values in sub_tasks)
+    gaps = client_gaps()
+    StandInConnection.instances = None
+    return {
+        "scenario": name,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds) if seconds > 0 else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "client_ms_p50": _ms(percentile(gaps, 50)),
+        "client_ms_p95": _ms(percentile(gaps, 95)),
+        "client_ms_p99": _ms(percentile(gaps, 99)),
+        "error": errors[0] if errors else None,
+    }
+
+def _ms(seconds:Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 3)
+
+def _run_in_child(out, *args) -> None:
+    try:
+        out.put(run_scenario(*args))
+    except BaseException as e:
+        out.put({"scenario": args[0], "error": f"{type(e).__name__}: {e}"})
+
+def run_isolated(name:str, options:dict, identifiers:dict, csv_path:Optional[str], workspace:str) -> dict:
+    # A fresh process per scenario, so that peak RSS only covers that scenario
+    context = multiprocessing.get_context("spawn")
+    out = context.Queue()
+    process = context.Process(target=_run_in_child, args=(out, name, options, identifiers, csv_path, workspace))
+    process.start()
+    result = out.get()
+    process.join()
+    return result
+
+def print_results(results:list) -> None:
+    header = ("scenario", "rows", "seconds", "rows/s", "peak RSS MB", "client ms p50/p95/p99")
+    lines = [header]
+    for r in results:
+        if r.get("rows") is None:
+            lines.append((r["scenario"], "-", "-", "-", "-", r["error"]))
+            continue
+        rss = f"{r['peak_rss_bytes'] / 1024 / 1024:.0f}" if r["peak_rss_bytes"] else "-"
+        lines.append((r["scenario"], str(r["rows"]), f"{r['seconds']:.2f}", str(r["rows_per_second"]), rss, f"{r['client_ms_p50']}/{r['client_ms_p95']}/{r['client_ms_p99']}"))
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+    for line in lines:
+        print("  ".join(value.ljust(width) for value, width in zip(line, widths)))
+    for r in results:
+        if r.get("rows") is not None and r.get("error"):
+            print(f"{r['scenario']}: {r['error']}")
+
+def main(argv:Optional[list]=None) -> None:
+    parser = argparse.ArgumentParser(prog="oracle-bench", description="Measures the export, load and script paths of the CLI against a local stand-in for Oracle.")
+    parser.add_argument("scenarios", nargs="*", help=f"scenarios to run among {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the number of rows and statements of every scenario")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every database round trip")
+    parser.add_argument("--rows-per-second", type=float, default=None, help="simulated database throughput, per session")
+    parser.add_argument("--json", help="also writes the results to this file")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="oracle-bench-") as folder:
+        for name in args.scenarios or list(SCENARIOS):
+            options = dict(SCENARIOS[name])
+            for key in ("rows", "statements"):
+                if key in options:
+                    options[key] = max(1, int(options[key] * args.scale))
+            scenario_folder = os.path.join(folder, name)
+            os.makedirs(scenario_folder)
+            csv_path = None
+            if options["path"] == "load":
+                csv_path = os.path.join(scenario_folder, "load.csv")
+                write_csv(csv_path, options["rows"], options["columns"])
+            identifiers = {"path": os.path.join(scenario_folder, "bench.sqlite"), "latency": args.latency, "rows_per_second": args.rows_per_second}
+            results.append(run_isolated(name, options, identifiers, csv_path, os.path.join(scenario_folder, "workspace")))
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import csv
+import itertools
+import json
+import re
+from typing import Iterator, Optional
+
+DEFAULT_BIND_BATCH_SIZE = 10000
+
+_SKIPPED = re.compile(r"'(?:[^']|'')*'|\"[^\"]*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_BIND = re.compile(r"(?<![:\w]):(\w+)")
+
+def bind_names(sql:str) -> list[str]:
+    """Bind variables of the statement, literals and comments excluded: named ones in order of first use, positional
+    ones (:1, :2) once per occurrence since Oracle binds a value to each occurrence when binding by position."""
+    names = []
+    for name in _BIND.findall(_SKIPPED.sub(" ", sql)):
+        if name.isdigit() or name.upper() not in (n.upper() for n in names):
+            names.append(name)
+    return names
+
+def label_positions(sql:str) -> Optional[list[int]]:
+    """Position in the binds of the first occurrence of each positional bind variable, None for named ones."""
+    names = bind_names(sql)
+    if not all(name.isdigit() for name in names):
+        return None
+    return [names.index(name) for name in dict.fromkeys(names)]
+
+def _by_occurrence(values:list, fields:list[str], names:list[str]) -> list:
+    # One value per occurrence, taken from the field of its bind variable
+    if len(values) < len(fields):
+        raise ValueError(f"{len(values)} values for the {len(fields)} bind variables {', '.join(':' + field for field in fields)}")
+    return [values[fields.index(name)] for name in names]
+
+def _named(names:list[str], record:dict) -> dict:
+    keys = {key.upper(): key for key in record}
+    missing = [name for name in names if name.upper() not in keys]
+    if missing:
+        raise ValueError(f"no value for the bind variables {', '.join(missing)}")
+    return {name: record[keys[name.upper()]] for name in names}
+
+def _csv_bind_sets(path:str, names:list[str], positional:bool) -> tuple[list[str], Iterator]:
+    f = open(path, "r", newline="")
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        f.close()
+        raise ValueError(f"{path} is empty, the first line must name the parameters")
+    if positional:
+        # Positional binds take the first fields, one per distinct bind variable
+        header = header[:len(names)]
+
+    def records():
+        with f:
+            for row in reader:
+                # Like Oracle, an empty string is a NULL
+                values = [value if value != "" else None for value in row]
+                yield values[:len(names)] if positional else _named(names, dict(zip(header, values)))
+    return (header if positional else names), records()
+
+def _jsonl_bind_sets(path:str, names:list[str], positional:bool) -> tuple[list[str], Iterator]:
+    def records():
+        with open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    lines = records()
+    first = next(lines, None)
+    if first is None:
+        raise ValueError(f"{path} is empty")
+    labels = list(first)[:len(names)] if positional and isinstance(first, dict) else names
+
+    def convert(record):
+        if isinstance(record, dict):
+            return list(record.values())[:len(names)] if positional else _named(names, record)
+        values = record if isinstance(record, list) else [record]
+        return values[:len(names)] if positional else dict(zip(names, values))
+    return labels, (convert(record) for record in itertools.chain([first], lines))
+
+def open_bind_sets(path:str, sql:str) -> tuple[list[str], Iterator]:
+    """Reads the bind sets of a parameter file lazily: a csv file with a header, or JSON lines holding objects, lists or
+    single values. Named bind variables are matched to the fields by name, positional ones (:1, :2) take the fields in order.
+    A positional bind variable used several times takes the same field each time.
+    Returns the labels of the parameters and an iterator of binds ready for cursor.execute."""
+    names = bind_names(sql)
+    positional = all(name.isdigit() for name in names)
+    # Positional binds read one field per distinct bind variable
+    fields = list(dict.fromkeys(names)) if positional else names
+    if path.lower().endswith((".jsonl", ".ndjson", ".json")):
+        labels, sets = _jsonl_bind_sets(path, fields, positional)
+    else:
+        labels, sets = _csv_bind_sets(path, fields, positional)
+    if len(fields) != len(names):
+        sets = (_by_occurrence(values, fields, names) for values in sets)
+    return labels, sets
+
+def batches(bind_sets:Iterator, size:int) -> Iterator[list]:
+    return iter(lambda: list(itertools.islice(bind_sets, size)), [])
+
+def label_values(binds, labels:list[str], positions:Optional[list[int]]=None) -> list:
+    """Values of a bind set for the parameter columns of the output, as text. positions (see label_positions) picks
+    the values of positional binds, the first ones by default."""
+    if isinstance(binds, dict):
+        values = [binds.get(label) for label in labels]
+    else:
+        binds = list(binds)
+        values = [binds[i] for i in positions[:len(labels)] if i < len(binds)] if positions is not None else binds[:len(labels)]
+    values += [None] * (len(labels) - len(values))
+    return [None if value is None else str(value) for value in values]
+
+def label_description(labels:list[str]) -> list[tuple]:
+    # Shaped like cursor.description entries, typed as text
+    return [(f"BIND_{label.upper()}", None, None, None, None, None, True) for label in labels]
@@ -0,0 +1,180 @@
+import collections
+import hashlib
+import os
+import shutil
+import time
+from typing import Callable, Iterable, Optional
+
+BLOB_FOLDER = "blobs"
+HASH_CHUNK_BYTES = 16 * 1024 * 1024
+
+def file_digest(path:str) -> str:
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def link_or_copy(source:str, destination:str) -> bool:
+    """Hard links source to destination, copies it on file systems without hard links. True if linked."""
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+        return True
+    except OSError:
+        shutil.copyfile(source, destination)
+        return False
+
+def break_link(path:str) -> None:
+    """Gives path its own copy of the data before it is modified in place: the other names of the file keep the old content."""
+    if os.stat(path).st_nlink > 1:
+        tmp = f"{path}.tmp"
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, path)
+
+def link_tree(source:str, destination:str, linked:Callable[[str], bool]) -> None:
+    """Recreates the files of source in destination: hard links for those whose relative path is linked, copies for the others."""
+    for root, _, names in os.walk(source):
+        relative = os.path.relpath(root, source)
+        target = os.path.normpath(os.path.join(destination, relative))
+        os.makedirs(target, exist_ok=True)
+        for name in names:
+            if linked(os.path.normpath(os.path.join(relative, name))):
+                link_or_copy(os.path.join(root, name), os.path.join(target, name))
+            else:
+                # Removed first: the destination may be a hard link that must keep its content
+                if os.path.lexists(os.path.join(target, name)):
+                    os.remove(os.path.join(target, name))
+                shutil.copyfile(os.path.join(root, name), os.path.join(target, name))
+
+class BlobStore:
+    """Files of a workspace stored once by content hash under <folder>/<2 first hex digits>/<hash>. Outputs, saved queries
+    and cache entries are hard links to the blobs; a blob no other file links to anymore can be removed.
+    Files are stored by gc rather than when they are written, so that running a query does not read its output twice."""
+
+    def __init__(self, folder:str) -> None:
+        self.folder = folder
+
+    def path(self, digest:str) -> str:
+        return os.path.join(self.folder, digest[:2], digest)
+
+    def put(self, path:str) -> Optional[str]:
+        """Stores the file: it becomes a link to the blob of its content, added if missing. Returns the digest,
+        None when the file system does not support hard links."""
+        digest = file_digest(path)
+        blob = self.path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            os.link(path, blob)
+            return digest
+        except FileExistsError:
+            pass
+        except OSError:
+            return None
+        if not os.path.samefile(blob, path):
+            # Same content as a stored file, the copy of path is dropped
+            tmp = f"{path}.blob"
+            try:
+                os.link(blob, tmp)
+            except OSError:
+                return None
+            os.replace(tmp, path)
+        return digest
+
+    def put_tree(self, folder:str, selected:Callable[[str], bool]) -> tuple[int, int]:
+        """Stores the selected files of folder that are not stored yet, each hashed once. Returns their number and the
+        bytes freed by those whose content was already stored."""
+        stored = self.inodes()
+        count = 0
+        freed = 0
+        for root, _, names in os.walk(folder):
+            for name in names:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                if (stat.st_dev, stat.st_ino) in stored or not selected(path):
+                    continue
+                if self.put(path) is None:
+                    # No hard links on this file system, nothing can be stored
+                    return count, freed
+                count += 1
+                after = os.stat(path)
+                if after.st_ino != stat.st_ino and stat.st_nlink == 1:
+                    freed += stat.st_size
+                stored.add((after.st_dev, after.st_ino))
+        return count, freed
+
+    def _blobs(self) -> Iterable[os.DirEntry]:
+        if not os.path.isdir(self.folder):
+            return
+        for prefix in os.scandir(self.folder):
+            if prefix.is_dir():
+                yield from (entry for entry in os.scandir(prefix.path) if entry.is_file())
+
+    def inodes(self) -> set:
+        return {(entry.stat().st_dev, entry.stat().st_ino) for entry in self._blobs()}
+
+    def sweep(self, dry_run:bool=False, released:Optional[collections.Counter]=None) -> tuple[int, int]:
+        """Removes the blobs no other file links to. Returns their number and size. With dry_run, nothing is removed and
+        the links counted in released by inode (those of the files about to be removed) are deducted."""
+        released = released or collections.Counter()
+        count = 0
+        size = 0
+        for entry in list(self._blobs()):
+            stat = entry.stat()
+            if stat.st_nlink - (released[(stat.st_dev, stat.st_ino)] if dry_run else 0) <= 1:
+                count += 1
+                size += stat.st_size
+                if not dry_run:
+                    os.remove(entry.path)
+        return count, size
+
+def plan_gc(queries_folder:str, store:BlobStore, max_age:Optional[float]=None, max_bytes:Optional[int]=None, keep:Iterable[str]=(), now:Optional[float]=None) -> tuple[list[str], int, int, collections.Counter]:
+    """Task folders of queries_folder to remove, oldest first: those last written more than max_age seconds ago, then
+    the oldest ones while the task folders use more than max_bytes. Folders in keep are never removed.
+    A file also linked from a saved query or the cache frees nothing and is not counted; a file shared by several task
+    folders is counted in equal parts. Returns the folders, the bytes they free, the bytes left and the links they
+    hold by inode."""
+    now = time.time() if now is None else now
+    keep = {os.path.normpath(folder) for folder in keep}
+    store_inodes = store.inodes()
+    links = collections.Counter()
+    folders = []
+    for day in sorted(os.listdir(queries_folder)) if os.path.isdir(queries_folder) else []:
+        day_folder = os.path.join(queries_folder, day)
+        if not os.path.isdir(day_folder):
+            continue
+        for task_id in sorted(os.listdir(day_folder)):
+            folder = os.path.join(day_folder, task_id)
+            files = []
+            modified = 0.0
+            for root, _, names in os.walk(folder):
+                for name in names:
+                    stat = os.stat(os.path.join(root, name))
+                    inode = (stat.st_dev, stat.st_ino)
+                    files.append((inode, stat.st_size, stat.st_nlink))
+                    links[inode] += 1
+                    modified = max(modified, stat.st_mtime)
+            folders.append({"path": os.path.normpath(folder), "files": files, "modified": modified or os.stat(folder).st_mtime})
+    for folder in folders:
+        folder["bytes"] = sum(
+            size / links[inode]
+            for inode, size, nlink in folder["files"]
+            if nlink - links[inode] - (inode in store_inodes) <= 0
+        )
+    total = sum(folder["bytes"] for folder in folders)
+    removed = []
+    released = collections.Counter()
+    freed = 0.0
+    for folder in sorted(folders, key=lambda f: f["modified"]):
+        if folder["path"] in keep:
+            continue
+        expired = max_age is not None and now - folder["modified"] > max_age
+        if not expired and (max_bytes is None or total <= max_bytes):
+            # Sorted by age: the next folders are not expired either
+            break
+        removed.append(folder["path"])
+        released.update(inode for inode, _, _ in folder["files"])
+        freed += folder["bytes"]
+        total -= folder["bytes"]
+    return removed, round(freed), round(total), released
@@ -0,0 +1,273 @@
+from __future__ import annotations
+import csv
+import datetime
+import decimal
+import io
+import os
+import queue
+import sys
+import threading
+from typing import NamedTuple, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from liouss_python_sql_connectors.sql_connection import SQLConnection
+
+CSV_DIALECT = {"delimiter": ",", "quotechar": '"', "escapechar": "\\"}
+DEFAULT_CHUNK_BYTES = 16 * 1024 * 1024
+COMMIT_MODES = ("chunk", "end")
+
+def read_csv_header(file_path:str) -> tuple[list[str], int]:
+    """Returns the header of the csv file and the byte offset of its first data row."""
+    with open(file_path, "rb") as f:
+        line = f.readline()
+        header = next(csv.reader([line.decode("utf-8")], **CSV_DIALECT))
+        return header, f.tell()
+
+def split_csv_chunks(file_path:str, data_start:int, chunk_bytes:int=DEFAULT_CHUNK_BYTES) -> list[tuple[int, int]]:
+    """Splits the data part of a csv file into (start, end) byte ranges that end on a row boundary.
+    Boundaries are aligned on the next newline, so quoted values must not contain line breaks."""
+    size = os.path.getsize(file_path)
+    chunks = []
+    with open(file_path, "rb") as f:
+        start = data_start
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+def parse_csv_chunk(file_path:str, start:int, end:int, n_cols:int) -> list[list]:
+    # Runs in a worker process, must stay a module level function so it can be pickled
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    rows = []
+    for row in csv.reader(io.StringIO(data.decode("utf-8"), newline=""), **CSV_DIALECT):
+        if not row:
+            continue
+        if len(row) != n_cols:
+            raise ValueError(f"row with {len(row)} values instead of {n_cols} in bytes {start}-{end} of {file_path} (quoted line breaks are not supported in parallel mode)")
+        rows.append([None if v == "" else v for v in row])
+    return rows
+
+def build_insert_sql(table_name:str, header:list[str], hint:Optional[str]=None) -> str:
+    cols = " , ".join(header)
+    binds = " , ".join(f":{i}" for i in range(1, len(header) + 1))
+    hint = f"/*+ {hint} */ " if hint else ""
+    return f"INSERT {hint}INTO {table_name} ({cols}) VALUES ({binds})"
+
+DEFAULT_TARGET_ROUND_TRIP = 2.0
+DEFAULT_LOAD_MEMORY_CAP = 256 * 1024 * 1024
+MIN_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 1000000
+BYTES_SAMPLE_ROWS = 64
+PIPELINE_DEPTH = 2
+
+class AdaptiveBatchSizer:
+    """Picks the next batch size from the observed insert throughput so that one round trip lasts about target_seconds,
+    while keeping every batch in flight under memory_cap bytes."""
+
+    def __init__(self, initial:int, target_seconds:float=DEFAULT_TARGET_ROUND_TRIP, memory_cap:int=DEFAULT_LOAD_MEMORY_CAP, in_flight:int=PIPELINE_DEPTH + 2, adaptive:bool=True) -> None:
+        self.size = initial
+        self.target_seconds = target_seconds
+        self.memory_cap = memory_cap
+        self.in_flight = in_flight
+        self.adaptive = adaptive
+        self.bytes_per_row = None
+
+    def record(self, rows:int, seconds:float, bytes_per_row:float) -> int:
+        if bytes_per_row:
+            self.bytes_per_row = bytes_per_row if self.bytes_per_row is None else 0.7 * self.bytes_per_row + 0.3 * bytes_per_row
+        if not self.adaptive or rows <= 0:
+            return self.size
+        wanted = rows / max(seconds, 1e-3) * self.target_seconds
+        # Move at most x2 per step so a single slow round trip does not collapse the batch size
+        wanted = min(max(wanted, self.size / 2), self.size * 2)
+        cap = MAX_BATCH_SIZE
+        if self.bytes_per_row:
+            cap = min(cap, self.memory_cap / (self.bytes_per_row * self.in_flight))
+        self.size = int(max(MIN_BATCH_SIZE, min(wanted, cap)))
+        return self.size
+
+def estimate_row_bytes(rows:list) -> float:
+    sample = rows[:BYTES_SAMPLE_ROWS]
+    if not sample:
+        return 0
+    # 8 bytes for the list slot pointing to each value
+    return sum(8 + (sys.getsizeof(v) if v is not None else 0) for row in sample for v in row) / len(sample)
+
+def _put(out:queue.Queue, item, stop) -> bool:
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def produce_batches(reader, sizer:AdaptiveBatchSizer, out:queue.Queue, stop, convert=None, reject=None) -> None:
+    """Parses rows from reader into batches of sizer.size rows and puts them in out as (batch, sources), followed by None.
+    Rows go through convert when given, sources then holds the csv rows of the batch (None otherwise) for the reject file;
+    a row convert fails on is passed to reject(row, error) and skipped, or aborts the load without reject.
+    An exception raised while parsing is put in out instead of None. Stops early once stop is set."""
+    try:
+        batch = []
+        sources = [] if convert is not None else None
+        for row in reader:
+            if convert is None:
+                batch.append([None if v == "" else v for v in row])
+            else:
+                try:
+                    batch.append(convert(row))
+                    sources.append(row)
+                except ValueError as e:
+                    if reject is None:
+                        raise
+                    reject(row, f"conversion error: {e}")
+            if len(batch) >= sizer.size:
+                if not _put(out, (batch, sources), stop):
+                    return
+                batch = []
+                sources = [] if convert is not None else None
+        if batch and not _put(out, (batch, sources), stop):
+            return
+        _put(out, None, stop)
+    except BaseException as e:
+        _put(out, e, stop)
+
+DATE_FORMATS = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y", "%Y%m%d%H%M%S", "%Y%m%d")
+MAX_LOGGED_BATCH_ERRORS = 20
+
+class TableColumn(NamedTuple):
+    name: str
+    data_type: str
+    data_length: int
+    precision: Optional[int]
+    scale: Optional[int]
+    char_length: Optional[int]
+
+def fetch_table_columns(connection:SQLConnection, table_name:str) -> dict[str, TableColumn]:
+    owner, _, table = table_name.rpartition(".")
+    cursor = connection.get_db().cursor()
+    try:
+        cursor.execute("""
+            SELECT column_name, data_type, data_length, data_precision, data_scale, char_length
+            FROM all_tab_columns
+            WHERE table_name = :1 AND owner = NVL(:2, SYS_CONTEXT('USERENV','CURRENT_SCHEMA'))
+        """, [_dictionary_name(table), _dictionary_name(owner) if owner else None])
+        columns = {row[0]: TableColumn(*row) for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+    if not columns:
+        raise NameError(f"table {table_name} not found in ALL_TAB_COLUMNS")
+    return columns
+
+def _dictionary_name(name:str) -> str:
+    return name[1:-1] if name.startswith('"') and name.endswith('"') else name.upper()
+
+def _to_decimal(value:str) -> decimal.Decimal:
+    try:
+        return decimal.Decimal(value)
+    except decimal.InvalidOperation:
+        raise ValueError(f"{value!r} is not a number") from None
+
+def _to_int(value:str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        number = _to_decimal(value)
+        if number != number.to_integral_value():
+            raise ValueError(f"{value!r} is not an integer")
+        return int(number)
+
+def _to_datetime(value:str) -> datetime.datetime:
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise ValueError(f"{value!r} is not a date")
+
+def build_converter(column:TableColumn):
+    """Returns (converter, input size) to bind a csv value to the column with its native type."""
+    data_type = column.data_type
+    if data_type == "NUMBER":
+        if column.scale == 0:
+            return _to_int, int
+        return _to_decimal, decimal.Decimal
+    if data_type in ("BINARY_FLOAT", "BINARY_DOUBLE", "FLOAT"):
+        return float, float
+    if data_type == "DATE" or data_type.startswith("TIMESTAMP"):
+        return _to_datetime, datetime.datetime
+    if data_type in ("RAW", "BLOB"):
+        return bytes.fromhex, bytes
+    if data_type in ("VARCHAR2", "NVARCHAR2", "CHAR", "NCHAR"):
+        return str, (column.char_length or column.data_length)
+    return str, str
+
+class TypedInserter:
+    """Array insert with values converted to the column types read from ALL_TAB_COLUMNS and bind types declared up front.
+    With batch_errors, rows rejected by the database are collected instead of aborting the whole batch. Oracle has no
+    batch errors for direct-path inserts: with append, a rejected row fails the batch."""
+
+    def __init__(self, connection:SQLConnection, table_name:str, header:list[str], columns:dict[str, TableColumn], append:bool=False, batch_errors:bool=True) -> None:
+        missing = [name for name in header if _dictionary_name(name) not in columns]
+        if missing:
+            raise NameError(f"columns not found in {table_name}: {', '.join(missing)}")
+        converters = [build_converter(columns[_dictionary_name(name)]) for name in header]
+        self.converters = [converter for converter, _ in converters]
+        self.input_sizes = [size for _, size in converters]
+        self.sql = build_insert_sql(table_name, header, hint="APPEND_VALUES" if append else None)
+        self.append = append
+        self.batch_errors = batch_errors and not append
+        self.connection = connection
+        self.cursor = connection.get_db().cursor()
+
+    def convert(self, row:list[str]) -> list:
+        return [None if v is None or v == "" else converter(v) for converter, v in zip(self.converters, row)]
+
+    def insert(self, batch:list[list]) -> list[tuple[int, str]]:
+        """Inserts batch and returns the (offset in batch, error message) of the rejected rows."""
+        self.cursor.setinputsizes(*self.input_sizes)
+        if not self.batch_errors:
+            self.cursor.executemany(self.sql, batch)
+            return []
+        self.cursor.executemany(self.sql, batch, batcherrors=True)
+        return [(error.offset, str(error.message).strip()) for error in self.cursor.getbatcherrors()]
+
+    def close(self) -> None:
+        self.cursor.close()
+
+class RejectFile:
+    """Csv file collecting the rows a load rejected, as read from the loaded file, with the reason in an extra ERROR column.
+    Created on the first reject."""
+
+    def __init__(self, path:str, header:list[str]) -> None:
+        self.path = path
+        self.header = header
+        self.count = 0
+        self._file = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def write(self, row:list, message:str) -> None:
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "w", newline="", encoding="utf-8")
+                self._writer = csv.writer(self._file)
+                self._writer.writerow(list(self.header) + ["ERROR"])
+            self._writer.writerow(list(row) + [message])
+            self.count += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
@@ -0,0 +1,159 @@
+from __future__ import annotations
+import json
+import numbers
+import os
+import threading
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from liouss_python_sql_connectors.sql_connection import SQLConnection
+
+EXPORT_MODES = ("rowid", "partition", "key")
+MANIFEST_FILE = "manifest.json"
+DEFAULT_CHUNKS_PER_SESSION = 4
+
+# Tom Kyte's split of a segment into ranges of extents holding about the same number of blocks
+_ROWID_RANGES = """
+    SELECT DBMS_ROWID.ROWID_CREATE(1, o.data_object_id, lo_fno, lo_block, 0),
+           DBMS_ROWID.ROWID_CREATE(1, o.data_object_id, hi_fno, hi_block, 32767)
+    FROM (
+        SELECT DISTINCT grp,
+            FIRST_VALUE(relative_fno) OVER (PARTITION BY grp ORDER BY relative_fno, block_id ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) lo_fno,
+            FIRST_VALUE(block_id) OVER (PARTITION BY grp ORDER BY relative_fno, block_id ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) lo_block,
+            LAST_VALUE(relative_fno) OVER (PARTITION BY grp ORDER BY relative_fno, block_id ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) hi_fno,
+            LAST_VALUE(block_id + blocks - 1) OVER (PARTITION BY grp ORDER BY relative_fno, block_id ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) hi_block
+        FROM (
+            SELECT relative_fno, block_id, blocks,
+                TRUNC((SUM(blocks) OVER (ORDER BY relative_fno, block_id) - 0.01) / (SUM(blocks) OVER () / :chunks)) grp
+            FROM {extents}
+            WHERE segment_name = :name AND segment_type = 'TABLE'{owner_filter}
+        )
+    ), all_objects o
+    WHERE o.object_name = :name AND o.object_type = 'TABLE' AND o.owner = NVL(:owner, SYS_CONTEXT('USERENV','CURRENT_SCHEMA'))
+    ORDER BY grp
+"""
+
+def dictionary_name(name:str) -> str:
+    return name[1:-1] if name.startswith('"') and name.endswith('"') else name.upper()
+
+def split_table_name(table:str) -> tuple[Optional[str], str]:
+    owner, _, name = table.rpartition(".")
+    return (dictionary_name(owner) if owner else None), dictionary_name(name)
+
+def _query(connection:SQLConnection, sql:str, binds) -> list:
+    cursor = connection.get_db().cursor()
+    try:
+        cursor.execute(sql, binds)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def _chunk(index:int, label:str, sql:str, binds:Optional[list]=None) -> dict:
+    return {"index": index, "label": label, "sql": sql, "binds": binds or [], "status": "pending", "file": None, "rows": None, "error": None}
+
+def _select(table:str, source:Optional[str]=None, condition:Optional[str]=None, where:Optional[str]=None) -> str:
+    conditions = [f"({c})" for c in (where, condition) if c]
+    return f"SELECT * FROM {source or table}" + (f" WHERE {' AND '.join(conditions)}" if conditions else "")
+
+def plan_rowid_chunks(connection:SQLConnection, table:str, chunks:int, where:Optional[str]=None) -> list[dict]:
+    owner, name = split_table_name(table)
+    binds = {"chunks": chunks, "name": name, "owner": owner}
+    try:
+        ranges = _query(connection, _ROWID_RANGES.format(extents="dba_extents", owner_filter=" AND owner = NVL(:owner, SYS_CONTEXT('USERENV','CURRENT_SCHEMA'))"), binds)
+    except Exception:
+        if owner is not None:
+            raise
+        # Without access to DBA_EXTENTS, tables of the current schema can still be split
+        ranges = _query(connection, _ROWID_RANGES.format(extents="user_extents", owner_filter=""), binds)
+    if not ranges:
+        # Partitions are segments of type TABLE PARTITION and the partitioned table has no data object of its own
+        raise ValueError(f"no extents found for {table}: empty, partitioned (use --by partition) or not visible")
+    return [_chunk(i, f"rowid {lo}-{hi}", _select(table, condition="ROWID BETWEEN :1 AND :2", where=where), [lo, hi]) for i, (lo, hi) in enumerate(ranges)]
+
+def plan_partition_chunks(connection:SQLConnection, table:str, where:Optional[str]=None) -> list[dict]:
+    owner, name = split_table_name(table)
+    partitions = _query(connection, """
+        SELECT partition_name
+        FROM all_tab_partitions
+        WHERE table_name = :1 AND table_owner = NVL(:2, SYS_CONTEXT('USERENV','CURRENT_SCHEMA'))
+        ORDER BY partition_position
+    """, [name, owner])
+    if not partitions:
+        raise ValueError(f"{table} has no partitions, use --by rowid or --by key:<COLUMN>")
+    return [_chunk(i, f"partition {p}", _select(table, source=f'{table} PARTITION ("{p}")', where=where)) for i, (p,) in enumerate(partitions)]
+
+def plan_key_chunks(connection:SQLConnection, table:str, column:str, chunks:int, where:Optional[str]=None) -> list[dict]:
+    """Equal width ranges between the min and max of a numeric column, plus a chunk for its NULLs.
+    Cheap to plan with an index on the column, but skewed keys give uneven chunks."""
+    ((low, high),) = _query(connection, f"SELECT MIN({column}), MAX({column}) FROM {table}" + (f" WHERE {where}" if where else ""), [])
+    planned = []
+    if low is not None:
+        if not all(isinstance(v, numbers.Number) for v in (low, high)):
+            raise ValueError(f"{column} is not numeric")
+        integral = all(float(v).is_integer() for v in (low, high))
+        low, high = (int(low), int(high)) if integral else (float(low), float(high))
+        bounds = [low + (high - low) * i // chunks if integral else low + (high - low) * i / chunks for i in range(chunks)] + [high]
+        for i in range(chunks):
+            lo, hi = bounds[i], bounds[i + 1]
+            if integral and lo == hi and i < chunks - 1:
+                continue
+            last = i == chunks - 1
+            condition = f"{column} >= :1 AND {column} {'<=' if last else '<'} :2"
+            planned.append(_chunk(len(planned), f"{column} in [{lo}, {hi}{']' if last else ')'}", _select(table, condition=condition, where=where), [lo, hi]))
+    planned.append(_chunk(len(planned), f"{column} is null", _select(table, condition=f"{column} IS NULL", where=where)))
+    return planned
+
+def plan_export(connection:SQLConnection, table:str, by:str, chunks:int, where:Optional[str]=None) -> list[dict]:
+    mode, _, column = by.partition(":")
+    if mode == "rowid":
+        return plan_rowid_chunks(connection, table, chunks, where)
+    if mode == "partition":
+        return plan_partition_chunks(connection, table, where)
+    if mode == "key" and column:
+        return plan_key_chunks(connection, table, column, chunks, where)
+    raise ValueError(f"unknown split {by}, expected rowid, partition or key:<COLUMN>")
+
+class Manifest:
+    """manifest.json of an export: how the table was split and the state of each chunk, so that failed chunks can be retried alone.
+    Rewritten on every change. Safe to update from several threads."""
+
+    def __init__(self, folder:str, data:dict) -> None:
+        self.path = os.path.join(folder, MANIFEST_FILE)
+        self.data = data
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, folder:str) -> Optional["Manifest"]:
+        path = os.path.join(folder, MANIFEST_FILE)
+        if not os.path.isfile(path):
+            return None
+        with open(path, "r") as f:
+            return cls(folder, json.load(f))
+
+    @property
+    def chunks(self) -> list[dict]:
+        return self.data["chunks"]
+
+    def pending(self) -> list[dict]:
+        return [chunk for chunk in self.chunks if chunk["status"] != "done"]
+
+    def update(self, chunk:dict, **values) -> None:
+        with self._lock:
+            chunk.update(values)
+            self._write()
+
+    def set(self, key:str, value) -> None:
+        with self._lock:
+            self.data[key] = value
+            self._write()
+
+    def save(self) -> None:
+        with self._lock:
+            self._write()
+
+    def _write(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f, indent=2, default=str)
+        os.replace(tmp, self.path)
@@ -0,0 +1,133 @@
+import argparse
+import json
+import sys
+from concurrent.futures import wait
+from typing import Optional
+from liouss_python_toolkit.printer import beautiful_print, GREEN_COLOR, RED_COLOR
+from liouss_python_oracle_cli import oracle_cli
+from liouss_python_oracle_cli.scheduler import TaskScheduler
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_CONFIG = 3
+EXIT_CONNECTION = 4
+EXIT_TIMEOUT = 5
+EXIT_INTERRUPTED = 130
+CANCEL_GRACE_SECONDS = 30
+
+def read_commands(paths:list[str]) -> list[str]:
+    """One command per line, blank lines and lines starting with # are skipped. "-" reads stdin."""
+    commands = []
+    for path in paths:
+        if path == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(oracle_cli.real_path(path), "r") as f:
+                lines = f.read().splitlines()
+        commands.extend(line.strip() for line in lines if line.strip() and not line.strip().startswith("#"))
+    return commands
+
+def task_failure(task:dict) -> Optional[str]:
+    """Why a finished task failed, None if it succeeded."""
+    process = task["process"]
+    if task.get("cancelled"):
+        return f"cancelled: {task['cancelled']}"
+    if process is not None:
+        if process.cancelled():
+            return "cancelled"
+        error = process.exception()
+        if error is not None:
+            return f"{type(error).__name__}: {error}"
+    return task.get("error")
+
+def stop_tasks(cli:oracle_cli.OracleCmd, futures:list, reason:str) -> None:
+    for task_id, task in cli.tasks.items():
+        if task["process"] is not None and not task["process"].done():
+            cli.cancel_task(task_id, reason)
+    wait(futures, timeout=CANCEL_GRACE_SECONDS)
+
+def run_headless(argv:list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="oracle run",
+        description="Runs CLI commands without the prompt, waits for their tasks and exits with a status code: "
+                    f"{EXIT_OK} success, {EXIT_FAILED} a command or task failed, {EXIT_USAGE} usage error, {EXIT_CONFIG} configuration error, "
+                    f"{EXIT_CONNECTION} connection error, {EXIT_TIMEOUT} timeout, {EXIT_INTERRUPTED} interrupted.",
+    )
+    parser.add_argument("-w", "--workspace", help="workspace to run in (default: the last one used)")
+    parser.add_argument("-c", "--command", action="append", default=[], help="command to run, as typed at the prompt (repeatable)")
+    parser.add_argument("-f", "--file", action="append", default=[], help="file of commands, one per line, - for stdin (repeatable)")
+    parser.add_argument("-t", "--timeout", type=float, help="seconds to wait for the tasks before cancelling them")
+    parser.add_argument("-k", "--keep-going", action="store_true", help="run the next commands after a failed one")
+    args = parser.parse_args(argv)
+
+    try:
+        commands = list(args.command) + read_commands(args.file)
+    except OSError as e:
+        beautiful_print(f"Cannot read commands: {e}", color=RED_COLOR)
+        return EXIT_USAGE
+    if not commands:
+        parser.print_usage()
+        beautiful_print("No command to run, use -c or -f", color=RED_COLOR)
+        return EXIT_USAGE
+
+    try:
+        with open(oracle_cli.ORACLE_ID_PATH, "r") as f:
+            oracle_identifiers = json.load(f)
+        config = oracle_cli.open_config()
+    except (OSError, ValueError) as e:
+        beautiful_print(f"Invalid configuration, run oracle once to set it up: {e}", color=RED_COLOR)
+        return EXIT_CONFIG
+
+    with oracle_cli.create_session_pool(oracle_cli.CONNECTION_TYPE, oracle_identifiers, config.get("session_pool", {})) as session_pool, TaskScheduler() as pool:
+        # No dedicated main connection: every command takes a pooled session, the one opened here is reused by the first task
+        try:
+            session_pool.release(session_pool.acquire(timeout=60))
+        except Exception as e:
+            beautiful_print(f"Cannot connect: {e}", color=RED_COLOR)
+            return EXIT_CONNECTION
+        if session_pool.stats()["size"] == 0:
+            beautiful_print("Cannot connect", color=RED_COLOR)
+            return EXIT_CONNECTION
+
+        cli = oracle_cli.OracleCmd(oracle_identifiers, None, oracle_cli.CONNECTION_TYPE, pool, session_pool)
+        try:
+            cli.switch_workspace(args.workspace or config.get("last_workspace", oracle_cli.DEFAULT_WORKSPACE), remember=False)
+        except NameError as e:
+            beautiful_print(str(e), color=RED_COLOR)
+            return EXIT_CONFIG
+
+        status = EXIT_OK
+        try:
+            for command in commands:
+                cli.command_failed = False
+                stop = cli.onecmd(cli.precmd(command))
+                if cli.command_failed:
+                    status = EXIT_FAILED
+                    if not args.keep_going:
+                        break
+                if stop:
+                    break
+
+            futures = [task["process"] for task in cli.tasks.values() if task["process"] is not None]
+            _, pending = wait(futures, timeout=args.timeout)
+            if pending:
+                beautiful_print(f"Timeout after {args.timeout}s, cancelling {len(pending)} tasks", color=RED_COLOR)
+                stop_tasks(cli, futures, f"oracle run timeout after {args.timeout}s")
+                status = EXIT_TIMEOUT
+        except KeyboardInterrupt:
+            stop_tasks(cli, [task["process"] for task in cli.tasks.values() if task["process"] is not None], "interrupted")
+            return EXIT_INTERRUPTED
+        finally:
+            # Stops the tasks still running and the sync executor, flushes the result cache
+            cli.do_exit("")
+
+        for task_id, task in cli.tasks.items():
+            failure = task_failure(task)
+            if failure is None:
+                beautiful_print(f"[{task_id}] OK: {task['description']}", color=GREEN_COLOR)
+            else:
+                beautiful_print(f"[{task_id}] FAILED: {task['description']} ({failure})", color=RED_COLOR)
+                if status == EXIT_OK:
+                    status = EXIT_FAILED
+        return status
@@ -0,0 +1,161 @@
+from __future__ import annotations
+import csv
+import datetime
+import decimal
+import gzip
+import itertools
+import json
+import os
+import shutil
+from typing import Optional, TYPE_CHECKING
+from liouss_python_oracle_cli import output_writers
+from liouss_python_oracle_cli import blob_store
+
+if TYPE_CHECKING:
+    from liouss_python_sql_connectors.sql_connection import SQLConnection
+
+WATERMARK_FILE = "watermark.json"
+MERGE_BATCH_ROWS = 10000
+
+def encode_value(value):
+    """JSON form of a watermark, keeping its type so that it is bound back as a date, a number or a string."""
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return {"type": "datetime", "value": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"type": "date", "value": value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {"type": "decimal", "value": str(value)}
+    if isinstance(value, (int, float, str)):
+        return {"type": type(value).__name__, "value": value}
+    raise ValueError(f"unsupported watermark type {type(value).__name__}, use a date, timestamp or number column")
+
+def decode_value(encoded):
+    if encoded is None:
+        return None
+    kind, value = encoded["type"], encoded["value"]
+    if kind == "datetime":
+        return datetime.datetime.fromisoformat(value)
+    if kind == "date":
+        return datetime.date.fromisoformat(value)
+    if kind == "decimal":
+        return decimal.Decimal(value)
+    return value
+
+def new_state(column:str, key:Optional[list[str]], output_format:str) -> dict:
+    return {"column": column, "key": key, "format": output_format, "value": None, "output": None, "output_bytes": None, "runs": 0, "updated": None}
+
+def load_state(folder:str) -> Optional[dict]:
+    path = os.path.join(folder, WATERMARK_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_state(folder:str, state:dict) -> None:
+    # The watermark file is the commit point of a run: it is replaced in one step once the output is complete
+    path = os.path.join(folder, WATERMARK_FILE)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+def supports_key_merge(writer_class:type) -> bool:
+    return writer_class.open_text.__func__ is not output_writers.OutputWriter.open_text.__func__
+
+def high_watermark(connection:SQLConnection, query:str, column:str, low) -> Optional[object]:
+    """Highest value of the column among the rows past low, None if there are none."""
+    sql = f"SELECT MAX(q.{column}) FROM ({query}) q"
+    binds = []
+    if low is not None:
+        sql += f" WHERE q.{column} > :1"
+        binds.append(low)
+    cursor = connection.get_db().cursor()
+    try:
+        cursor.execute(sql, binds)
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+def delta_query(query:str, column:str, low, high) -> tuple[str, list]:
+    """The saved query restricted to the rows in (low, high]. The upper bound keeps rows committed while the
+    delta is fetched for the next run."""
+    if low is None:
+        return f"SELECT q.* FROM ({query}) q WHERE q.{column} <= :1", [high]
+    return f"SELECT q.* FROM ({query}) q WHERE q.{column} > :1 AND q.{column} <= :2", [low, high]
+
+def append_csv(path:str, delta:str, committed_bytes:int, compressed:bool=False) -> None:
+    """Appends the rows of the delta to the output in place. A compressed delta is added as a new gzip member,
+    read back with the previous ones as a single stream: only the delta is decompressed."""
+    # The saved output can be a link to the task output it was saved from
+    blob_store.break_link(path)
+    with open(path, "r+b") as out:
+        # Drops what a run interrupted before saving its watermark had already appended
+        out.truncate(committed_bytes)
+        out.seek(0, os.SEEK_END)
+        with (gzip.open if compressed else open)(delta, "rb") as f:
+            f.readline()
+            if compressed:
+                with gzip.GzipFile(fileobj=out, mode="ab", compresslevel=6) as member:
+                    shutil.copyfileobj(f, member, 16 * 1024 * 1024)
+            else:
+                shutil.copyfileobj(f, out, 16 * 1024 * 1024)
+
+def _key_positions(header:list[str], key:list[str]) -> list[int]:
+    names = [name.upper() for name in header]
+    missing = [column for column in key if column.upper() not in names]
+    if missing:
+        raise ValueError(f"key columns not in the output: {', '.join(missing)}")
+    return [names.index(column.upper()) for column in key]
+
+def merge_by_key(writer_class:type, previous:str, delta:str, key:list[str], destination:str) -> None:
+    """Writes the previous rows whose key is not in the delta, then the delta. The keys of the delta are kept in memory."""
+    with writer_class.open_text(delta) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        positions = _key_positions(header, key)
+        delta_keys = {tuple(row[i] for i in positions) for row in reader}
+    writer = writer_class(destination, [(name,) for name in header])
+    try:
+        with writer_class.open_text(previous) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for rows in iter(lambda: list(itertools.islice(reader, MERGE_BATCH_ROWS)), []):
+                writer.write_rows([row for row in rows if tuple(row[i] for i in positions) not in delta_keys])
+        with writer_class.open_text(delta) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for rows in iter(lambda: list(itertools.islice(reader, MERGE_BATCH_ROWS)), []):
+                writer.write_rows(rows)
+    finally:
+        writer.close()
+
+def apply_delta(folder:str, state:dict, delta:str, writer_class:type, high) -> dict:
+    """Adds the delta to the output of the saved query and saves the new watermark. Returns the new state.
+    csv and csv.gz outputs without key are appended in place, the others are rewritten whole on every run."""
+    runs = state["runs"] + 1
+    previous = os.path.join(folder, state["output"]) if state["output"] else None
+    output = f"incremental.{runs}.output.{writer_class.extension}"
+    if previous is None or state["value"] is None or not os.path.exists(previous):
+        # First run: the delta is the full extract
+        blob_store.link_or_copy(delta, os.path.join(folder, output))
+    elif state["key"]:
+        merge_by_key(writer_class, previous, delta, state["key"], os.path.join(folder, output))
+    elif writer_class in (output_writers.CsvWriter, output_writers.GzipCsvWriter):
+        output = state["output"]
+        append_csv(previous, delta, state["output_bytes"], compressed=writer_class is output_writers.GzipCsvWriter)
+    else:
+        writer_class.merge([previous, delta], os.path.join(folder, output))
+    new = {
+        **state,
+        "value": encode_value(high),
+        "output": output,
+        "output_bytes": os.path.getsize(os.path.join(folder, output)),
+        "runs": runs,
+        "updated": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    save_state(folder, new)
+    if previous is not None and output != state["output"] and os.path.exists(previous):
+        os.remove(previous)
+    return new
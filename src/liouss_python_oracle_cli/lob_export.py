@@ -0,0 +1,92 @@
+import os
+import re
+from typing import Optional
+
+LOB_FOLDER = "lobs"
+DEFAULT_LOB_CHUNK_BYTES = 1024 * 1024
+DEFAULT_LOB_INLINE_SIZE = 0
+DEFAULT_LOB_FETCH_SIZE = 100
+# Type of the LOB columns in the description given to the writers: the cells hold text references
+LOB_REFERENCE_TYPE = "LOB_FILE_REFERENCE"
+
+def lob_columns(description:list) -> dict[int, bool]:
+    """LOB columns of a cursor description by position, True for the binary ones (BLOB, BFILE)."""
+    columns = {}
+    for i, col in enumerate(description):
+        type_name = str(getattr(col[1], "name", col[1])).upper()
+        if "BLOB" in type_name or "BFILE" in type_name:
+            columns[i] = True
+        elif "CLOB" in type_name:
+            columns[i] = False
+    return columns
+
+def reference(path:str, length:int) -> str:
+    # Path relative to the task folder, length in bytes for binary LOBs and in characters for the others
+    return f"lob:{path}:{length}"
+
+def _is_locator(value) -> bool:
+    return hasattr(value, "read") and hasattr(value, "size")
+
+class LobSpool:
+    """Streams the LOB columns of the fetched rows to one file per value under <folder>/lobs/<sub_task_id>, read from
+    the locator in chunks of about chunk_bytes so that a LOB is never held in memory. The cell keeps reference(path, length);
+    LOBs of at most inline_size bytes (characters for CLOB) stay in the cell, hex encoded for binary ones."""
+
+    def __init__(self, folder:str, sub_task_id, description:list, chunk_bytes:int=DEFAULT_LOB_CHUNK_BYTES, inline_size:int=DEFAULT_LOB_INLINE_SIZE) -> None:
+        self.folder = folder
+        self.relative = os.path.join(LOB_FOLDER, str(sub_task_id))
+        self.columns = lob_columns(description)
+        self.names = {i: re.sub(r"\W", "_", str(description[i][0])) for i in self.columns}
+        self.description = [(col[0], LOB_REFERENCE_TYPE) + tuple(col[2:]) if i in self.columns else col for i, col in enumerate(description)]
+        self.chunk_bytes = max(int(chunk_bytes), 1)
+        self.inline_size = int(inline_size)
+        self.row = 0
+        self.files = 0
+        self.bytes = 0
+
+    def spool(self, rows:list) -> list:
+        spooled = []
+        for row in rows:
+            self.row += 1
+            row = list(row)
+            for i, binary in self.columns.items():
+                row[i] = self._cell(row[i], i, binary)
+            spooled.append(row)
+        return spooled
+
+    def _cell(self, value, column:int, binary:bool) -> Optional[str]:
+        if value is None:
+            return None
+        locator = _is_locator(value)
+        size = value.size() if locator else len(value)
+        if size <= self.inline_size:
+            data = value.read() if locator else value
+            return data.hex() if binary else data
+        # Row numbers start at 1 like in head/page
+        path = os.path.join(self.relative, f"{self.row}.{self.names[column]}.{'bin' if binary else 'txt'}")
+        full_path = os.path.join(self.folder, path)
+        if self.files == 0:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") if binary else open(full_path, "w", encoding="utf-8", newline="") as f:
+            if locator:
+                amount = self._amount(value)
+                offset = 1
+                while offset <= size:
+                    data = value.read(offset, amount)
+                    if not data:
+                        break
+                    f.write(data)
+                    offset += len(data)
+            else:
+                f.write(value)
+        self.files += 1
+        self.bytes += size
+        return reference(path, size)
+
+    def _amount(self, lob) -> int:
+        # A multiple of the LOB chunk size avoids reading the same database blocks twice
+        try:
+            chunk = int(lob.getchunksize())
+        except Exception:
+            return self.chunk_bytes
+        return max(self.chunk_bytes // chunk, 1) * chunk if chunk > 0 else self.chunk_bytes
@@ -1,51 +1,133 @@
+from __future__ import annotations
 import json
 import os
-from typing import Optional
+import sys
+from typing import Optional, TYPE_CHECKING
 from liouss_python_toolkit.printer import beautiful_print, GREEN_COLOR, ORANGE_COLOR, RED_COLOR, LIGHT_BLUE_COLOR, RESET_COLOR
 from liouss_python_toolkit.utility import edit_in_editor
 from liouss_python_toolkit.utility import real_path
-from liouss_python_sql_connectors.sql_connection import SQLConnection
-from liouss_python_sql_connectors import utils
 import cmd
 import traceback
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import datetime
 import csv
-import sqlparse
-from contextlib import nullcontext
+import io
+import re
+from contextlib import nullcontext, contextmanager
 import shlex
-from prompt_toolkit import prompt
-from prompt_toolkit.history import InMemoryHistory
-from pathlib import Path
 import shutil
+from liouss_python_oracle_cli.session_pool import SessionPool, SessionPoolTimeout, DEFAULT_POOL_MIN_SIZE, DEFAULT_POOL_MAX_SIZE, DEFAULT_POOL_IDLE_TIMEOUT
+from liouss_python_oracle_cli import output_writers
+from liouss_python_oracle_cli import task_metrics
+from liouss_python_oracle_cli import result_cache
+from liouss_python_oracle_cli import task_logger
+from liouss_python_oracle_cli import row_index
+from liouss_python_oracle_cli import lob_export
+from liouss_python_oracle_cli.task_registry import TaskRegistry, DEFAULT_TASK_HISTORY
+from liouss_python_oracle_cli.scheduler import TaskScheduler, DEFAULT_MAX_CONCURRENCY, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+import queue
+import time
+import threading
+from contextlib import ExitStack
+import weakref
+
+if TYPE_CHECKING:
+    from liouss_python_sql_connectors.sql_connection import SQLConnection
+    from liouss_python_oracle_cli import blob_store
 
 CONFIG_PATH = os.path.join(
     os.path.dirname(os.path.abspath(__file__)),
     "config.json"
 )
+ORACLE_ID_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "ORACLE_IDENTIFIER.json"
+)
+CONNECTION_TYPE = "oracle"
 DEFAULT_WORKSPACE = "default"
 DEFAULT_WORKSPACE_PATH = "~/oraclecli_default_workspace"
+DEFAULT_FETCH_SIZE = 10000
+DEFAULT_INSERT_BUFFER_SIZE = 50000
+DEFAULT_EXPORT_SESSIONS = 4
+DEFAULT_FANOUT_SESSIONS = 8
+DEFAULT_SESSION_WAIT_SECONDS = 600
+PREVIEW_BYTES = 1000
+FANOUT_MERGED = "fanout"
+EXPORT_MERGED = "export"
+FANOUT_PROFILE_COLUMN = "PROFILE"
+# Sub-tasks read by head/tail/page/grep/diff when none is given
+DEFAULT_SUB_TASKS = ("0", FANOUT_MERGED, EXPORT_MERGED)
 
-def copy_dir(path_a: str, path_b: str) -> None:
-    src = Path(path_a)
-    dst = Path(path_b)
+class TaskCancelled(Exception):
+    pass
 
-    if not src.is_dir():
-        raise NotADirectoryError(f"Source introuvable ou pas un dossier: {src}")
+CONNECTION_FACTORIES = {}
 
-    dst.mkdir(parents=True, exist_ok=True)
-    shutil.copytree(src, dst, dirs_exist_ok=True)
+def register_connection_type(connection_type:str, factory) -> None:
+    """factory(identifiers) is used instead of the connectors package for this connection type."""
+    CONNECTION_FACTORIES[connection_type] = factory
 
 def generateConnection(connection_type, identifiers) -> Optional[SQLConnection]:
+    if connection_type in CONNECTION_FACTORIES:
+        return CONNECTION_FACTORIES[connection_type](identifiers)
+    # Imported on first use: it loads the database drivers
+    from liouss_python_sql_connectors import utils
     return utils.generateConnection(connection_type, identifiers)
 
+def close_connection(connection:SQLConnection) -> None:
+    try:
+        connection.__exit__(None, None, None)
+    except Exception:
+        pass
+
+# SID and SERIAL# of each connection, a session keeps them for its whole life
+_session_identifiers = weakref.WeakKeyDictionary()
+_session_identifiers_lock = threading.Lock()
+
 def get_oracle_connection_identifiers(connection:SQLConnection):
+    try:
+        with _session_identifiers_lock:
+            cached = _session_identifiers.get(connection)
+    except TypeError:
+        cached = None
+    if cached is not None:
+        return cached
     identifiers = connection.query_one("""
         SELECT s.sid, s.serial#
         FROM v$session s
-        WHERE s.audsid = SYS_CONTEXT('USERENV','SESSIONID')
+        WHERE s.sid = SYS_CONTEXT('USERENV','SID')
     """)
-    return identifiers[0] if identifiers else None
+    identifiers = tuple(identifiers[0]) if identifiers else None
+    if identifiers is not None:
+        try:
+            with _session_identifiers_lock:
+                _session_identifiers[connection] = identifiers
+        except TypeError:
+            pass
+    return identifiers
+
+def stream_query(connection:SQLConnection, query:str, placeholders=None, fetch_size:int=DEFAULT_FETCH_SIZE, lob_fetch_size:Optional[int]=None):
+    cursor = connection.get_db().cursor()
+    try:
+        cursor.arraysize = fetch_size
+        if placeholders:
+            cursor.execute(query, list(placeholders))
+        else:
+            cursor.execute(query)
+        if cursor.description is None:
+            return
+        if lob_fetch_size and lob_export.lob_columns(cursor.description):
+            # Every LOB of a fetched row is read before the next fetch, smaller fetches keep fewer locators open
+            fetch_size = min(fetch_size, lob_fetch_size)
+            cursor.arraysize = fetch_size
+        yield cursor.description
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
 
 def open_config()->dict:
     with open(CONFIG_PATH, 'r') as f:
@@ -61,14 +143,25 @@ class OracleCmd(cmd.Cmd):
     def emptyline(self):
         return
     
-    def __init__(self, oracle_identifiers, connection:SQLConnection, connection_type, pool, completekey = "tab", stdin = None, stdout = None) -> None:
+    def default(self, line):
+        self.print_error(f"Unknown command: {line}")
+    
+    def __init__(self, oracle_identifiers, connection:SQLConnection, connection_type, pool:TaskScheduler, session_pool:Optional[SessionPool]=None, completekey = "tab", stdin = None, stdout = None) -> None:
         super().__init__(completekey, stdin, stdout)
         self.oracle_identifiers = oracle_identifiers
         self.connection = connection
+        # Opened and closed by the caller, the sessions opened after a detach are closed here
+        self.initial_connection = connection
         self.connection_type = connection_type
         self.pool = pool
-        self.tasks = dict()
-        self._history = InMemoryHistory()
+        self.session_pool = session_pool
+        self.result_cache = None
+        self.tasks = TaskRegistry()
+        # Sync tasks run one at a time on the main connection, in a thread so that Ctrl-C can detach from them
+        self.sync_executor = ThreadPoolExecutor(1, thread_name_prefix="sync-task")
+        self.interactive = False
+        self._history = None
+        self.command_failed = False
         self.workspace = DEFAULT_WORKSPACE
         self.workspace_config = {"path":DEFAULT_WORKSPACE_PATH}
         self.workspace_path = real_path(DEFAULT_WORKSPACE_PATH)
@@ -79,7 +172,7 @@ class OracleCmd(cmd.Cmd):
         self.last_submitted_content = None
         self.last_submitted_content_sync = None
         
-    def switch_workspace(self, workspace_name:str):
+    def switch_workspace(self, workspace_name:str, remember:bool=True):
         workspace_name = workspace_name.lower().strip(" \n\r\t")
         config = open_config()
         workspaces:dict = config["workspaces"]
@@ -90,13 +183,22 @@ class OracleCmd(cmd.Cmd):
         self.workspace_config = workspaces[workspace_name]
         self.workspace_path = real_path(workspaces[workspace_name]["path"])
         self.workspace = workspace_name
+        self.flush_cache()
+        self.result_cache = None
         os.makedirs(self.workspace_path, exist_ok=True)
+        self.tasks.set_index(self.workspace_path)
+        self.tasks.max_finished = int(self.workspace_config.get("task_history", DEFAULT_TASK_HISTORY))
         self.prompt = f"Ora:{self.workspace}> "
         self.query_save_path = os.path.join(self.workspace_path, "fav")
         os.makedirs(self.query_save_path, exist_ok=True)
+        self.pool.configure(
+            int(self.workspace_config.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)),
+            self.workspace_config.get("concurrency_limits", {}),
+        )
         
-        config["last_workspace"] = self.workspace
-        save_config(config)
+        if remember:
+            config["last_workspace"] = self.workspace
+            save_config(config)
         
         beautiful_print(f"switched to {workspace_name}")
     
@@ -108,8 +210,14 @@ class OracleCmd(cmd.Cmd):
         
         
     def cmdloop(self, intro=None):
+        # prompt_toolkit is only needed by the interactive prompt, "oracle run" does not pay for its import
+        from prompt_toolkit import prompt
+        from prompt_toolkit.history import InMemoryHistory
+        if self._history is None:
+            self._history = InMemoryHistory()
         if intro is not None:
             print(intro)
+        self.interactive = True
         stop = None
         while not stop:
             try:
@@ -121,168 +229,1272 @@ class OracleCmd(cmd.Cmd):
             stop = self.onecmd(line)
             stop = self.postcmd(stop, line)
 
-    def runscript_oracle(self, identifiers, script, task_id=None):
+    @contextmanager
+    def open_session(self, identifiers):
+        if self.session_pool is not None and identifiers == self.oracle_identifiers:
+            with self.session_pool.session() as connection:
+                yield connection
+            return
         connection = generateConnection(self.connection_type, identifiers)
-        queries = [s.strip() for s in sqlparse.split(script) if s.strip()]
         with connection or nullcontext():
-            self.query_oracle(identifiers, [query.strip(";\n\r ") for query in queries], False, task_id=task_id, default_connection=connection)
+            yield connection
+
+    @contextmanager
+    def open_sessions(self, identifiers, count, task_id=None):
+        """Yields count sessions taken together from the pool, or None if they could not be had before
+        session_wait_seconds or the task was cancelled. Taking them one by one, two tasks can each hold
+        part of the pool and wait forever for the rest."""
+        if self.session_pool is None or identifiers != self.oracle_identifiers:
+            with ExitStack() as sessions:
+                connections = [sessions.enter_context(self.open_session(identifiers)) for _ in range(count)]
+                yield None if any(connection is None for connection in connections) else connections
+            return
+        deadline = time.monotonic() + float(self.workspace_config.get("session_wait_seconds", DEFAULT_SESSION_WAIT_SECONDS))
+        connections = None
+        while connections is None and not self.is_cancelled(task_id):
+            try:
+                connections = self.session_pool.acquire_many(count, timeout=max(0, min(1, deadline - time.monotonic())))
+            except SessionPoolTimeout:
+                if time.monotonic() >= deadline:
+                    break
+        if connections is None:
+            yield None
+            return
+        failed = False
+        try:
+            yield connections
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.session_pool.release_many(connections, failed)
+
+    def runscript_oracle(self, identifiers, script, task_id=None, sync=False, default_connection=None):
+        import sqlparse
+        queries = [s.strip() for s in sqlparse.split(script) if s.strip()]
+        start = time.perf_counter()
+        with self.open_session(identifiers) if default_connection is None else nullcontext(default_connection) as connection:
+            if connection is None:
+                self.mark_failed(task_id, "could not open a session")
+                return
+            if task_id is not None and default_connection is None:
+                self.get_metrics(task_id).set("connect_seconds", time.perf_counter() - start)
+            self.query_oracle(identifiers, [query.strip(";\n\r ") for query in queries], False, task_id=task_id, sync=sync, default_connection=connection)
+    
+    def runscript_parallel(self, identifiers, script, lanes, task_id=None, sync=False, default_connection=None):
+        import sqlparse
+        from liouss_python_oracle_cli import script_plan
+        if task_id is None:
+            task_id = "NOT_A_TASK"
+        if self.session_pool is not None and lanes > self.session_pool.max_size:
+            lanes = self.session_pool.max_size
+        queries = [query.strip().strip(";\n\r ") for query in sqlparse.split(script) if query.strip()]
+        phases = script_plan.plan_script(queries)
+        writer_class = output_writers.get_output_writer(self.workspace_config.get("output_format"))
+        save_folder = self.get_query_save_folder_path(task_id)
+        os.makedirs(save_folder, exist_ok=True)
+        plan_file = os.path.join(save_folder, "plan.txt")
+        for phase in phases:
+            if phase.barrier is not None:
+                self.task_log(task_id, f"barrier: {phase.barrier.index}", log=plan_file, log_only=True)
+            else:
+                self.task_log(task_id, f"parallel: {' | '.join(','.join(str(st.index) for st in group) for group in phase.groups)}", log=plan_file, log_only=True)
+        
+        start = time.perf_counter()
+        with self.open_sessions(identifiers, lanes, task_id) as connections:
+            if connections is None:
+                if not self.is_cancelled(task_id):
+                    self.mark_failed(task_id, f"could not get {lanes} sessions")
+                return
+            self.get_metrics(task_id).set("connect_seconds", time.perf_counter() - start)
+            self.tasks[task_id]["connection"] = connections[0]
+            self.tasks[task_id]["connections"] = connections
+            # table -> lane holding uncommitted changes on it, later statements touching the table must run on that lane
+            dirty = {}
+            
+            def affinity(statements):
+                lanes_used = {dirty[t] for st in statements for t in st.reads | st.writes if t in dirty}
+                return min(lanes_used) if lanes_used else None
+            
+            def executed(lane, statement):
+                if statement.kind == "ddl":
+                    # DDL commits the session's transaction
+                    for table in [t for t, l in dirty.items() if l == lane]:
+                        del dirty[table]
+                if statement.kind in ("dml", "ddl", "plsql", "parallel", "other"):
+                    for table in statement.writes:
+                        dirty[table] = lane
+            
+            def run_lane(lane, statements):
+                for statement in statements:
+                    if self.is_cancelled(task_id):
+                        return False
+                    if not self.run_statement(connections[lane], statement.sql, statement.index, task_id, sync, None, writer_class):
+                        return False
+                return True
+            
+            with ThreadPoolExecutor(lanes) as executor:
+                for phase in phases:
+                    if phase.barrier is not None:
+                        statement = phase.barrier
+                        if statement.kind == "transaction":
+                            if not self.run_statement(connections[0], statement.sql, statement.index, task_id, sync, None, writer_class):
+                                return
+                            is_commit = statement.sql.strip().upper().startswith("COMMIT")
+                            for connection in connections[1:]:
+                                if is_commit:
+                                    connection.get_db().commit()
+                                else:
+                                    connection.get_db().rollback()
+                            dirty.clear()
+                            continue
+                        lane = affinity([statement]) or 0
+                        if not run_lane(lane, [statement]):
+                            return
+                        executed(lane, statement)
+                        continue
+                    
+                    assignments = [[] for _ in range(lanes)]
+                    loads = [0] * lanes
+                    for group in sorted(phase.groups, key=len, reverse=True):
+                        lane = affinity(group)
+                        if lane is None:
+                            lane = loads.index(min(loads))
+                        assignments[lane].extend(group)
+                        loads[lane] += len(group)
+                    futures = {}
+                    for lane, statements in enumerate(assignments):
+                        if statements:
+                            statements.sort(key=lambda st: st.index)
+                            futures[executor.submit(run_lane, lane, statements)] = lane
+                    results = [future.result() for future in futures]
+                    for future, lane in futures.items():
+                        for statement in assignments[lane]:
+                            executed(lane, statement)
+                    if not all(results):
+                        return
     
     def get_query_save_folder_path(self, taskid):
         today_str = datetime.date.today().strftime("%Y_%m_%d")
         return os.path.join(self.workspace_path, "queries", today_str, str(taskid))
     
-    def query_oracle(self, identifiers, queries:list[str], commit:bool, task_id=None, sync=False, default_connection=None, placeholders=None):
-        if default_connection is not None:
-            connection = default_connection
-        else:
-            connection = generateConnection(self.connection_type, identifiers)
+    def print_first_rows(self, task_id, columns, rows) -> int:
+        """Prints the header and about PREVIEW_BYTES of rows as csv. Returns the number of rows printed."""
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow(columns)
+        shown = 0
+        for row in rows:
+            if text.tell() >= PREVIEW_BYTES:
+                break
+            writer.writerow(row)
+            shown += 1
+        self.task_log(task_id, "")
+        self.task_log(task_id, text.getvalue().rstrip("\r\n"), color=LIGHT_BLUE_COLOR)
+        self.task_log(task_id, "")
+        return shown
+    
+    def print_result_preview(self, output_file, writer_class):
+        text = writer_class.open_text(output_file)
+        if text is None:
+            beautiful_print(f"Result written to {output_file}")
+            return
+        with text as f:
+            readlines = f.readlines(1000)
+            if len(readlines) > 0:
+                beautiful_print("")
+                for line in readlines:
+                    beautiful_print(line.strip(" \n\r\t"), color=LIGHT_BLUE_COLOR)
+                beautiful_print("")
+            if f.read(1):
+                beautiful_print("...")
+                beautiful_print(f"Open file {output_file} or use head/tail/page/grep to access complete result")
+    
+    def get_result_cache(self) -> result_cache.ResultCache:
+        if self.result_cache is None:
+            self.result_cache = result_cache.ResultCache(
+                os.path.join(self.workspace_path, "cache"),
+                ttl=float(self.workspace_config.get("cache_ttl", result_cache.DEFAULT_CACHE_TTL)),
+                max_bytes=int(self.workspace_config.get("cache_max_bytes", result_cache.DEFAULT_CACHE_MAX_BYTES)),
+            )
+        return self.result_cache
+    
+    def flush_cache(self):
+        if self.result_cache is not None:
+            self.result_cache.flush()
+    
+    def get_blob_store(self) -> blob_store.BlobStore:
+        from liouss_python_oracle_cli import blob_store
+        return blob_store.BlobStore(os.path.join(self.workspace_path, blob_store.BLOB_FOLDER))
+    
+    def serve_from_cache(self, key, query, task_id, sync, writer_class, scns=None) -> bool:
+        cache = self.get_result_cache()
+        entry = cache.lookup(key)
+        if entry is None:
+            return False
+        if scns is not None and entry["scns"] != scns:
+            cache.invalidate(key)
+            return False
+        save_folder = self.get_query_save_folder_path(task_id)
+        os.makedirs(save_folder, exist_ok=True)
+        log_file = os.path.join(save_folder, "0.log.txt")
+        output_file = os.path.join(save_folder, f"0.output.{writer_class.extension}")
+        result_cache.link_file(entry["path"], output_file)
+        with open(os.path.join(save_folder, "query.sql"), "w") as f:
+            f.write(query)
+        self.get_metrics(task_id).record(0, {"cache": "hit", "rows": entry["rows"], "age_seconds": round(time.time() - entry["created"], 3)})
+        self.task_log(task_id, f"Query 0 served from cache ({entry['rows']} rows, {time.time() - entry['created']:.0f}s old).", log_only=(not sync), log=log_file)
+        self.last_submitted_content = query
+        self.last_submitted_content_sync = sync
+        self.last_query = save_folder
+        self.last_query_content = query
+        if sync:
+            self.print_result_preview(output_file, writer_class)
+        return True
+    
+    def query_oracle(self, identifiers, queries:list[str], commit:bool, task_id=None, sync=False, default_connection=None, placeholders=None, output_format=None, cache="auto"):
+        from liouss_python_oracle_cli import script_plan
+        writer_class = output_writers.get_output_writer(output_format or self.workspace_config.get("output_format"))
+        if task_id is None:
+            task_id = "NOT_A_TASK"
+        
+        key = None
+        # Only single read-only queries: the statements of a script or an explain plan depend on each other
+        if cache != "off" and len(queries) == 1 and not commit and result_cache.is_cacheable(queries[0]) and self.get_result_cache().enabled:
+            identity = json.dumps([self.connection_type, identifiers], sort_keys=True, default=str)
+            key = result_cache.cache_key(queries[0], placeholders, identity, writer_class.extension)
+        validate = key is not None and self.workspace_config.get("cache_validation") == "rowscn"
+        if key is not None and cache == "auto" and not validate and self.serve_from_cache(key, queries[0], task_id, sync, writer_class):
+            return
+        
+        start = time.perf_counter()
+        with self.open_session(identifiers) if default_connection is None else nullcontext(default_connection) as connection:
             if connection is None:
+                self.mark_failed(task_id, "could not open a session")
                 return
-            
-        with connection if not default_connection else nullcontext():
+            if default_connection is None:
+                self.get_metrics(task_id).set("connect_seconds", time.perf_counter() - start)
+            scns = None
+            if validate:
+                # Read before running the query so that changes made while it runs invalidate the entry
+                scns = result_cache.tables_scn(connection, script_plan.Statement(0, queries[0]).reads)
+                if scns is None:
+                    key = None
+                elif cache == "auto" and self.serve_from_cache(key, queries[0], task_id, sync, writer_class, scns):
+                    return
             for sub_task_id, query in enumerate(queries):
-                query = query.strip("\n\r")
-                self.last_submitted_content = query
-                self.last_submitted_content_sync = sync
-                if task_id is None:
-                    task_id = "NOT_A_TASK"
-                try:    
-                    self.tasks[task_id]["connection"] = connection
-                    if connection:
-                        self.tasks[task_id]["SID"],self.tasks[task_id]["SERIAL"] = get_oracle_connection_identifiers(connection) or ("NULL","NULL")
-                    
-                    save_folder = self.get_query_save_folder_path(task_id)
-                    os.makedirs(save_folder, exist_ok=True)
-                    output_file = os.path.join(save_folder, f"{sub_task_id}.output.csv")
-                    sql_file = os.path.join(save_folder, f"query.sql")
-                    log_file = os.path.join(save_folder, f"{sub_task_id}.log.txt")
-                    
-                    try:
-                        if not placeholders:
-                            beautiful_print(f"Executing query:\n================\n{query}\n================", log_only=True, log=log_file)
-                            result = connection.query_one(query, print_error=False, ignore_errors=False, include_col_name=True)
-                        else:
-                            beautiful_print(f"Executing query:\n================\n{query}\n{placeholders}\n================", log_only=True, log=log_file)
-                            result = connection.query_one(query, placeholders, print_error=False, ignore_errors=False, include_col_name=True)
-                        beautiful_print(f"Query {sub_task_id} complete.", log_only=(not sync), log=log_file)
-                        self.last_query = save_folder
-                        self.last_query_content = query
-                    except Exception as e:
-                        beautiful_print(f"Error executing query: {query}", log_only=(not sync), log=log_file, color=RED_COLOR)
-                        stack = "".join(traceback.format_exception(type(e), e, e.__traceback__))
-                        beautiful_print(stack, log_only=(not sync), log=log_file, color=RED_COLOR)
-                        return
-                        
-                    with open(output_file, "w", newline="") as f:
-                        csv.writer(f).writerows(result or [])
-                    with open(sql_file, "w") as f:
-                        f.write(query)
-                    if sync:
-                        with open(output_file, "r",) as f:
-                            readlines = f.readlines(1000)
-                            if len(readlines) > 0:
-                                beautiful_print("")
-                                for line in readlines:
-                                    beautiful_print(line.strip(" \n\r\t"), color=LIGHT_BLUE_COLOR)
-                                beautiful_print("")
-                            if f.read(1):
-                                beautiful_print("...")
-                                beautiful_print(f"Open file {output_file} to access complete result")
-                        
-                except Exception as e:
-                    beautiful_print(f"Error executing query: {task_id}/{sub_task_id}", log_only=(not sync), log=log_file, color=RED_COLOR)
-                    stack = "".join(traceback.format_exception(type(e), e, e.__traceback__))
-                    beautiful_print(stack, log_only=(not sync), log=log_file, color=RED_COLOR)
+                self.tasks[task_id]["connection"] = connection
+                if not self.run_statement(connection, query, sub_task_id, task_id, sync, placeholders, writer_class, cache_key=key, scns=scns):
                     return
-        if commit:
-            connection.get_db().commit()
+            if commit:
+                connection.get_db().commit()
 
-    def insert_many(self, identifiers, file_path, table_name, buffer_size, task_id=None, sub_task_id=0, default_connection=None):
+    def rerun_incremental(self, identifiers, saved_folder, task_id=None, sync=False, default_connection=None):
+        from liouss_python_oracle_cli import incremental
         if task_id is None:
             task_id = "NOT_A_TASK"
+        state = incremental.load_state(saved_folder)
+        with open(os.path.join(saved_folder, "query.sql"), "r") as f:
+            query = f.read().strip(";\n\r\t ")
+        writer_class = output_writers.get_output_writer(state["format"])
+        save_folder = self.get_query_save_folder_path(task_id)
+        os.makedirs(save_folder, exist_ok=True)
+        log_file = os.path.join(save_folder, "0.log.txt")
+        start = time.perf_counter()
+        with self.open_session(identifiers) if default_connection is None else nullcontext(default_connection) as connection:
+            if connection is None:
+                self.mark_failed(task_id, "could not open a session")
+                return
+            if default_connection is None:
+                self.get_metrics(task_id).set("connect_seconds", time.perf_counter() - start)
+            self.tasks[task_id]["connection"] = connection
+            try:
+                low = incremental.decode_value(state["value"])
+                high = incremental.high_watermark(connection, query, state["column"], low)
+            except Exception as e:
+                self.task_log(task_id, f"Error reading the watermark {state['column']}", log_only=(not sync), log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+                self.mark_failed(task_id, e)
+                stack = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+                self.task_log(task_id, stack, log_only=(not sync), log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+                return
+            if high is None:
+                self.task_log(task_id, f"No new rows since {state['column']} = {low}.", log_only=(not sync), log=log_file)
+                return
+            delta_sql, binds = incremental.delta_query(query, state["column"], low, high)
+            if not self.run_statement(connection, delta_sql, 0, task_id, sync, binds, writer_class):
+                return
+        rows = self.get_metrics(task_id).data["sub_tasks"].get("0", {}).get("rows")
         try:
-            if default_connection is not None:
-                connection = default_connection
-            else:
-                connection = generateConnection(self.connection_type, identifiers)
+            state = incremental.apply_delta(saved_folder, state, os.path.join(save_folder, f"0.output.{writer_class.extension}"), writer_class, high)
+        except Exception as e:
+            self.task_log(task_id, f"Error updating {saved_folder}, the watermark was not moved", log_only=(not sync), log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+            self.mark_failed(task_id, e)
+            stack = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+            self.task_log(task_id, stack, log_only=(not sync), log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+            return
+        self.task_log(task_id, f"{rows} new rows up to {state['column']} = {high}, saved in {os.path.join(saved_folder, state['output'])}", log_only=(not sync), log=log_file)
+
+    def run_statement(self, connection, query:str, sub_task_id, task_id, sync, placeholders, writer_class, cache_key=None, scns=None, deadline=None) -> bool:
+        query = query.strip("\n\r")
+        self.last_submitted_content = query
+        self.last_submitted_content_sync = sync
+        save_folder = self.get_query_save_folder_path(task_id)
+        log_file = os.path.join(save_folder, f"{sub_task_id}.log.txt")
+        metrics = task_metrics.SubTaskMetrics()
+        if cache_key is not None:
+            metrics.set("cache", "miss")
+        try:
+            session = ("NULL","NULL")
+            if connection:
+                session = get_oracle_connection_identifiers(connection) or ("NULL","NULL")
+                self.tasks[task_id]["SID"],self.tasks[task_id]["SERIAL"] = session
+            stats_before = self.read_session_stats(connection, session[0])
+            
+            os.makedirs(save_folder, exist_ok=True)
+            output_file = os.path.join(save_folder, f"{sub_task_id}.output.{writer_class.extension}")
+            sql_file = os.path.join(save_folder, f"query.sql")
+            
+            fetch_size = int(self.workspace_config.get("fetch_size", DEFAULT_FETCH_SIZE))
+            lob_fetch_size = int(self.workspace_config.get("lob_fetch_size", lob_export.DEFAULT_LOB_FETCH_SIZE))
+            try:
+                if not placeholders:
+                    self.task_log(task_id, f"Executing query:\n================\n{query}\n================", log_only=True, log=log_file)
+                else:
+                    self.task_log(task_id, f"Executing query:\n================\n{query}\n{placeholders}\n================", log_only=True, log=log_file)
+                row_count = 0
+                writer = None
+                lobs = None
+                shown = None
+                chunks = stream_query(connection, query, placeholders, fetch_size, lob_fetch_size)
+                try:
+                    # The generator executes the query before yielding the description, then fetches one chunk per step
+                    description = metrics.timed("execute_seconds", next, chunks, None)
+                    if description is not None and lob_export.lob_columns(description):
+                        lobs = lob_export.LobSpool(
+                            save_folder,
+                            sub_task_id,
+                            description,
+                            chunk_bytes=int(self.workspace_config.get("lob_chunk_bytes", lob_export.DEFAULT_LOB_CHUNK_BYTES)),
+                            inline_size=int(self.workspace_config.get("lob_inline_size", lob_export.DEFAULT_LOB_INLINE_SIZE)),
+                        )
+                        description = lobs.description
+                    if description is not None:
+                        writer = metrics.timed("write_seconds", writer_class, output_file, description)
+                    while writer is not None:
+                        rows = metrics.timed("fetch_seconds", next, chunks, None)
+                        if rows is None:
+                            break
+                        if row_count == 0:
+                            metrics.set("first_row_seconds", metrics.elapsed())
+                        self.raise_if_cancelled(task_id)
+                        if deadline is not None and time.monotonic() > deadline:
+                            raise TimeoutError(f"sub-task {sub_task_id} timed out")
+                        if lobs is not None:
+                            rows = metrics.timed("lob_seconds", lobs.spool, rows)
+                        if sync and shown is None:
+                            # The first page is shown from the first fetch, the rest is fetched and written meanwhile
+                            shown = self.print_first_rows(task_id, writer.columns, rows)
+                        metrics.timed("write_seconds", writer.write_rows, rows)
+                        row_count += len(rows)
+                        self.get_logger(task_id).progress(f"Fetched {row_count} rows", log_file)
+                finally:
+                    chunks.close()
+                    if writer is not None:
+                        metrics.timed("write_seconds", writer.close)
+                if lobs is not None:
+                    metrics.set("lob_files", lobs.files)
+                    metrics.set("lob_bytes", lobs.bytes)
+                if lobs is not None and lobs.files:
+                    self.task_log(task_id, f"{lobs.files} LOB values written to {os.path.join(save_folder, lob_export.LOB_FOLDER)}", log_only=(not sync), log=log_file)
+                if writer is not None:
+                    metrics.set("bytes_written", os.path.getsize(output_file))
+                    # The cache keeps the output file only, not the LOB files it references
+                    if cache_key is not None and (lobs is None or lobs.files == 0):
+                        self.get_result_cache().store(cache_key, output_file, row_count, scns)
+                metrics.set("session_stats", task_metrics.session_stats_delta(stats_before, self.read_session_stats(connection, session[0])))
+                self.get_metrics(task_id).record(sub_task_id, metrics.finish(row_count))
+                if sync and writer is not None:
+                    if shown is None:
+                        self.print_first_rows(task_id, writer.columns, [])
+                    elif row_count > shown:
+                        self.task_log(task_id, "...")
+                        self.task_log(task_id, f"Open file {output_file} or use head/tail/page/grep to access complete result")
+                self.task_log(task_id, f"Query {sub_task_id} complete ({row_count} rows).", log_only=(not sync), log=log_file)
+                self.last_query = save_folder
+                self.last_query_content = query
+            except Exception as e:
+                metrics.set("error", str(e).strip())
+                self.get_metrics(task_id).record(sub_task_id, metrics.finish(row_count))
+                if self.is_cancelled(task_id):
+                    self.task_log(task_id, f"Query {sub_task_id} cancelled: {self.tasks[task_id]['cancelled']}", log_only=(not sync), log=log_file, color=ORANGE_COLOR, level=task_logger.WARNING)
+                    return False
+                self.task_log(task_id, f"Error executing query: {query}", log_only=(not sync), log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+                self.mark_failed(task_id, e)
+                stack = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+                self.task_log(task_id, stack, log_only=(not sync), log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+                return False
+                
+            with open(sql_file, "w") as f:
+                f.write(query)
+            return True
+                
+        except Exception as e:
+            self.task_log(task_id, f"Error executing query: {task_id}/{sub_task_id}", log_only=(not sync), log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+            self.mark_failed(task_id, e)
+            stack = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+            self.task_log(task_id, stack, log_only=(not sync), log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+            return False
+
+    def get_metrics(self, task_id) -> task_metrics.MetricsFile:
+        task = self.tasks[task_id]
+        if "metrics" not in task:
+            task.setdefault("metrics", task_metrics.MetricsFile(self.get_query_save_folder_path(task_id), task_id, task["description"]))
+        return task["metrics"]
+    
+    def get_logger(self, task_id) -> task_logger.TaskLogger:
+        task = self.tasks[task_id]
+        if "logger" not in task:
+            level = task_logger.LOG_LEVELS.get(str(self.workspace_config.get("log_level", "info")).lower(), task_logger.INFO)
+            interval = float(self.workspace_config.get("log_progress_seconds", task_logger.DEFAULT_PROGRESS_INTERVAL))
+            task.setdefault("logger", task_logger.TaskLogger(level, interval))
+        return task["logger"]
+    
+    def task_log(self, task_id, message, color=None, log=None, log_only=False, level=task_logger.INFO):
+        # Same arguments as beautiful_print, the log file is written by a background thread. A detached sync task stops printing
+        if self.tasks[task_id].get("detached"):
+            log_only = True
+        self.get_logger(task_id).write(message, color=color, log=log, log_only=log_only, level=level)
+
+    def read_session_stats(self, connection, sid) -> Optional[dict]:
+        # Off by default: needs SELECT on V$SESSTAT/V$SESS_TIME_MODEL and costs two round trips per statement
+        if not connection or sid == "NULL" or not self.workspace_config.get("session_stats", False):
+            return None
+        return task_metrics.read_session_stats(connection, sid)
+
+    def insert_many(self, identifiers, file_path, table_name, buffer_size, adaptive=False, fast=False, append=False, task_id=None, sub_task_id=0, sync=False, default_connection=None):
+        from liouss_python_oracle_cli import bulk_load
+        if task_id is None:
+            task_id = "NOT_A_TASK"
+        log_file = None
+        metrics = task_metrics.SubTaskMetrics()
+        try:
+            with self.open_session(identifiers) if default_connection is None else nullcontext(default_connection) as connection:
                 if connection is None:
+                    self.mark_failed(task_id, "could not open a session")
                     return
-            
-            with connection if not default_connection else nullcontext():
+                if default_connection is None:
+                    metrics.set("connect_seconds", metrics.elapsed())
                 
                 self.tasks[task_id]["connection"] = connection
+                session = ("NULL","NULL")
                 if connection:
-                    self.tasks[task_id]["SID"],self.tasks[task_id]["SERIAL"] = get_oracle_connection_identifiers(connection) or ("NULL","NULL")
+                    session = get_oracle_connection_identifiers(connection) or ("NULL","NULL")
+                    self.tasks[task_id]["SID"],self.tasks[task_id]["SERIAL"] = session
+                stats_before = self.read_session_stats(connection, session[0])
                 
                 save_folder = self.get_query_save_folder_path(task_id)
                 os.makedirs(save_folder, exist_ok=True)
                 log_file = os.path.join(save_folder, f"{sub_task_id}.log.txt")
                 
-                beautiful_print(f"Inserting file:\n{file_path}", log_only=True, log=log_file)
+                self.task_log(task_id, f"Inserting file:\n{file_path}", log_only=True, log=log_file)
                 
+                inserter = None
+                rejects = None
+                inserted = 0
                 try:
                     with open(file_path, newline="", encoding="utf-8") as f:
-                        reader = csv.reader(f, delimiter=",", quotechar='"', escapechar="\\")
+                        reader = csv.reader(f, **bulk_load.CSV_DIALECT)
                         header = next(reader)
-
-                        cols = " , ".join(header)
-                        binds = " , ".join(f":{i}" for i in range(1, len(header) + 1))
-                        sql = f"INSERT INTO {table_name} ({cols}) VALUES ({binds})"
-
-                        batch = []
-                        for i,row in enumerate(reader):
-                            row = [None if v == "" else v for v in row]
-
-                            batch.append(row)
-                            if len(batch) >= buffer_size:
-                                connection.query_many(sql, batch, ignore_errors=False, print_error=False)
-                                batch.clear()
-                                beautiful_print(f"Inserted {i+1} lines", log=log_file, log_only=True)
-
-                        if batch:
-                            connection.query_many(sql, batch, ignore_errors=False, print_error=False)
-                            beautiful_print(f"Inserted {i+1} lines", log=log_file, log_only=True)
+                        sql = bulk_load.build_insert_sql(table_name, header, hint="APPEND_VALUES" if append else None)
+                        if fast:
+                            inserter = bulk_load.TypedInserter(connection, table_name, header, bulk_load.fetch_table_columns(connection, table_name), append=append)
+                            rejects = bulk_load.RejectFile(os.path.join(save_folder, f"{sub_task_id}.rejected.csv"), header)
+                            self.task_log(task_id, f"Fast load, binding as: {inserter.input_sizes}", log=log_file, log_only=True, level=task_logger.DEBUG)
+                        if append:
+                            self.task_log(task_id, f"Direct-path insert: committing after each batch{', rows rejected by the database fail the load' if fast else ''}", log=log_file, log_only=True)
+                        
+                        # A parser thread keeps PIPELINE_DEPTH batches ready while this thread waits on the database
+                        sizer = bulk_load.AdaptiveBatchSizer(
+                            buffer_size,
+                            target_seconds=float(self.workspace_config.get("insert_target_seconds", bulk_load.DEFAULT_TARGET_ROUND_TRIP)),
+                            memory_cap=int(self.workspace_config.get("insert_memory_cap_bytes", bulk_load.DEFAULT_LOAD_MEMORY_CAP)),
+                            adaptive=adaptive,
+                        )
+                        batches = queue.Queue(maxsize=bulk_load.PIPELINE_DEPTH)
+                        stop = threading.Event()
+                        producer = threading.Thread(target=bulk_load.produce_batches, args=(reader, sizer, batches, stop, inserter and inserter.convert, rejects and rejects.write), daemon=True)
+                        producer.start()
+                        
+                        try:
+                            while True:
+                                item = metrics.timed("read_wait_seconds", batches.get)
+                                if item is None:
+                                    break
+                                if isinstance(item, BaseException):
+                                    raise item
+                                batch, sources = item
+                                self.raise_if_cancelled(task_id)
+                                start = time.perf_counter()
+                                if inserter is not None:
+                                    errors = inserter.insert(batch)
+                                    for offset, message in errors:
+                                        rejects.write(sources[offset], message)
+                                    if errors:
+                                        self.task_log(task_id, f"{len(errors)} rows rejected, first: {errors[0][1]}", log=log_file, log_only=True, color=ORANGE_COLOR, level=task_logger.WARNING)
+                                else:
+                                    errors = []
+                                    connection.query_many(sql, batch, ignore_errors=False, print_error=False)
+                                elapsed = time.perf_counter() - start
+                                if append:
+                                    # A direct-path insert must be committed before the table can be modified again
+                                    metrics.timed("commit_seconds", connection.get_db().commit)
+                                metrics.add("insert_seconds", elapsed)
+                                metrics.set("batches", metrics.values.get("batches", 0) + 1)
+                                inserted += len(batch) - len(errors)
+                                # The csv rows kept for the reject file stay in memory with the batch
+                                sizer.record(len(batch), elapsed, bulk_load.estimate_row_bytes(batch) + (bulk_load.estimate_row_bytes(sources) if sources else 0))
+                                self.get_logger(task_id).progress(f"Inserted {inserted} lines ({len(batch)} in {elapsed:.2f}s, next batch {sizer.size})", log_file)
+                        finally:
+                            stop.set()
+                            producer.join()
                             
-                        connection.query_one("commit")
-                        beautiful_print(f"Inserted {i+1} lines", log=log_file, log_only=True)
-                        beautiful_print(f"Commit.", log=log_file, log_only=True)
+                        metrics.timed("commit_seconds", connection.query_one, "commit")
+                        metrics.set("bytes_read", os.path.getsize(file_path))
+                        metrics.set("rejected", rejects.count if rejects is not None else 0)
+                        metrics.set("session_stats", task_metrics.session_stats_delta(stats_before, self.read_session_stats(connection, session[0])))
+                        self.get_metrics(task_id).record(sub_task_id, metrics.finish(inserted))
+                        self.task_log(task_id, f"Inserted {inserted} lines", log=log_file, log_only=True)
+                        if rejects is not None and rejects.count:
+                            self.task_log(task_id, f"Rejected {rejects.count} lines, see {rejects.path}", log=log_file, log_only=True, color=ORANGE_COLOR, level=task_logger.WARNING)
+                        self.task_log(task_id, f"Commit.", log=log_file, log_only=True)
                             
                 except Exception as e:
-                    beautiful_print(f"Inserting file: {file_path}", log_only=True, log=log_file, color=RED_COLOR)
+                    metrics.set("error", str(e).strip())
+                    self.get_metrics(task_id).record(sub_task_id, metrics.finish(inserted))
+                    if self.is_cancelled(task_id):
+                        self.task_log(task_id, f"Insert cancelled: {self.tasks[task_id]['cancelled']}", log_only=True, log=log_file, color=ORANGE_COLOR, level=task_logger.WARNING)
+                        return
+                    self.task_log(task_id, f"Inserting file: {file_path}", log_only=True, log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+                    self.mark_failed(task_id, e)
                     stack = "".join(traceback.format_exception(type(e), e, e.__traceback__))
-                    beautiful_print(stack, log_only=True, log=log_file, color=RED_COLOR)
+                    self.task_log(task_id, stack, log_only=True, log=log_file, color=RED_COLOR, level=task_logger.ERROR)
                     return
+                finally:
+                    if inserter is not None:
+                        inserter.close()
+                    if rejects is not None:
+                        rejects.close()
                 
                 
                 connection.get_db().commit()
         except Exception as e:
-            beautiful_print(f"Error executing query: {task_id}", log_only=True, log=log_file, color=RED_COLOR)
+            self.task_log(task_id, f"Error executing query: {task_id}", log_only=True, log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+            self.mark_failed(task_id, e)
             stack = "".join(traceback.format_exception(type(e), e, e.__traceback__))
-            beautiful_print(stack, log_only=True, log=log_file, color=RED_COLOR)
+            self.task_log(task_id, stack, log_only=True, log=log_file, color=RED_COLOR, level=task_logger.ERROR)
 
-    def start_task(self, description:str, func, sync, *args, **kwargs):
+    def insert_many_parallel(self, identifiers, file_path, table_name, buffer_size, workers, commit_mode="end", fast=False, append=False, task_id=None, sub_task_id=0, sync=False, default_connection=None):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from liouss_python_oracle_cli import bulk_load
+        if task_id is None:
+            task_id = "NOT_A_TASK"
+        save_folder = self.get_query_save_folder_path(task_id)
+        os.makedirs(save_folder, exist_ok=True)
+        log_file = os.path.join(save_folder, f"{sub_task_id}.log.txt")
+        
+        if self.session_pool is not None and workers > self.session_pool.max_size:
+            self.task_log(task_id, f"Limiting workers to session pool max_size ({self.session_pool.max_size})", log=log_file, log_only=True, color=ORANGE_COLOR, level=task_logger.WARNING)
+            workers = self.session_pool.max_size
+        
+        self.task_log(task_id, f"Inserting file:\n{file_path}\nworkers={workers} batch={buffer_size} commit={commit_mode}", log_only=True, log=log_file)
+        if append:
+            self.task_log(task_id, "Direct-path insert: committing after each batch, sessions will wait on each other for the table lock", log=log_file, log_only=True, color=ORANGE_COLOR, level=task_logger.WARNING)
+        
+        rejects = None
+        metrics = task_metrics.SubTaskMetrics()
+        metrics.set("workers", workers)
+        inserted = [0]
+        try:
+            header, data_start = bulk_load.read_csv_header(file_path)
+            chunk_bytes = int(self.workspace_config.get("load_chunk_bytes", bulk_load.DEFAULT_CHUNK_BYTES))
+            chunks = bulk_load.split_csv_chunks(file_path, data_start, chunk_bytes)
+            sql = bulk_load.build_insert_sql(table_name, header, hint="APPEND_VALUES" if append else None)
+            columns = None
+            if fast:
+                rejects = bulk_load.RejectFile(os.path.join(save_folder, f"{sub_task_id}.rejected.csv"), header)
+            
+            parsed = queue.Queue(maxsize=workers)
+            failed = threading.Event()
+            progress_lock = threading.Lock()
+            
+            def hand_over(rows):
+                # Blocks until a lane takes the rows, fails if a lane died meanwhile
+                while True:
+                    for f in lane_futures:
+                        if f.done():
+                            f.result()
+                            raise RuntimeError("an insert lane stopped early")
+                    try:
+                        parsed.put(rows, timeout=1)
+                        return
+                    except queue.Full:
+                        continue
+            
+            def stop_lanes():
+                for _ in lane_futures:
+                    while not all(f.done() for f in lane_futures):
+                        try:
+                            parsed.put(None, timeout=1)
+                            break
+                        except queue.Full:
+                            continue
+            
+            def convert_rows(inserter, rows):
+                # Also returns the csv rows that converted, written as read when the database rejects them
+                converted = []
+                sources = []
+                for row in rows:
+                    try:
+                        converted.append(inserter.convert(row))
+                        sources.append(row)
+                    except ValueError as e:
+                        rejects.write(row, f"conversion error: {e}")
+                return converted, sources
+            
+            def insert_lane(connection):
+                inserter = bulk_load.TypedInserter(connection, table_name, header, columns, append=append) if fast else None
+                try:
+                    while True:
+                        rows = parsed.get()
+                        if rows is None or failed.is_set():
+                            return
+                        self.raise_if_cancelled(task_id)
+                        if inserter is not None:
+                            rows, sources = convert_rows(inserter, rows)
+                        rejected = 0
+                        start = time.perf_counter()
+                        for i in range(0, len(rows), buffer_size):
+                            batch = rows[i:i+buffer_size]
+                            if inserter is not None:
+                                errors = inserter.insert(batch)
+                                for offset, message in errors:
+                                    rejects.write(sources[i + offset], message)
+                                rejected += len(errors)
+                            else:
+                                connection.query_many(sql, batch, ignore_errors=False, print_error=False)
+                            if append:
+                                connection.get_db().commit()
+                        if commit_mode == "chunk":
+                            connection.get_db().commit()
+                        with progress_lock:
+                            # Summed over the lanes, so it can exceed the elapsed time
+                            metrics.add("insert_seconds", time.perf_counter() - start)
+                            inserted[0] += len(rows) - rejected
+                            self.get_logger(task_id).progress(f"Inserted {inserted[0]} lines", log_file)
+                finally:
+                    if inserter is not None:
+                        inserter.close()
+            
+            with self.open_sessions(identifiers, workers, task_id) as connections:
+                if connections is None:
+                    self.raise_if_cancelled(task_id)
+                    raise ConnectionError(f"could not get {workers} sessions for the loader")
+                metrics.set("connect_seconds", metrics.elapsed())
+                self.tasks[task_id]["connection"] = connections[0]
+                self.tasks[task_id]["connections"] = connections
+                self.tasks[task_id]["SID"],self.tasks[task_id]["SERIAL"] = get_oracle_connection_identifiers(connections[0]) or ("NULL","NULL")
+                if fast:
+                    columns = bulk_load.fetch_table_columns(connections[0], table_name)
+                
+                # spawn rather than fork: the CLI process runs other task threads and the prompt
+                with ThreadPoolExecutor(workers) as lanes, ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as parsers:
+                    lane_futures = [lanes.submit(insert_lane, connection) for connection in connections]
+                    try:
+                        pending = set()
+                        next_chunk = 0
+                        while next_chunk < len(chunks) or pending:
+                            while next_chunk < len(chunks) and len(pending) < 2 * workers:
+                                start, end = chunks[next_chunk]
+                                pending.add(parsers.submit(bulk_load.parse_csv_chunk, file_path, start, end, len(header)))
+                                next_chunk += 1
+                            done, pending = metrics.timed("parse_wait_seconds", wait, pending, return_when=FIRST_COMPLETED)
+                            self.raise_if_cancelled(task_id)
+                            for future in done:
+                                hand_over(future.result())
+                    except BaseException:
+                        failed.set()
+                        for future in pending:
+                            future.cancel()
+                        raise
+                    finally:
+                        stop_lanes()
+                    for future in lane_futures:
+                        future.result()
+                
+                if commit_mode == "end":
+                    with metrics.timer("commit_seconds"):
+                        for connection in connections:
+                            connection.get_db().commit()
+                metrics.set("bytes_read", os.path.getsize(file_path))
+                metrics.set("rejected", rejects.count if rejects is not None else 0)
+                self.get_metrics(task_id).record(sub_task_id, metrics.finish(inserted[0]))
+                self.task_log(task_id, f"Inserted {inserted[0]} lines", log=log_file, log_only=True)
+                if rejects is not None and rejects.count:
+                    self.task_log(task_id, f"Rejected {rejects.count} lines, see {rejects.path}", log=log_file, log_only=True, color=ORANGE_COLOR, level=task_logger.WARNING)
+                self.task_log(task_id, f"Commit.", log=log_file, log_only=True)
+                
+        except Exception as e:
+            metrics.set("error", str(e).strip())
+            self.get_metrics(task_id).record(sub_task_id, metrics.finish(inserted[0]))
+            if self.is_cancelled(task_id):
+                self.task_log(task_id, f"Insert cancelled: {self.tasks[task_id]['cancelled']}", log_only=True, log=log_file, color=ORANGE_COLOR, level=task_logger.WARNING)
+                return
+            self.task_log(task_id, f"Inserting file: {file_path}", log_only=True, log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+            self.mark_failed(task_id, e)
+            stack = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+            self.task_log(task_id, stack, log_only=True, log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+        finally:
+            if rejects is not None:
+                rejects.close()
+
+    def run_bind_sets(self, identifiers, command, params_path, sessions, batch_size, commit, output_format=None, task_id=None, sync=False, default_connection=None):
+        from liouss_python_oracle_cli import script_plan
+        from liouss_python_oracle_cli import bind_sets
+        if task_id is None:
+            task_id = "NOT_A_TASK"
+        if self.session_pool is not None and sessions > self.session_pool.max_size:
+            sessions = self.session_pool.max_size
+        writer_class = output_writers.get_output_writer(output_format or self.workspace_config.get("output_format"))
+        fetch_size = int(self.workspace_config.get("fetch_size", DEFAULT_FETCH_SIZE))
+        save_folder = self.get_query_save_folder_path(task_id)
+        os.makedirs(save_folder, exist_ok=True)
+        log_file = os.path.join(save_folder, "0.log.txt")
+        output_file = os.path.join(save_folder, f"0.output.{writer_class.extension}")
+        command = command.strip("\n\r\t ")
+        is_query = script_plan.Statement(0, command).kind == "query"
+        positions = bind_sets.label_positions(command)
+        self.task_log(task_id, f"Executing for each bind set of {params_path}:\n================\n{command}\n================", log_only=True, log=log_file)
+        try:
+            labels, sets = bind_sets.open_bind_sets(params_path, command)
+        except (OSError, ValueError) as e:
+            self.task_log(task_id, f"Cannot read {params_path}: {e}", log_only=(not sync), log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+            self.mark_failed(task_id, e)
+            return
+        
+        work = queue.Queue(maxsize=sessions * 2)
+        stop = threading.Event()
+        lock = threading.Lock()
+        progress = {"bind_sets": 0, "rows": 0}
+        writer = None
+        
+        def run_lane(lane, connection):
+            nonlocal writer
+            metrics = task_metrics.SubTaskMetrics()
+            rows = 0
+            # One cursor per session: the statement is parsed once and the bind sets reuse it
+            cursor = connection.get_db().cursor()
+            cursor.arraysize = fetch_size
+            try:
+                while True:
+                    batch = work.get()
+                    if batch is None:
+                        return
+                    if stop.is_set() or self.is_cancelled(task_id):
+                        continue
+                    batch_start = rows
+                    if is_query:
+                        for binds in batch:
+                            metrics.timed("execute_seconds", cursor.execute, command, binds)
+                            prefix = bind_sets.label_values(binds, labels, positions)
+                            with lock:
+                                if writer is None:
+                                    writer = metrics.timed("write_seconds", writer_class, output_file, bind_sets.label_description(labels) + list(cursor.description))
+                            while True:
+                                fetched = metrics.timed("fetch_seconds", cursor.fetchmany, fetch_size)
+                                if not fetched:
+                                    break
+                                self.raise_if_cancelled(task_id)
+                                with lock:
+                                    metrics.timed("write_seconds", writer.write_rows, [prefix + list(row) for row in fetched])
+                                rows += len(fetched)
+                    else:
+                        metrics.timed("execute_seconds", cursor.executemany, command, batch)
+                        rows += cursor.rowcount
+                    with lock:
+                        progress["bind_sets"] += len(batch)
+                        progress["rows"] += rows - batch_start
+                        self.get_logger(task_id).progress(f"{progress['bind_sets']} bind sets, {progress['rows']} rows", log_file)
+            except Exception:
+                stop.set()
+                raise
+            finally:
+                cursor.close()
+                self.get_metrics(task_id).record(lane, metrics.finish(rows))
+        
+        def stop_lanes(futures):
+            # The lanes that failed do not read the queue anymore, it can stay full once none is left
+            for _ in futures:
+                while not all(f.done() for f in futures):
+                    try:
+                        work.put(None, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+        
+        start = time.perf_counter()
+        with self.open_sessions(identifiers, sessions, task_id) if sessions > 1 or default_connection is None else nullcontext([default_connection]) as connections:
+            if connections is None:
+                if not self.is_cancelled(task_id):
+                    self.mark_failed(task_id, f"could not get {sessions} sessions")
+                return
+            self.get_metrics(task_id).set("connect_seconds", time.perf_counter() - start)
+            self.tasks[task_id]["connection"] = connections[0]
+            self.tasks[task_id]["connections"] = connections
+            self.tasks[task_id]["SID"], self.tasks[task_id]["SERIAL"] = get_oracle_connection_identifiers(connections[0]) or ("NULL", "NULL")
+            
+            try:
+                with ThreadPoolExecutor(sessions) as executor:
+                    futures = [executor.submit(run_lane, lane, connection) for lane, connection in enumerate(connections)]
+                    try:
+                        for batch in bind_sets.batches(sets, batch_size):
+                            while not (stop.is_set() or self.is_cancelled(task_id)):
+                                try:
+                                    work.put(batch, timeout=0.5)
+                                    break
+                                except queue.Full:
+                                    pass
+                            if stop.is_set() or self.is_cancelled(task_id):
+                                break
+                    finally:
+                        stop_lanes(futures)
+                    for future in futures:
+                        future.result()
+                if commit:
+                    for connection in connections:
+                        connection.get_db().commit()
+            except Exception as e:
+                if not is_query:
+                    # The batches already run on the other sessions are not kept either
+                    for connection in connections:
+                        connection.get_db().rollback()
+                if writer is not None:
+                    writer.close()
+                if self.is_cancelled(task_id):
+                    self.task_log(task_id, f"Cancelled: {self.tasks[task_id]['cancelled']}", log_only=(not sync), log=log_file, color=ORANGE_COLOR, level=task_logger.WARNING)
+                    return
+                self.task_log(task_id, f"Error after {progress['bind_sets']} bind sets", log_only=(not sync), log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+                self.mark_failed(task_id, e)
+                stack_trace = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+                self.task_log(task_id, stack_trace, log_only=(not sync), log=log_file, color=RED_COLOR, level=task_logger.ERROR)
+                return
+        
+        if writer is not None:
+            writer.close()
+        self.get_metrics(task_id).set("bind_sets", progress["bind_sets"])
+        self.get_metrics(task_id).set("rows", progress["rows"])
+        with open(os.path.join(save_folder, "query.sql"), "w") as f:
+            f.write(command)
+        self.task_log(task_id, f"{progress['bind_sets']} bind sets complete ({progress['rows']} rows).", log_only=(not sync), log=log_file)
+        self.last_query = save_folder
+        self.last_query_content = command
+        if sync and writer is not None:
+            self.print_result_preview(output_file, writer_class)
+
+    def export_table(self, identifiers, table, by, chunks, sessions, merge, where=None, retry_of=None, output_format=None, task_id=None, sync=False, default_connection=None):
+        from liouss_python_oracle_cli import export_plan
+        if task_id is None:
+            task_id = "NOT_A_TASK"
+        if self.session_pool is not None and sessions > self.session_pool.max_size:
+            sessions = self.session_pool.max_size
+        save_folder = self.get_query_save_folder_path(task_id)
+        os.makedirs(save_folder, exist_ok=True)
+        log_file = os.path.join(save_folder, "export.log.txt")
+        try:
+            if retry_of is not None:
+                folder = self.find_task_folder(retry_of)
+                previous = export_plan.Manifest.load(folder) if folder else None
+                if previous is None:
+                    raise FileNotFoundError(f"No export manifest found for task {retry_of}")
+                manifest = export_plan.Manifest(save_folder, {**previous.data, "retry_of": retry_of, "merged": None})
+            else:
+                start = time.perf_counter()
+                with self.open_session(identifiers) if default_connection is None else nullcontext(default_connection) as connection:
+                    if connection is None:
+                        self.mark_failed(task_id, "could not open a session")
+                        return
+                    planned = export_plan.plan_export(connection, table, by, chunks, where)
+                self.get_metrics(task_id).set("plan_seconds", time.perf_counter() - start)
+                format_name = output_format or self.workspace_config.get("output_format") or output_writers.DEFAULT_OUTPUT_FORMAT
+                manifest = export_plan.Manifest(save_folder, {"table": table, "by": by, "where": where, "format": format_name, "merged": None, "chunks": planned})
+            writer_class = output_writers.get_output_writer(manifest.data["format"])
+            manifest.save()
+            pending = manifest.pending()
+            sessions = max(1, min(sessions, len(pending)))
+            self.task_log(task_id, f"Exporting {len(pending)}/{len(manifest.chunks)} chunks of {manifest.data['table']} on {sessions} sessions", log=log_file, log_only=True)
+            
+            work = queue.Queue()
+            for chunk in pending:
+                work.put(chunk)
+            connections = []
+            self.tasks[task_id]["connections"] = connections
+            
+            def export_lane():
+                with self.open_session(identifiers) as connection:
+                    if connection is None:
+                        raise ConnectionError("could not open a session")
+                    connections.append(connection)
+                    self.tasks[task_id]["connection"] = connection
+                    while not self.is_cancelled(task_id):
+                        try:
+                            chunk = work.get_nowait()
+                        except queue.Empty:
+                            return
+                        manifest.update(chunk, status="running", error=None)
+                        done = self.run_statement(connection, chunk["sql"], chunk["index"], task_id, False, chunk["binds"], writer_class)
+                        values = self.get_metrics(task_id).data["sub_tasks"].get(str(chunk["index"]), {})
+                        if done:
+                            output_file = os.path.join(save_folder, f"{chunk['index']}.output.{writer_class.extension}")
+                            manifest.update(chunk, status="done", file=output_file, rows=values.get("rows"))
+                        else:
+                            manifest.update(chunk, status="failed", error=values.get("error") or f"see {chunk['index']}.log.txt")
+            
+            with ThreadPoolExecutor(sessions) as lanes:
+                for future in [lanes.submit(export_lane) for _ in range(sessions)]:
+                    future.result()
+            
+            if self.is_cancelled(task_id):
+                self.task_log(task_id, f"Export cancelled: {self.tasks[task_id]['cancelled']}", log=log_file, log_only=True, color=ORANGE_COLOR, level=task_logger.WARNING)
+                return
+            failed = manifest.pending()
+            if failed:
+                self.mark_failed(task_id, f"{len(failed)} chunks failed, run again with: export --retry {task_id}")
+                self.task_log(task_id, f"{len(failed)}/{len(manifest.chunks)} chunks failed: {', '.join(str(chunk['index']) for chunk in failed)}. Run them again with: export --retry {task_id}", log=log_file, log_only=True, color=RED_COLOR, level=task_logger.ERROR)
+                return
+            rows = sum(chunk["rows"] or 0 for chunk in manifest.chunks)
+            self.get_metrics(task_id).set("rows", rows)
+            if merge:
+                start = time.perf_counter()
+                merged = os.path.join(save_folder, f"{EXPORT_MERGED}.output.{writer_class.extension}")
+                writer_class.merge([chunk["file"] for chunk in manifest.chunks], merged)
+                for chunk in manifest.chunks:
+                    # Chunks fetched by the export being retried stay in its folder
+                    if os.path.dirname(chunk["file"]) == save_folder:
+                        os.remove(chunk["file"])
+                        if os.path.exists(f"{chunk['file']}{row_index.INDEX_SUFFIX}"):
+                            os.remove(f"{chunk['file']}{row_index.INDEX_SUFFIX}")
+                        chunk["file"] = None
+                manifest.set("merged", merged)
+                self.get_metrics(task_id).set("merge_seconds", time.perf_counter() - start)
+            self.task_log(task_id, f"Export complete ({rows} rows in {len(manifest.chunks)} chunks).", log=log_file, log_only=True)
+            self.last_query = save_folder
+        except Exception as e:
+            self.task_log(task_id, f"Error exporting {table}", log=log_file, log_only=True, color=RED_COLOR, level=task_logger.ERROR)
+            self.mark_failed(task_id, e)
+            stack = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+            self.task_log(task_id, stack, log=log_file, log_only=True, color=RED_COLOR, level=task_logger.ERROR)
+
+    def get_profiles(self) -> dict:
+        """Connection profiles of the workspace by name, given as identifiers or as the path of an identifiers file."""
+        profiles = {}
+        for name, profile in (self.workspace_config.get("profiles") or {}).items():
+            if isinstance(profile, str):
+                with open(real_path(profile), "r") as f:
+                    profile = json.load(f)
+            profiles[name] = profile
+        return profiles
+    
+    def fanout_query(self, profiles:dict, query:str, merge:bool, timeout=None, output_format=None, sessions=None, task_id=None, sync=False, default_connection=None):
+        if task_id is None:
+            task_id = "NOT_A_TASK"
+        writer_class = output_writers.get_output_writer(output_format or self.workspace_config.get("output_format"))
+        save_folder = self.get_query_save_folder_path(task_id)
+        os.makedirs(save_folder, exist_ok=True)
+        log_file = os.path.join(save_folder, "fanout.log.txt")
+        # Profiles past the number of sessions wait for a lane to be free
+        sessions = max(1, min(len(profiles), sessions or int(self.workspace_config.get("fanout_sessions", DEFAULT_FANOUT_SESSIONS))))
+        self.task_log(task_id, f"Running on {len(profiles)} profiles ({', '.join(profiles)}), {sessions} at a time:\n================\n{query}\n================", log=log_file, log_only=True)
+        connections = []
+        self.tasks[task_id]["connections"] = connections
+        errors = {}
+        
+        def fanout_lane(name, identifiers):
+            # The profile timeout counts from the start of the lane, connection included
+            deadline = time.monotonic() + timeout if timeout else None
+            timer = None
+            try:
+                with self.open_session(identifiers) as connection:
+                    if connection is None:
+                        raise ConnectionError("could not open a session")
+                    connections.append(connection)
+                    if deadline is not None:
+                        # Breaks a call in progress, the fetch loop checks the deadline between chunks
+                        timer = threading.Timer(max(deadline - time.monotonic(), 0), connection.get_db().cancel)
+                        timer.daemon = True
+                        timer.start()
+                    if not self.run_statement(connection, query, name, task_id, False, None, writer_class, deadline=deadline):
+                        values = self.get_metrics(task_id).data["sub_tasks"].get(name, {})
+                        errors[name] = values.get("error") or f"see {name}.log.txt"
+            except Exception as e:
+                errors[name] = str(e).strip()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+            if name in errors and deadline is not None and time.monotonic() > deadline:
+                errors[name] = f"timeout after {timeout}s"
+            if name in errors:
+                # The lane may have written the header or part of the rows before failing
+                output_file = os.path.join(save_folder, f"{name}.output.{writer_class.extension}")
+                for path in (output_file, f"{output_file}{row_index.INDEX_SUFFIX}"):
+                    if os.path.exists(path):
+                        os.remove(path)
+                shutil.rmtree(os.path.join(save_folder, lob_export.LOB_FOLDER, name), ignore_errors=True)
+        
+        try:
+            with ThreadPoolExecutor(sessions) as lanes:
+                for future in [lanes.submit(fanout_lane, name, identifiers) for name, identifiers in profiles.items()]:
+                    future.result()
+            if self.is_cancelled(task_id):
+                self.task_log(task_id, f"Fan-out cancelled: {self.tasks[task_id]['cancelled']}", log=log_file, log_only=True, color=ORANGE_COLOR, level=task_logger.WARNING)
+                return
+            sub_tasks = self.get_metrics(task_id).data["sub_tasks"]
+            for name in profiles:
+                if name in errors:
+                    self.task_log(task_id, f"{name}: failed ({errors[name]})", log=log_file, log_only=True, color=RED_COLOR, level=task_logger.ERROR)
+                else:
+                    self.task_log(task_id, f"{name}: {sub_tasks.get(name, {}).get('rows')} rows", log=log_file, log_only=True)
+            if merge:
+                # Merges the profiles that succeeded, the failed ones are listed in the log
+                start = time.perf_counter()
+                sources = [(name, os.path.join(save_folder, f"{name}.output.{writer_class.extension}")) for name in profiles if name not in errors]
+                if sources:
+                    writer_class.merge_labelled(sources, os.path.join(save_folder, f"{FANOUT_MERGED}.output.{writer_class.extension}"), FANOUT_PROFILE_COLUMN)
+                self.get_metrics(task_id).set("merge_seconds", time.perf_counter() - start)
+            if errors:
+                self.mark_failed(task_id, f"{len(errors)}/{len(profiles)} profiles failed: {', '.join(errors)}")
+                return
+            self.task_log(task_id, f"Fan-out complete on {len(profiles)} profiles.", log=log_file, log_only=True)
+            self.last_query = save_folder
+        except Exception as e:
+            self.task_log(task_id, "Error running the fan-out", log=log_file, log_only=True, color=RED_COLOR, level=task_logger.ERROR)
+            self.mark_failed(task_id, e)
+            stack = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+            self.task_log(task_id, stack, log=log_file, log_only=True, color=RED_COLOR, level=task_logger.ERROR)
+
+    def diff_results(self, left, right, key, task_id=None, sync=False, default_connection=None):
+        from liouss_python_oracle_cli import result_diff
+        if task_id is None:
+            task_id = "NOT_A_TASK"
+        save_folder = self.get_query_save_folder_path(task_id)
+        os.makedirs(save_folder, exist_ok=True)
+        log_file = os.path.join(save_folder, "diff.log.txt")
+        try:
+            left_class, right_class = output_writers.writer_for_path(left), output_writers.writer_for_path(right)
+            memory = int(self.workspace_config.get("diff_memory_bytes", result_diff.DEFAULT_DIFF_MEMORY_BYTES))
+            partitions = result_diff.partition_count(result_diff.estimated_bytes(left, left_class), memory)
+            self.task_log(task_id, f"Comparing {left} with {right}{' by ' + ','.join(key) if key else ''} ({partitions} partitions)", log=log_file, log_only=True)
+            destination = os.path.join(save_folder, f"{result_diff.DIFF_OUTPUT}.output.{output_writers.CsvWriter.extension}")
+            counts = result_diff.diff_rows(
+                left_class.read_rows(left),
+                right_class.read_rows(right),
+                destination,
+                key,
+                partitions=partitions,
+                check=lambda: self.raise_if_cancelled(task_id),
+                memory_bytes=memory,
+            )
+            metrics = self.get_metrics(task_id)
+            for name, value in counts.items():
+                metrics.set(name, value)
+            color = GREEN_COLOR if counts["added"] + counts["removed"] + counts["changed"] == 0 else ORANGE_COLOR
+            self.task_log(task_id, f"{counts['added']} added, {counts['removed']} removed, {counts['changed']} changed, {counts['unchanged']} unchanged ({counts['left_rows']} -> {counts['right_rows']} rows)", log=log_file, log_only=(not sync), color=color)
+            self.task_log(task_id, f"Differences written to {destination}", log=log_file, log_only=(not sync))
+            self.last_query = save_folder
+        except Exception as e:
+            if self.is_cancelled(task_id):
+                self.task_log(task_id, f"Diff cancelled: {self.tasks[task_id]['cancelled']}", log=log_file, log_only=(not sync), color=ORANGE_COLOR, level=task_logger.WARNING)
+                return
+            self.task_log(task_id, f"Error comparing {left} with {right}", log=log_file, log_only=(not sync), color=RED_COLOR, level=task_logger.ERROR)
+            self.mark_failed(task_id, e)
+            stack = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+            self.task_log(task_id, stack, log=log_file, log_only=(not sync), color=RED_COLOR, level=task_logger.ERROR)
+
+    def is_cancelled(self, task_id) -> bool:
+        return task_id in self.tasks and bool(self.tasks[task_id].get("cancelled"))
+    
+    def raise_if_cancelled(self, task_id):
+        if self.is_cancelled(task_id):
+            raise TaskCancelled(self.tasks[task_id]["cancelled"])
+    
+    def cancel_task(self, task_id, reason="stopped by user"):
+        # Breaks the call in progress with the driver's cancel(), kills the session from the main connection if that fails.
+        # The task loops also check the flag between chunks
+        task = self.tasks[task_id]
+        task["cancelled"] = reason
+        process = task["process"]
+        if process is not None and process.cancel():
+            return
+        
+        broken = True
+        for connection in task.get("connections") or [task["connection"]]:
+            if connection is None:
+                continue
+            try:
+                connection.get_db().cancel()
+            except Exception as e:
+                broken = False
+                beautiful_print(f"Could not break task {task_id} call: {e}", color=ORANGE_COLOR)
+        
+        sid, serial = task["SID"], task["SERIAL"]
+        if broken or sid == "NULL" or self.connection is None or task["connection"] is self.connection:
+            return
+        try:
+            self.connection.query_one(f"ALTER SYSTEM KILL SESSION '{int(sid)},{int(serial)}' IMMEDIATE", print_error=False, ignore_errors=False)
+            beautiful_print(f"Killed session {sid},{serial} of task {task_id}", color=ORANGE_COLOR)
+        except Exception as e:
+            beautiful_print(f"Could not kill session {sid},{serial} of task {task_id}: {e}", color=RED_COLOR)
+    
+    def run_with_timeout(self, func, timeout, *args, task_id=None, **kwargs):
+        timer = threading.Timer(timeout, self.cancel_task, args=(task_id, f"timeout after {timeout}s"))
+        timer.daemon = True
+        timer.start()
+        try:
+            return func(*args, task_id=task_id, **kwargs)
+        finally:
+            timer.cancel()
+    
+    def run_task(self, func, *args, task_id=None, **kwargs):
+        try:
+            return func(*args, task_id=task_id, **kwargs)
+        finally:
+            metrics = self.tasks[task_id].get("metrics") if task_id in self.tasks else None
+            if metrics is not None:
+                metrics.flush()
+            logger = self.tasks[task_id].get("logger") if task_id in self.tasks else None
+            if logger is not None:
+                logger.flush()
+    
+    def start_task(self, description:str, func, sync, *args, timeout=None, kind="query", priority=PRIORITY_INTERACTIVE, **kwargs):
         description = " ".join([c for c in description.replace("\n"," ").replace("\t"," ").split(" ") if c != ""])
         if len(description) > 100:
             description = f"{description[:100]}..."
+        if timeout is None and self.workspace_config.get("task_timeout"):
+            timeout = float(self.workspace_config["task_timeout"])
+        if timeout:
+            args = (func, timeout) + args
+            func = self.run_with_timeout
+        args = (func,) + args
+        func = self.run_task
         if not sync:
             task_id = f"async_{datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')}"
-            self.tasks[task_id] = {"description": description, "process":self.pool.submit(func, *args, task_id=task_id, sync=sync, **kwargs), "connection":None}
-            beautiful_print(f"Started task {task_id}: {description}")
+            # The entry must exist before submitting: with pooled sessions the task can start writing to it right away
+            self.tasks.add(task_id, {"description": description, "process":None, "connection":None, "SID":"NULL", "SERIAL":"NULL", "cancelled":None, "folder":self.get_query_save_folder_path(task_id)})
+            self.tasks[task_id]["process"] = self.pool.submit(func, *args, task_id=task_id, sync=sync, kind=kind, priority=priority, **kwargs)
+            self.tasks[task_id]["process"].add_done_callback(lambda process, task_id=task_id: self.finish_task(task_id, process))
+            position = self.pool.queue_position(self.tasks[task_id]["process"])
+            stats = self.pool.stats()
+            # Tasks within the free slots are about to be picked up by a worker
+            if position is None or position <= stats["max_concurrency"] - stats["running"]:
+                beautiful_print(f"Started task {task_id}: {description}")
+            else:
+                beautiful_print(f"Queued task {task_id} (position {position}): {description}")
         else:
             task_id = f"sync_{datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+            detached = [tid for tid, task in self.tasks.items() if task.get("detached") and task["connection"] is self.connection and not task["process"].done()]
+            if detached:
+                beautiful_print(f"Waiting for detached task {detached[0]} to release the main session", color=ORANGE_COLOR)
             beautiful_print(f"Starting task {task_id}: {description}")
-            self.tasks[task_id] = {"description": description, "process":None, "connection":self.connection}
-            func(*args, task_id=task_id, sync=sync, default_connection=self.connection, **kwargs)
+            self.tasks.add(task_id, {"description": description, "process":None, "connection":self.connection, "SID":"NULL", "SERIAL":"NULL", "cancelled":None, "folder":self.get_query_save_folder_path(task_id)})
+            process = self.sync_executor.submit(func, *args, task_id=task_id, sync=sync, default_connection=self.connection, **kwargs)
+            self.tasks[task_id]["process"] = process
+            process.add_done_callback(lambda process, task_id=task_id: self.finish_task(task_id, process))
+            try:
+                process.result()
+            except KeyboardInterrupt:
+                if not self.interactive:
+                    raise
+                # The task goes on in the background, like an async one
+                self.tasks[task_id]["detached"] = True
+                beautiful_print("")
+                self.detach_main_session(process)
+                beautiful_print(f"Detached from task {task_id}, it goes on in the background (taskls, stoptsk {task_id})", color=ORANGE_COLOR)
         
         return task_id
+    
+    def detach_main_session(self, process):
+        """Leaves the main session and its executor to the detached task: the next commands run on a new session, the
+        old one is closed when the task ends."""
+        try:
+            connection = generateConnection(self.connection_type, self.oracle_identifiers)
+            if not connection:
+                raise ValueError("no connection for this connection type")
+            connection.__enter__()
+        except Exception as e:
+            self.print_error(f"Could not open a new main session, the next commands wait for the detached task: {e}")
+            return
+        detached_connection = self.connection
+        self.connection = connection
+        executor = self.sync_executor
+        self.sync_executor = ThreadPoolExecutor(1, thread_name_prefix="sync-task")
+        executor.shutdown(wait=False)
+        if detached_connection is not self.initial_connection:
+            process.add_done_callback(lambda _: close_connection(detached_connection))
+    
+    def finish_task(self, task_id, process=None, error=None):
+        task = self.tasks.get(task_id)
+        if task is None:
+            return
+        if process is not None and not process.cancelled():
+            error = process.exception()
+            if error is not None:
+                # The traceback keeps the frames of the task alive, and with them its sessions. It is already in the task log
+                error.__traceback__ = None
+        if task.get("cancelled") or (process is not None and process.cancelled()):
+            self.tasks.finish(task_id, "cancelled")
+        elif error is not None or task.get("error"):
+            self.tasks.finish(task_id, "failed", str(error).strip() if error is not None else None)
+        else:
+            self.tasks.finish(task_id, "done")
         
+    def print_error(self, message:str):
+        # Also flags the command as failed for "oracle run"
+        self.command_failed = True
+        beautiful_print(message, color=RED_COLOR)
+    
+    def mark_failed(self, task_id, error):
+        if task_id in self.tasks:
+            self.tasks[task_id]["error"] = str(error).strip()
+    
     def do_taskls(self, arg):
-        """List all running tasks.
-        Usage: taskls [-i]"""
-        for task_id, task_info in self.tasks.items():
-            status = "Running" if task_info["process"] and (not task_info["process"].done()) else "Done"
-            color = GREEN_COLOR if status == "Done" else ORANGE_COLOR
-            if arg != "-i" or status == "Running":
+        """List the tasks of the session, queued tasks with their position in the queue.
+        Usage: taskls [-i] | taskls --history [N]
+        -i -> only queued and running tasks
+        --history -> the last N finished tasks of the workspace, including previous sessions (default 20)"""
+        args = shlex.split(arg) if arg else []
+        if args and args[0] == "--history":
+            try:
+                limit = int(args[1]) if len(args) > 1 else 20
+            except ValueError:
+                self.print_error(f"Invalid number of tasks: {args[1]}")
+                return
+            for task in reversed(self.tasks.history(limit)):
+                color = {"done": GREEN_COLOR, "failed": RED_COLOR}.get(task["status"], ORANGE_COLOR)
+                beautiful_print(f"[{task['task_id']}][{task['sid']},{task['serial']}]: ({task['status'].capitalize()}, {task['ended']}, {task['seconds']:.1f}s) {task['description']}", color=color)
+            return
+        stats = self.pool.stats()
+        beautiful_print(f"running {stats['running']}/{stats['max_concurrency']}, queued {stats['queued']}")
+        for task_id, task_info in list(self.tasks.items()):
+            process = task_info["process"]
+            status = "Running" if process and (not process.done()) else "Done"
+            if status == "Running" and not process.running():
+                position = self.pool.queue_position(process)
+                status = f"Queued #{position}" if position else status
+            if task_info.get("cancelled"):
+                status = "Cancelling" if status == "Running" else "Cancelled"
+            elif status == "Done" and task_info["status"] == "failed":
+                status = "Failed"
+            color = {"Done": GREEN_COLOR, "Cancelled": RED_COLOR, "Failed": RED_COLOR}.get(status, ORANGE_COLOR)
+            if arg != "-i" or status not in ("Done", "Cancelled"):
                 sid,serial = self.tasks[task_id]["SID"],self.tasks[task_id]["SERIAL"]
                 beautiful_print(f"[{task_id}][{sid},{serial}]: ({status}) {task_info['description']}", color=color)
     
@@ -291,49 +1503,531 @@ class OracleCmd(cmd.Cmd):
         Usage: stoptsk <TASK_ID>"""
         
         if not arg in self.tasks:
-            beautiful_print(f"No task found with ID: {arg}", color=RED_COLOR)
+            self.print_error(f"No task found with ID: {arg}")
             return
         
         if not self.tasks[arg]["process"]:
-            beautiful_print(f"Cannot stop sync task", color=RED_COLOR)
+            self.print_error(f"Cannot stop sync task")
+            return
+        
+        if self.tasks[arg]["process"].done():
+            beautiful_print(f"Task {arg} is not running", color=ORANGE_COLOR)
             return
 
-        self.tasks[arg]["process"].cancel()
+        self.cancel_task(arg)
         beautiful_print(f"Stopped task {arg}: {self.tasks[arg]['description']}")
 
             
     
+    def find_task_folder(self, task_id) -> Optional[str]:
+        task = self.tasks.get(task_id) or self.tasks.lookup(task_id)
+        if task is not None and task.get("folder") and os.path.isdir(task["folder"]):
+            return task["folder"]
+        folder = self.get_query_save_folder_path(task_id)
+        if os.path.isdir(folder):
+            return folder
+        # Tasks of previous days that ran before the task index existed
+        queries_folder = os.path.join(self.workspace_path, "queries")
+        if os.path.isdir(queries_folder):
+            for day in sorted(os.listdir(queries_folder), reverse=True):
+                folder = os.path.join(queries_folder, day, str(task_id))
+                if os.path.isdir(folder):
+                    return folder
+        return None
+    
+    def do_taskstats(self, arg):
+        """Show the timings of a task: connect, execute, time to first row, fetch and write times, rows and bytes.
+        Usage: taskstats <TASK_ID>"""
+        task_id = arg.strip()
+        folder = self.find_task_folder(task_id) if task_id else None
+        metrics = task_metrics.load_metrics(folder) if folder else None
+        if metrics is None:
+            self.print_error(f"No metrics found for task: {task_id}")
+            return
+        
+        def fmt(key, value):
+            if isinstance(value, float) and key.endswith("_seconds"):
+                return f"{key[:-len('_seconds')]}={value:.3f}s"
+            if key == "rows_per_second":
+                return f"rows/s={value:.0f}" if value is not None else "rows/s=-"
+            return f"{key}={value}"
+        
+        beautiful_print(f"[{metrics['task_id']}] {metrics.get('description') or ''}")
+        task_values = [fmt(k, v) for k, v in metrics.items() if k not in ("task_id", "description", "sub_tasks")]
+        if task_values:
+            beautiful_print(" ".join(task_values))
+        for sub_task_id, values in sorted(metrics["sub_tasks"].items(), key=lambda item: (not item[0].isdigit(), int(item[0]) if item[0].isdigit() else 0, item[0])):
+            session_stats = values.pop("session_stats", None)
+            error = values.pop("error", None)
+            beautiful_print(f"  #{sub_task_id}: " + " ".join(fmt(k, v) for k, v in values.items()), color=RED_COLOR if error else GREEN_COLOR)
+            if error:
+                beautiful_print(f"      error: {error}", color=RED_COLOR)
+            if session_stats:
+                beautiful_print("      " + ", ".join(f"{name}: {value:g}" for name, value in session_stats.items()), color=LIGHT_BLUE_COLOR)
+        beautiful_print(f"See {os.path.join(folder, task_metrics.METRICS_FILE)}")
+    
+    def list_outputs(self, folder) -> dict:
+        """Output files of a task folder by sub-task."""
+        outputs = {}
+        for name in sorted(os.listdir(folder)):
+            sub_task_id, separator, _ = name.partition(".output.")
+            if separator and output_writers.writer_for_path(name) is not None:
+                outputs.setdefault(sub_task_id, name)
+        return outputs
+    
+    def find_output_file(self, folder, sub_task_id=None) -> Optional[str]:
+        """Output file of a sub-task. Without sub-task: the first of DEFAULT_SUB_TASKS found, else the only output of the folder."""
+        outputs = self.list_outputs(folder)
+        if sub_task_id is None:
+            sub_task_id = next((name for name in DEFAULT_SUB_TASKS if name in outputs), None)
+            if sub_task_id is None and len(outputs) == 1:
+                sub_task_id = next(iter(outputs))
+        name = outputs.get(str(sub_task_id))
+        return os.path.join(folder, name) if name else None
+    
+    def find_result_file(self, reference) -> Optional[str]:
+        """Output file of a saved query (the latest one of an incremental query) or of a task, TASK_ID:SUB_TASK for another sub-task than 0."""
+        from liouss_python_oracle_cli import incremental
+        saved_folder = os.path.join(self.query_save_path, reference.lower())
+        if os.path.isdir(saved_folder):
+            state = incremental.load_state(saved_folder)
+            if state is not None and state["output"] and os.path.exists(os.path.join(saved_folder, state["output"])):
+                return os.path.join(saved_folder, state["output"])
+            return self.find_output_file(saved_folder)
+        task_id, _, sub_task_id = reference.partition(":")
+        folder = self.find_task_folder(task_id)
+        return self.find_output_file(folder, sub_task_id or None) if folder is not None else None
+    
+    def open_task_result(self, arg, usage, positional_count, defaults):
+        """Parses "<TASK_ID> <positional...> [-n N] [-s SUB_TASK] [-i]" and opens the output. None after printing the error."""
+        args = shlex.split(arg) if arg else []
+        options = {"n": defaults.get("n"), "s": None, "i": False}
+        positional = []
+        try:
+            i = 0
+            while i < len(args):
+                if args[i] in ("-n", "-s"):
+                    options[args[i][1]] = args[i + 1]
+                    i += 1
+                elif args[i] == "-i":
+                    options["i"] = True
+                else:
+                    positional.append(args[i])
+                i += 1
+            options["n"] = int(options["n"])
+        except (IndexError, ValueError):
+            self.print_error(f"Invalid options: {arg}")
+            return None
+        if len(positional) != positional_count:
+            self.print_error(f"Usage: {usage}")
+            return None
+        folder = self.find_task_folder(positional[0])
+        if folder is None:
+            self.print_error(f"No task found with ID: {positional[0]}")
+            return None
+        path = self.find_output_file(folder, options["s"])
+        if path is None:
+            sub_tasks = ", ".join(self.list_outputs(folder))
+            self.print_error(f"No output for sub-task {options['s'] or '0'} of task {positional[0]}{f' (sub-tasks: {sub_tasks})' if sub_tasks else ''}")
+            return None
+        result = row_index.open_result(path, output_writers.writer_for_path(path))
+        if result is None:
+            self.print_error(f"{path} is not a text format, open it with a parquet/arrow reader")
+            return None
+        return result, positional, options
+    
+    def print_rows(self, result, first_row, rows):
+        beautiful_print(",".join(result.header()), color=LIGHT_BLUE_COLOR)
+        for row_number, row in enumerate(rows, start=first_row + 1):
+            line = io.StringIO()
+            csv.writer(line).writerow(row)
+            beautiful_print(f"{row_number}: {line.getvalue().rstrip()}")
+        total = f" of {result.row_count}" if result.row_count is not None else ""
+        beautiful_print(f"rows {first_row + 1}-{first_row + len(rows)}{total}" if rows else f"no rows{total}", color=LIGHT_BLUE_COLOR)
+    
+    def do_head(self, arg):
+        """Shows the first rows of a task output.
+        Usage: head <TASK_ID> [-n ROWS] [-s SUB_TASK]"""
+        opened = self.open_task_result(arg, "head <TASK_ID> [-n ROWS] [-s SUB_TASK]", 1, {"n": 20})
+        if opened is not None:
+            result, _, options = opened
+            self.print_rows(result, 0, result.rows(0, options["n"]))
+    
+    def do_tail(self, arg):
+        """Shows the last rows of a task output.
+        Usage: tail <TASK_ID> [-n ROWS] [-s SUB_TASK]"""
+        opened = self.open_task_result(arg, "tail <TASK_ID> [-n ROWS] [-s SUB_TASK]", 1, {"n": 20})
+        if opened is not None:
+            result, _, options = opened
+            self.print_rows(result, *result.tail(options["n"]))
+    
+    def do_page(self, arg):
+        """Shows the rows of a task output from row ROW (the first row is 1). Plain csv outputs are read from
+        their row index, so any row is reached without reading the rows before it.
+        Usage: page <TASK_ID> <ROW> [-n ROWS] [-s SUB_TASK]"""
+        opened = self.open_task_result(arg, "page <TASK_ID> <ROW> [-n ROWS] [-s SUB_TASK]", 2, {"n": 50})
+        if opened is None:
+            return
+        result, positional, options = opened
+        try:
+            first_row = max(int(positional[1]) - 1, 0)
+        except ValueError:
+            self.print_error(f"Invalid row: {positional[1]}")
+            return
+        self.print_rows(result, first_row, result.rows(first_row, options["n"]))
+    
+    def do_grep(self, arg):
+        """Shows the rows of a task output with a field matching a regular expression, with their row number.
+        Usage: grep <TASK_ID> <PATTERN> [-i] [-n MAX_ROWS] [-s SUB_TASK]
+        -i -> ignore case"""
+        opened = self.open_task_result(arg, "grep <TASK_ID> <PATTERN> [-i] [-n MAX_ROWS] [-s SUB_TASK]", 2, {"n": 100})
+        if opened is None:
+            return
+        result, positional, options = opened
+        try:
+            matches = result.grep(positional[1], ignore_case=options["i"], limit=options["n"])
+        except re.error as e:
+            self.print_error(f"Invalid pattern: {e}")
+            return
+        beautiful_print(",".join(result.header()), color=LIGHT_BLUE_COLOR)
+        for row_number, row in matches:
+            line = io.StringIO()
+            csv.writer(line).writerow(row)
+            beautiful_print(f"{row_number + 1}: {line.getvalue().rstrip()}")
+        beautiful_print(f"{len(matches)} matching rows{' (limit reached)' if len(matches) == options['n'] else ''}", color=LIGHT_BLUE_COLOR)
+    
     def do_insertmany(self, arg):
         """Inserts data in database from a file.
-        Usage: insertmany <FILE_PATH> <TABLE>
+        Usage: insertmany [-f] [--append] [-p WORKERS] [-b BATCH_SIZE] [--commit chunk|end] <FILE_PATH> <TABLE>
+        -f -> fast load: values are converted to the column types of the table and bound with typed buffers,
+              rows rejected by the database are written to <n>.rejected.csv instead of aborting the batch
+        --append -> direct-path insert (APPEND_VALUES hint), commits after every batch. Oracle has no batch errors for
+                    direct-path inserts: with -f, a row rejected by the database fails the load (rows that do not
+                    convert are still written to <n>.rejected.csv)
+        -p -> parallel load: the file is split in chunks parsed by WORKERS processes and inserted by WORKERS sessions
+        -b -> fixed number of rows per insert batch (default: starts at 50000 and adapts to the observed round trip time)
+        --commit -> with -p, commit after each chunk or once at the end (default end)
         """
+        from liouss_python_oracle_cli import bulk_load
         arg2 = arg
-        arg = shlex.split(arg)
-        if len(arg) != 2:
-            beautiful_print(f"Expected args: 2. Received: {len(arg)}.", color=RED_COLOR)
-        self.start_task(f"insertmany {arg2}", self.insert_many, False, self.oracle_identifiers, real_path(arg[0]), arg[1], 50000)
+        args = shlex.split(arg)
+        workers = 0
+        buffer_size = None
+        commit_mode = "end"
+        fast = False
+        append = False
+        positional = []
+        i = 0
+        try:
+            while i < len(args):
+                if args[i] == "-p":
+                    workers = int(args[i+1])
+                    i += 1
+                elif args[i] == "-b":
+                    buffer_size = int(args[i+1])
+                    i += 1
+                elif args[i] == "--commit":
+                    commit_mode = args[i+1]
+                    i += 1
+                elif args[i] == "-f":
+                    fast = True
+                elif args[i] == "--append":
+                    append = True
+                else:
+                    positional.append(args[i])
+                i += 1
+        except (IndexError, ValueError):
+            self.print_error(f"Invalid options: {arg2}")
+            return
+        
+        if len(positional) != 2:
+            self.print_error(f"Expected args: 2. Received: {len(positional)}.")
+            return
+        if commit_mode not in bulk_load.COMMIT_MODES:
+            self.print_error(f"--commit must be one of {', '.join(bulk_load.COMMIT_MODES)}")
+            return
+        if buffer_size is not None and buffer_size <= 0:
+            self.print_error("Batch size must be positive")
+            return
+        
+        adaptive = buffer_size is None
+        buffer_size = buffer_size or DEFAULT_INSERT_BUFFER_SIZE
+        if workers > 0:
+            self.start_task(f"insertmany {arg2}", self.insert_many_parallel, False, self.oracle_identifiers, real_path(positional[0]), positional[1], buffer_size, workers, commit_mode, fast, append, kind="load", priority=PRIORITY_BATCH)
+        else:
+            self.start_task(f"insertmany {arg2}", self.insert_many, False, self.oracle_identifiers, real_path(positional[0]), positional[1], buffer_size, adaptive, fast, append, kind="load", priority=PRIORITY_BATCH)
         
     def do_runscript(self, arg):
         """Run a SQL script from a file.
-        Usage: runscript <FILE_PATH>"""
+        Usage: runscript [-p SESSIONS] <FILE_PATH>
+        -p -> runs independent statements at the same time on SESSIONS sessions. Statements are independent when they
+              touch different tables; annotate a statement with "-- @parallel" to always run it in parallel, or with
+              "-- @barrier" to wait for all previous statements and block the next ones. COMMIT/ROLLBACK apply to every session.
+              Uncommitted changes of a session are only visible to statements running on that same session."""
+        
+        lanes = 0
+        args = shlex.split(arg) if arg else []
+        if len(args) >= 2 and args[0] == "-p":
+            try:
+                lanes = int(args[1])
+            except ValueError:
+                self.print_error(f"Invalid number of sessions: {args[1]}")
+                return
+            arg = " ".join(args[2:])
         
         if arg and arg.strip() != "":
             arg = real_path(arg)
             if not os.path.isfile(arg):
-                beautiful_print(f"File not found: {arg}", color=RED_COLOR)
+                self.print_error(f"File not found: {arg}")
                 return
             with open(arg, "r") as f:
                 script = f.read()
         else:
             script = edit_in_editor("Type your script on the line below", ignore_lines=1)
             
-        self.start_task(f"runscript {arg}", self.runscript_oracle, False, self.oracle_identifiers, script)
+        if lanes > 1:
+            self.start_task(f"runscript -p {lanes} {arg}", self.runscript_parallel, False, self.oracle_identifiers, script, lanes, kind="script", priority=PRIORITY_BATCH)
+        else:
+            self.start_task(f"runscript {arg}", self.runscript_oracle, False, self.oracle_identifiers, script, kind="script", priority=PRIORITY_BATCH)
+        
+    def do_export(self, arg):
+        """Exports a table in chunks fetched at the same time on several sessions, each chunk in its own file of the task folder.
+        The chunks and their state are kept in manifest.json so that the failed ones can be run again alone.
+        Usage: export [-p SESSIONS] [--by rowid|partition|key:COLUMN] [--chunks N] [--where CONDITION] [--format FORMAT] [--merge] <TABLE>
+               export --retry <TASK_ID> [-p SESSIONS] [--merge]
+        -p -> number of sessions (default 4)
+        --by -> ROWID ranges of the table extents (default), one chunk per partition, or equal ranges of a numeric column
+        --chunks -> number of chunks of the rowid and key splits (default 4 per session)
+        --where -> condition applied to every chunk
+        --merge -> concatenates the chunks into export.output.<format> once all of them succeeded
+        --retry -> runs again the chunks of a previous export that did not succeed"""
+        from liouss_python_oracle_cli import export_plan
+        arg2 = arg
+        args = shlex.split(arg) if arg else []
+        sessions = DEFAULT_EXPORT_SESSIONS
+        by = "rowid"
+        chunks = None
+        where = None
+        output_format = None
+        merge = False
+        retry_of = None
+        positional = []
+        i = 0
+        try:
+            while i < len(args):
+                if args[i] == "-p":
+                    sessions = int(args[i+1])
+                    i += 1
+                elif args[i] == "--by":
+                    by = args[i+1]
+                    i += 1
+                elif args[i] == "--chunks":
+                    chunks = int(args[i+1])
+                    i += 1
+                elif args[i] == "--where":
+                    where = args[i+1]
+                    i += 1
+                elif args[i] == "--format":
+                    output_format = args[i+1]
+                    i += 1
+                elif args[i] == "--retry":
+                    retry_of = args[i+1]
+                    i += 1
+                elif args[i] == "--merge":
+                    merge = True
+                else:
+                    positional.append(args[i])
+                i += 1
+        except (IndexError, ValueError):
+            self.print_error(f"Invalid options: {arg2}")
+            return
+        
+        if retry_of is None and len(positional) != 1:
+            self.print_error(f"Expected args: 1. Received: {len(positional)}.")
+            return
+        if sessions <= 0 or (chunks is not None and chunks <= 0):
+            self.print_error("Number of sessions and chunks must be positive")
+            return
+        if by.partition(":")[0] not in export_plan.EXPORT_MODES:
+            self.print_error("--by must be rowid, partition or key:<COLUMN>")
+            return
+        if output_format is not None:
+            try:
+                output_writers.get_output_writer(output_format)
+            except ValueError as e:
+                self.print_error(str(e))
+                return
+        table = positional[0] if positional else None
+        chunks = chunks or sessions * export_plan.DEFAULT_CHUNKS_PER_SESSION
+        self.start_task(f"export {arg2}", self.export_table, False, self.oracle_identifiers, table, by, chunks, sessions, merge, where, retry_of, output_format, kind="export", priority=PRIORITY_BATCH)
+        
+    def do_fanout(self, arg):
+        """Runs a query at the same time on several connection profiles of the workspace ("profiles" in config.json),
+        the result of each profile in <PROFILE>.output.<format> of the task folder.
+        Usage: fanout [-t SECONDS] [-p SESSIONS] [--format FORMAT] [--merge] <PROFILE,PROFILE,...|all> [QUERY]
+        -t -> cancels the query of a profile that runs longer than SECONDS, the other profiles go on
+        -p -> number of profiles queried at the same time (default: fanout_sessions of the workspace, 8)
+        --merge -> also writes the results of the profiles that succeeded to fanout.output.<format>, with a PROFILE column"""
+        arg2 = arg
+        args = shlex.split(arg) if arg else []
+        timeout = None
+        sessions = None
+        output_format = None
+        merge = False
+        i = 0
+        try:
+            while i < len(args) and args[i].startswith("-"):
+                if args[i] == "-t":
+                    timeout = float(args[i+1])
+                    i += 1
+                elif args[i] == "-p":
+                    sessions = int(args[i+1])
+                    if sessions < 1:
+                        raise ValueError(args[i+1])
+                    i += 1
+                elif args[i] == "--format":
+                    output_format = args[i+1]
+                    i += 1
+                elif args[i] == "--merge":
+                    merge = True
+                else:
+                    raise ValueError(args[i])
+                i += 1
+        except (IndexError, ValueError):
+            self.print_error(f"Invalid options: {arg2}")
+            return
+        if i >= len(args):
+            self.print_error("Usage: fanout [-t SECONDS] [-p SESSIONS] [--format FORMAT] [--merge] <PROFILE,PROFILE,...|all> [QUERY]")
+            return
+        try:
+            profiles = self.get_profiles()
+        except (OSError, ValueError) as e:
+            self.print_error(f"Could not read the profiles: {e}")
+            return
+        names = list(profiles) if args[i] == "all" else [name for name in args[i].split(",") if name]
+        unknown = [name for name in names if name not in profiles]
+        if not names or unknown:
+            self.print_error(f"Unknown profiles: {', '.join(unknown)}. Available: {', '.join(profiles) or 'none'}")
+            return
+        if output_format is not None:
+            try:
+                output_writers.get_output_writer(output_format)
+            except ValueError as e:
+                self.print_error(str(e))
+                return
+        query = " ".join(args[i+1:]).strip(" \n\r\t")
+        if not query:
+            query = edit_in_editor("Type your query on the line below", ignore_lines=1)
+        if not query:
+            self.print_error("No query to run")
+            return
+        self.start_task(f"fanout {args[i]} {query}", self.fanout_query, False, {name: profiles[name] for name in names}, query, merge, timeout, output_format, sessions)
+        
+    def do_diff(self, arg):
+        """Compares two results, each given as a saved query name or a task ID (TASK_ID:SUB_TASK for another sub-task than the default one).
+        The files are read as streams and compared by hash partitions on disk, so they can be larger than memory.
+        The added, removed and changed rows are written to diff.output.csv of the task folder.
+        Usage: diff [-a] [--key COLUMN,...] <OLD> <NEW>
+        -a -> async task
+        --key -> rows with the same key and different values are reported as changed (old and new rows)
+                 instead of one removed and one added row"""
+        args = shlex.split(arg) if arg else []
+        asyn = False
+        key = None
+        positional = []
+        i = 0
+        try:
+            while i < len(args):
+                if args[i] == "-a":
+                    asyn = True
+                elif args[i] == "--key":
+                    key = [column.strip() for column in args[i+1].split(",") if column.strip()]
+                    i += 1
+                else:
+                    positional.append(args[i])
+                i += 1
+        except IndexError:
+            self.print_error(f"Invalid options: {arg}")
+            return
+        if len(positional) != 2:
+            self.print_error("Usage: diff [-a] [--key COLUMN,...] <OLD> <NEW>")
+            return
+        files = []
+        for reference in positional:
+            path = self.find_result_file(reference)
+            if path is None:
+                self.print_error(f"No saved query or task output found for: {reference}")
+                return
+            files.append(path)
+        self.start_task(f"diff {arg}", self.diff_results, not asyn, files[0], files[1], key, kind="diff", priority=PRIORITY_BATCH)
+        
+    def do_gc(self, arg):
+        """Removes old task folders of the workspace, stores the outputs left by content hash (identical ones then share
+        their data), then removes the stored outputs nothing links to anymore.
+        Outputs of saved queries (and of cached results) are links of their own and are always kept.
+        Usage: gc [-n] [--days DAYS] [--max-bytes BYTES]
+        -n -> only shows what would be removed
+        --days -> removes the task folders last written more than DAYS days ago (default: task_retention_days)
+        --max-bytes -> then removes the oldest task folders while they use more than BYTES (default: task_max_bytes)"""
+        from liouss_python_oracle_cli import blob_store
+        args = shlex.split(arg) if arg else []
+        dry_run = False
+        days = self.workspace_config.get("task_retention_days")
+        max_bytes = self.workspace_config.get("task_max_bytes")
+        i = 0
+        try:
+            while i < len(args):
+                if args[i] == "-n":
+                    dry_run = True
+                elif args[i] == "--days":
+                    days = args[i+1]
+                    i += 1
+                elif args[i] == "--max-bytes":
+                    max_bytes = args[i+1]
+                    i += 1
+                else:
+                    raise ValueError(args[i])
+                i += 1
+            days = float(days) if days is not None else None
+            max_bytes = int(max_bytes) if max_bytes is not None else None
+        except (IndexError, ValueError):
+            self.print_error(f"Invalid options: {arg}")
+            return
+        # Running tasks and the last query (saveq without task) are never removed
+        running = [task["folder"] for task in self.tasks.values() if task.get("folder") and task["status"] is None]
+        keep = running + ([self.last_query] if self.last_query else [])
+        store = self.get_blob_store()
+        folders, freed, left, released = blob_store.plan_gc(os.path.join(self.workspace_path, "queries"), store, days * 86400 if days is not None else None, max_bytes, keep)
+        for folder in folders:
+            beautiful_print(f"{'Would remove' if dry_run else 'Removing'} {folder}", color=ORANGE_COLOR)
+            if not dry_run:
+                shutil.rmtree(folder, ignore_errors=True)
+                try:
+                    os.rmdir(os.path.dirname(folder))
+                except OSError:
+                    pass
+        if not dry_run and self.workspace_config.get("blob_store", True):
+            # The outputs of running tasks are still being written
+            running = tuple(os.path.normpath(folder) + os.sep for folder in running)
+            stored = [0, 0]
+            for folder in (os.path.join(self.workspace_path, "queries"), self.query_save_path):
+                count, deduplicated = store.put_tree(folder, lambda path: output_writers.writer_for_path(path) is not None and not os.path.normpath(path).startswith(running))
+                stored = [stored[0] + count, stored[1] + deduplicated]
+            beautiful_print(f"Stored {stored[0]} new outputs ({stored[1]} bytes freed by identical ones)")
+        blobs, blob_bytes = store.sweep(dry_run=dry_run, released=released)
+        if dry_run:
+            beautiful_print(f"{len(folders)} task folders ({freed} bytes) would be removed, {left} bytes left. {blobs} unreferenced stored outputs ({blob_bytes} bytes)")
+        else:
+            beautiful_print(f"Removed {len(folders)} task folders ({freed} bytes), {left} bytes left. Removed {blobs} unreferenced stored outputs ({blob_bytes} bytes)", color=GREEN_COLOR)
         
     def do_exit(self, arg):
         """Exit the Oracle prompt."""
         for task_id in list(self.tasks.keys()):
             if self.tasks[task_id]["process"] and (not self.tasks[task_id]["process"].done()):
                 self.do_stoptsk(task_id)
+        # Sync tasks submitted but not started yet are dropped
+        self.sync_executor.shutdown(wait=False, cancel_futures=True)
+        self.flush_cache()
         return True
     
     def do_savecmd(self, arg):
@@ -342,7 +2036,7 @@ class OracleCmd(cmd.Cmd):
         
         args = shlex.split(arg)
         if len(args) == 0:
-            beautiful_print("Please specify the command name", color=RED_COLOR)
+            self.print_error("Please specify the command name")
             return
         
         name = args[0]
@@ -352,7 +2046,7 @@ class OracleCmd(cmd.Cmd):
         )
         if args[0] == "-w":
             if len(args) < 2:
-                beautiful_print("Please specify the command name", color=RED_COLOR)
+                self.print_error("Please specify the command name")
                 return
             name = args[1]
             path_to_list_command = os.path.join(
@@ -391,15 +2085,57 @@ class OracleCmd(cmd.Cmd):
         
     def do_runcmd(self, arg):
         """Runs a user command
-        USAGE: runcmd [-a] <CMD_NAME> [args...]
-        -a -> run async"""
+        USAGE: runcmd [-a] [-c] [--params FILE [-p SESSIONS] [-b BATCH_SIZE]] <CMD_NAME> [args...]
+        -a -> run async
+        -c -> commit at the end
+        --params -> runs the command once per bind set of FILE (csv with a header, or JSON lines). Named bind variables
+                    take the fields of the same name, positional ones the fields in order. DML is run with one executemany
+                    per batch, the results of a query for every bind set go to a single output led by BIND_<NAME> columns
+        -p -> spreads the batches of bind sets over SESSIONS sessions (each one commits its own with -c)
+        -b -> bind sets per batch (default 10000)"""
+        from liouss_python_oracle_cli import bind_sets
         args = shlex.split(arg)
+        asyn = False
+        commit = False
+        params_path = None
+        sessions = 1
+        batch_size = bind_sets.DEFAULT_BIND_BATCH_SIZE
+        try:
+            while args and args[0].startswith("-"):
+                if args[0] == "-a":
+                    asyn = True
+                elif args[0] == "-c":
+                    commit = True
+                elif args[0] == "--params":
+                    params_path = real_path(args[1])
+                    args = args[1:]
+                elif args[0] == "-p":
+                    sessions = int(args[1])
+                    args = args[1:]
+                elif args[0] == "-b":
+                    batch_size = int(args[1])
+                    args = args[1:]
+                else:
+                    self.print_error(f"Unknown option: {args[0]}")
+                    return
+                args = args[1:]
+        except (IndexError, ValueError):
+            self.print_error(f"Invalid options: {arg}")
+            return
         if not args:
-            beautiful_print("Please specify the command name", color=RED_COLOR)
+            self.print_error("Please specify the command name")
+            return
+        if sessions <= 0 or batch_size <= 0:
+            self.print_error("Number of sessions and batch size must be positive")
+            return
+        if params_path is not None and not os.path.isfile(params_path):
+            self.print_error(f"File not found: {params_path}")
+            return
+        if params_path is not None and len(args) > 1:
+            self.print_error("Arguments cannot be combined with --params")
             return
         
-        asyn = args[0] == "-a"
-        command = args[1] if asyn else args[0]
+        command = args[0]
         
         os.makedirs(os.path.join(
             os.path.dirname(os.path.abspath(__file__)),
@@ -425,12 +2161,15 @@ class OracleCmd(cmd.Cmd):
         if not os.path.exists(path_to_load_command_workspace):
             found_local = False
             if not os.path.exists(path_to_load_command):
-                beautiful_print("Unknown command. listcmd to get the list of available commands", color=RED_COLOR)
+                self.print_error("Unknown command. listcmd to get the list of available commands")
                 return
             
         with open(path_to_load_command_workspace if found_local else path_to_load_command,"r") as f:
             command = f.read()
-            self.start_task(f"runcmd {arg}", self.query_oracle, not asyn, self.oracle_identifiers, [command], False, placeholders=tuple(args[1:]) if len(args) > 1 else None)
+        if params_path is not None:
+            self.start_task(f"runcmd {arg}", self.run_bind_sets, not asyn, self.oracle_identifiers, command, params_path, sessions, batch_size, commit, kind="load", priority=PRIORITY_BATCH)
+            return
+        self.start_task(f"runcmd {arg}", self.query_oracle, not asyn, self.oracle_identifiers, [command], commit, placeholders=tuple(args[1:]) if len(args) > 1 else None)
     
     def do_workspace(self, arg):
         """Switches to specified workspace. No arg = list all workspaces and shows the current one. -c to create new workspace
@@ -448,7 +2187,7 @@ class OracleCmd(cmd.Cmd):
         
         if args[0] == "-c":
             if len(args) != 3:
-                beautiful_print("please specify <name> and <path>", RED_COLOR)
+                self.print_error("please specify <name> and <path>")
                 return
             self.createworkspace(args[1], args[2])
             return
@@ -456,7 +2195,7 @@ class OracleCmd(cmd.Cmd):
         arg = args[0].lower().strip(" \n\r\t")
         
         if not arg in workspaces:
-            beautiful_print(f"no workspace named {arg}", RED_COLOR)
+            self.print_error(f"no workspace named {arg}")
             return
         
         self.switch_workspace(arg)
@@ -469,24 +2208,61 @@ class OracleCmd(cmd.Cmd):
     def do_saveq(self, arg):
         """
         Saves last query as name
-        USAGE: saveq <NAME> [TASK]
+        USAGE: saveq [--incremental COLUMN [--key COLUMN,...]] <NAME> [TASK]
+        --incremental -> reruns only fetch the rows whose COLUMN (date, timestamp, sequence, or ORA_ROWSCN exposed by
+                         the query under an alias) is past the highest value already fetched, and append them to the saved output
+                         (in place for csv and csv.gz, other formats rewrite the whole saved output on every rerun)
+        --key -> merges the new rows into the saved output instead: rows with the same key are replaced (csv formats only).
+                 Every rerun rewrites the whole saved output and keeps the keys of the new rows in memory
         """
+        from liouss_python_oracle_cli import incremental
+        from liouss_python_oracle_cli import blob_store
         args = shlex.split(arg)
+        column = None
+        key = None
+        try:
+            while args and args[0].startswith("--"):
+                if args[0] == "--incremental":
+                    column = args[1]
+                elif args[0] == "--key":
+                    key = [c.strip() for c in args[1].split(",") if c.strip()]
+                else:
+                    self.print_error(f"Unknown option: {args[0]}")
+                    return
+                args = args[2:]
+        except IndexError:
+            self.print_error(f"Invalid options: {arg}")
+            return
+        if key and column is None:
+            self.print_error("--key needs --incremental")
+            return
+        writer_class = output_writers.get_output_writer(self.workspace_config.get("output_format"))
+        if key and not incremental.supports_key_merge(writer_class):
+            self.print_error(f"--key is not supported with the {writer_class.extension} format")
+            return
         if len(args) == 0:
-            beautiful_print("error: no name specified", RED_COLOR)
+            self.print_error("error: no name specified")
             return
         
         if len(args) <= 1 and (self.last_query is None or self.last_query_content is None):
-            beautiful_print("error: no query was executed", RED_COLOR)
+            self.print_error("error: no query was executed")
             return
         
         name = args[0].lower().strip("\n\r ")
-        copied = (self.last_query or "") if len(args) == 1 else self.get_query_save_folder_path(args[1])
+        copied = (self.last_query or "") if len(args) == 1 else self.find_task_folder(args[1])
+        if copied is None:
+            self.print_error(f"error: no task found with ID: {args[1]}")
+            return
         
         save_folder_path = os.path.join(self.query_save_path, name)
         
         os.makedirs(save_folder_path, exist_ok=True)
-        copy_dir(copied, save_folder_path)
+        # Outputs and LOB files are hard linked, not copied: saving does not depend on the size of the result
+        blob_store.link_tree(copied, save_folder_path, lambda path: output_writers.writer_for_path(path) is not None or path.startswith(lob_export.LOB_FOLDER + os.sep))
+        if column is not None:
+            incremental.save_state(save_folder_path, incremental.new_state(column, key, writer_class.extension))
+        elif os.path.exists(os.path.join(save_folder_path, incremental.WATERMARK_FILE)):
+            os.remove(os.path.join(save_folder_path, incremental.WATERMARK_FILE))
 
         beautiful_print(f"query {name} saved")
     
@@ -496,7 +2272,9 @@ class OracleCmd(cmd.Cmd):
         rerun -> lists all available queries to rerun
         rerun <NAME> -> reruns the saved query
         rerun -a <NAME> -> reruns the saved query asyncly
+        Queries saved with saveq --incremental only fetch the rows past their watermark.
         """
+        from liouss_python_oracle_cli import incremental
         args = shlex.split(arg)
         existing = os.listdir(self.query_save_path)
         
@@ -508,10 +2286,14 @@ class OracleCmd(cmd.Cmd):
         asyn = len(args) >= 2 and args[0] == "-a"
         
         if not saved in existing:
-            beautiful_print("error: this query does not exist", RED_COLOR)
+            self.print_error("error: this query does not exist")
             return
         
-        with open(os.path.join(self.query_save_path, saved, "query.sql"), 'r') as f:
+        saved_folder = os.path.join(self.query_save_path, saved)
+        if incremental.load_state(saved_folder) is not None:
+            self.start_task(f"rerun {saved}", self.rerun_incremental, not asyn, self.oracle_identifiers, saved_folder)
+            return
+        with open(os.path.join(saved_folder, "query.sql"), 'r') as f:
             query = f.read()
             self.do_q(f"-a {query}" if asyn else query)
     
@@ -522,15 +2304,44 @@ class OracleCmd(cmd.Cmd):
         -a -> async task
         -e -> explains plan for query
         -c -> auto commit at the end of the query
+        --format <FORMAT> -> output format: csv (default), csv.gz, csv.zst, parquet or arrow
+        --timeout <SECONDS> -> cancels the query if it runs longer than SECONDS
+        --no-cache -> runs the query even if its result is in the cache, without caching the new result
+        --refresh -> runs the query and replaces its cached result
         """
         args = shlex.split(arg)
 
         asyn = False
         explain = False
         commit = False
+        output_format = None
+        timeout = None
+        cache = "auto"
         i = 0
         while i < len(args) and args[i].startswith("-"):
             flag = args[i]
+            if flag in ("--no-cache", "--refresh"):
+                cache = "off" if flag == "--no-cache" else "refresh"
+                i += 1
+                continue
+            if flag.startswith("--"):
+                name, _, value = flag[2:].partition("=")
+                if name not in ("format", "timeout"):
+                    self.print_error(f"Unknown option: {flag}")
+                    return
+                if not value:
+                    i += 1
+                    value = args[i] if i < len(args) else ""
+                if name == "format":
+                    output_format = value
+                else:
+                    try:
+                        timeout = float(value)
+                    except ValueError:
+                        self.print_error(f"Invalid timeout: {value}")
+                        return
+                i += 1
+                continue
             if "a" in flag:
                 asyn = True
             if "e" in flag:
@@ -543,7 +2354,7 @@ class OracleCmd(cmd.Cmd):
         if not query:
             query = edit_in_editor("Type your query on the line below", ignore_lines=1)
         if not query:
-            beautiful_print("No query to run", color=RED_COLOR)
+            self.print_error("No query to run")
             return
         
         queries = [query]    
@@ -551,8 +2362,26 @@ class OracleCmd(cmd.Cmd):
             queries[0] = f"EXPLAIN PLAN FOR {queries[0]}"
             queries.append("SELECT * FROM TABLE(DBMS_XPLAN.DISPLAY(NULL, NULL, 'TYPICAL'))")
         
-        self.start_task(f"q {arg}", self.query_oracle, not asyn, self.oracle_identifiers, queries, commit)
+        if output_format is not None and output_format.lower() not in output_writers.OUTPUT_WRITERS:
+            self.print_error(f"Unknown output format {output_format}, expected one of: {', '.join(output_writers.OUTPUT_WRITERS)}")
+            return
+        
+        self.start_task(f"q {arg}", self.query_oracle, not asyn, self.oracle_identifiers, queries, commit, output_format=output_format, timeout=timeout, cache=cache)
             
+    def do_cache(self, arg):
+        """Shows or clears the query result cache of the workspace.
+        Usage: cache [clear]"""
+        cache = self.get_result_cache()
+        if arg.strip() == "clear":
+            beautiful_print(f"Removed {cache.clear()} cached results")
+            return
+        if arg.strip():
+            self.print_error(f"Unknown argument: {arg}")
+            return
+        stats = cache.stats()
+        state = f"ttl {stats['ttl']:g}s" if cache.enabled else "disabled (set cache_ttl in the workspace)"
+        beautiful_print(f"{stats['entries']} cached results, {stats['bytes']}/{stats['max_bytes']} bytes, {state}")
+    
     def do_annotate(self, arg):
         """
         Used to edit the README.md associated to a saveq directory
@@ -560,12 +2389,12 @@ class OracleCmd(cmd.Cmd):
         """
         args = shlex.split(arg)
         if len(args) == 0:
-            beautiful_print("error: please specify a saved query name", color=RED_COLOR)
+            self.print_error("error: please specify a saved query name")
             return
         
         dir_path = os.path.join(self.query_save_path, args[0])
         if not os.path.isdir(dir_path):
-            beautiful_print("error: no saved query with such name", color=RED_COLOR)
+            self.print_error("error: no saved query with such name")
             return
         
         save_folder_path = os.path.join(dir_path, "README.md")
@@ -576,24 +2405,36 @@ class OracleCmd(cmd.Cmd):
         Opens last query in default editor, executes on save (async if last time was async, sync else)
         """
         if not self.last_submitted_content:
-            beautiful_print("No last query to run", color=RED_COLOR)
+            self.print_error("No last query to run")
             return
         
         to_exec = edit_in_editor(self.last_submitted_content)
         self.do_q(f"-a {to_exec}" if not self.last_submitted_content_sync else to_exec)
         
+def create_session_pool(connection_type, oracle_identifiers, pool_config:dict) -> SessionPool:
+    return SessionPool(
+        lambda: generateConnection(connection_type, oracle_identifiers),
+        min_size=int(pool_config.get("min_size", DEFAULT_POOL_MIN_SIZE)),
+        max_size=int(pool_config.get("max_size", DEFAULT_POOL_MAX_SIZE)),
+        idle_timeout=float(pool_config.get("idle_timeout", DEFAULT_POOL_IDLE_TIMEOUT)),
+        health_check=bool(pool_config.get("health_check", True)),
+        # Looked up once per session instead of once per statement
+        on_open=get_oracle_connection_identifiers,
+    )
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "run":
+        from liouss_python_oracle_cli.headless import run_headless
+        sys.exit(run_headless(sys.argv[2:]))
+    
     beautiful_print("~~~----~~~")
     beautiful_print("Oracle CLI V0.2.0")
     beautiful_print("Author: Liouss")
     beautiful_print("~~~----~~~")
     
-    CONNECTION_TYPES = "oracle"
+    CONNECTION_TYPES = CONNECTION_TYPE
     
-    ORACLE_ID_LOCATION = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)),
-        "ORACLE_IDENTIFIER.json"
-    )
+    ORACLE_ID_LOCATION = ORACLE_ID_PATH
     ORACLE_ID_LOCATION_EXMP = os.path.join(
         os.path.dirname(os.path.abspath(__file__)),
         "ORACLE_IDENTIFIER.example.json"
@@ -618,15 +2459,17 @@ def main():
     config = open_config()
     last_workspace = config.get("last_workspace", DEFAULT_WORKSPACE)
     
+    pool_config = config.get("session_pool", {})
+    
     cli = None
     try:
-        with ThreadPoolExecutor() as pool:
+        with create_session_pool(CONNECTION_TYPES, oracle_identifiers, pool_config) as session_pool, TaskScheduler() as pool:
             connection = generateConnection(CONNECTION_TYPES, oracle_identifiers)
             if not connection:
                 exit(1)
                 
             with connection:
-                cli = OracleCmd(oracle_identifiers, connection, CONNECTION_TYPES, pool)
+                cli = OracleCmd(oracle_identifiers, connection, CONNECTION_TYPES, pool, session_pool)
                 cli.switch_workspace(last_workspace)
                 cli.cmdloop()
             
@@ -634,5 +2477,7 @@ def main():
         if cli is not None:
             beautiful_print("Stopping all tasks and exiting")
             cli.do_exit("")
+            if cli.connection is not cli.initial_connection:
+                close_connection(cli.connection)
             
         beautiful_print("Oracle prompter stopped")
\ No newline at end of file
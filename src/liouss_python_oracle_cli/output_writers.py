@@ -0,0 +1,406 @@
+import csv
+import decimal
+import gzip
+import importlib
+import io
+import itertools
+import shutil
+from typing import Iterator, Optional
+from liouss_python_oracle_cli.row_index import RowIndexBuilder
+
+DEFAULT_OUTPUT_FORMAT = "csv"
+MERGE_BATCH_ROWS = 10000
+# Widest arrow decimal, also the precision of an Oracle NUMBER declared without one
+MAX_DECIMAL_PRECISION = 38
+# Scale python-oracledb reports for NUMBER and FLOAT columns declared without scale
+UNDEFINED_SCALE = -127
+
+class OutputWriter:
+    """Base class of the query result writers. A writer is opened with the cursor description,
+    receives the rows chunk by chunk through write_rows and must be closed to finalize the file."""
+    extension = ""
+
+    def __init__(self, path:str, description:list) -> None:
+        self.path = path
+        self.description = description
+        self.columns = [col[0] for col in description]
+
+    def write_rows(self, rows:list) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    @classmethod
+    def open_text(cls, path:str) -> Optional[io.TextIOBase]:
+        """Opens the file as csv text for previews, None if the format is not text based."""
+        return None
+
+    @classmethod
+    def read_rows(cls, path:str) -> Iterator[list[str]]:
+        """Rows of the file as text, the header first, like a csv reader over the file."""
+        text = cls.open_text(path)
+        if text is None:
+            raise NotImplementedError(f"reading {cls.extension} files is not supported")
+        with text as f:
+            yield from csv.reader(f)
+
+    @classmethod
+    def merge(cls, paths:list[str], destination:str) -> None:
+        """Concatenates, in order, files written by this writer for the same query into destination."""
+        raise NotImplementedError(f"merging {cls.extension} files is not supported")
+
+    @classmethod
+    def merge_labelled(cls, sources:list[tuple[str, str]], destination:str, column:str) -> None:
+        """Concatenates (label, path) files written by this writer for the same query into destination,
+        with a first column named column holding the label of the file each row comes from."""
+        writer = None
+        header = None
+        try:
+            for label, path in sources:
+                text = cls.open_text(path)
+                if text is None:
+                    raise NotImplementedError(f"merging {cls.extension} files is not supported")
+                with text as f:
+                    reader = csv.reader(f)
+                    columns = next(reader, None)
+                    if columns is None:
+                        continue
+                    if writer is None:
+                        header = columns
+                        writer = cls(destination, [(column,)] + [(name,) for name in columns])
+                    elif columns != header:
+                        raise ValueError(f"{path} does not have the columns of the other files: {', '.join(columns)}")
+                    for rows in iter(lambda: list(itertools.islice(reader, MERGE_BATCH_ROWS)), []):
+                        writer.write_rows([[label] + row for row in rows])
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class CsvWriter(OutputWriter):
+    extension = "csv"
+    # Plain files get a sparse row-offset index for head/tail/page/grep, compressed ones cannot be read from an offset
+    indexed = True
+
+    def __init__(self, path:str, description:list) -> None:
+        super().__init__(path, description)
+        self._file = self._open(path)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.columns)
+        self._rows = 0
+        self._index = None
+        if self.indexed:
+            self._index = RowIndexBuilder(path)
+            self._index.start(self._file.tell())
+
+    def _open(self, path:str):
+        return open(path, "w", newline="")
+
+    def write_rows(self, rows:list) -> None:
+        self._writer.writerows(rows)
+        self._rows += len(rows)
+        if self._index is not None and self._index.needs_entry(self._rows):
+            self._index.add(self._rows, self._file.tell())
+
+    def close(self) -> None:
+        if self._index is not None:
+            self._index.save(self._rows, self._file.tell())
+        self._file.close()
+
+    @classmethod
+    def open_text(cls, path:str):
+        return open(path, "r", newline="")
+
+    @classmethod
+    def merge(cls, paths:list[str], destination:str) -> None:
+        # Plain csv is copied byte for byte, keeping only the header of the first file
+        with open(destination, "wb") as out:
+            for i, path in enumerate(paths):
+                with open(path, "rb") as f:
+                    if i > 0:
+                        f.readline()
+                    shutil.copyfileobj(f, out, 16 * 1024 * 1024)
+
+def _merge_csv_rows(cls, paths:list[str], destination:str) -> None:
+    # Compressed csv has to be decompressed to drop the headers of the following files
+    writer = None
+    try:
+        for path in paths:
+            with cls.open_text(path) as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is None:
+                    continue
+                if writer is None:
+                    writer = cls(destination, [(name,) for name in header])
+                for rows in iter(lambda: list(itertools.islice(reader, MERGE_BATCH_ROWS)), []):
+                    writer.write_rows(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+
+class GzipCsvWriter(CsvWriter):
+    extension = "csv.gz"
+    indexed = False
+
+    def _open(self, path:str):
+        return gzip.open(path, "wt", newline="", compresslevel=6)
+
+    @classmethod
+    def open_text(cls, path:str):
+        return gzip.open(path, "rt", newline="")
+
+    merge = classmethod(_merge_csv_rows)
+
+class ZstdCsvWriter(CsvWriter):
+    extension = "csv.zst"
+    indexed = False
+
+    def _open(self, path:str):
+        zstandard = _import_optional("zstandard", "csv.zst")
+        self._raw = open(path, "wb")
+        return io.TextIOWrapper(zstandard.ZstdCompressor(level=3).stream_writer(self._raw), newline="")
+
+    def close(self) -> None:
+        super().close()
+        self._raw.close()
+
+    @classmethod
+    def open_text(cls, path:str):
+        zstandard = _import_optional("zstandard", "csv.zst")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True), newline="")
+
+    merge = classmethod(_merge_csv_rows)
+
+def _import_optional(module:str, output_format:str):
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise ImportError(f"output format {output_format} requires the {module.split('.')[0]} package (pip install {module.split('.')[0]})") from None
+
+def arrow_type(pa, col):
+    """Maps an entry of cursor.description to the arrow type keeping the Oracle type of the column. NUMBER columns
+    with a scale are never floats: integers up to 18 digits are int64, the others decimals. A NUMBER without scale
+    can hold any decimal value, the driver fetches its fractional values as floats: it is float64, and integers
+    beyond 2**53 lose their last digits."""
+    type_name = str(getattr(col[1], "name", col[1])).upper()
+    precision, scale = col[4], col[5]
+    if "BINARY_FLOAT" in type_name or "BINARY_DOUBLE" in type_name:
+        return pa.float64()
+    if "NUMBER" in type_name:
+        if scale is None or scale == UNDEFINED_SCALE:
+            return pa.float64()
+        # A negative scale rounds to the left of the decimal point: NUMBER(5, -2) holds 7 digit integers
+        digits = precision - min(scale, 0) if precision else MAX_DECIMAL_PRECISION
+        scale = max(scale, 0)
+        if scale == 0 and digits <= 18:
+            return pa.int64()
+        return pa.decimal128(min(max(digits, scale), MAX_DECIMAL_PRECISION), scale)
+    if "INTERVAL" in type_name:
+        # INTERVAL YEAR TO MONTH has no fixed duration
+        return pa.string() if "YM" in type_name else pa.duration("us")
+    if "DATE" in type_name or "TIMESTAMP" in type_name:
+        return pa.timestamp("us")
+    if "RAW" in type_name or "BLOB" in type_name:
+        return pa.binary()
+    if "BOOLEAN" in type_name:
+        return pa.bool_()
+    return pa.string()
+
+def _to_decimal(value):
+    # Fractional NUMBER values are fetched as floats, their shortest repr is the value Oracle sent
+    return decimal.Decimal(repr(value)) if isinstance(value, float) else value
+
+def _to_float(value):
+    # pa.array refuses integers that a double cannot hold exactly
+    return value if value is None or isinstance(value, float) else float(value)
+
+def _to_text(value):
+    return value if value is None or isinstance(value, str) else str(value)
+
+def arrow_converter(pa, arrow_field_type, col):
+    """Conversion of the fetched values of a column before they are given to pa.array, None when they are taken as is."""
+    if pa.types.is_decimal(arrow_field_type):
+        return _to_decimal
+    type_name = str(getattr(col[1], "name", col[1])).upper()
+    if pa.types.is_float64(arrow_field_type) and "NUMBER" in type_name:
+        return _to_float
+    if pa.types.is_string(arrow_field_type) and ("NUMBER" in type_name or "INTERVAL" in type_name):
+        return _to_text
+    return None
+
+class ArrowWriterBase(OutputWriter):
+    def __init__(self, path:str, description:list) -> None:
+        super().__init__(path, description)
+        self.pa = _import_optional("pyarrow", self.extension)
+        self.schema = self.pa.schema([(name, arrow_type(self.pa, col)) for name, col in zip(self.columns, description)])
+        self._converters = [arrow_converter(self.pa, field.type, col) for field, col in zip(self.schema, description)]
+
+    @staticmethod
+    def _labelled(pa, table, label:str, column:str, schema=None):
+        # The files of the other sources are cast to the schema of the first one, a NUMBER column can be typed differently
+        table = table.add_column(0, pa.field(column, pa.string()), pa.array([label] * table.num_rows, type=pa.string()))
+        return table if schema is None or table.schema.equals(schema) else table.cast(schema)
+
+    @staticmethod
+    def _text_rows(batch) -> Iterator[list[str]]:
+        # The text csv.writer would have written
+        for row in zip(*(column.to_pylist() for column in batch.columns)):
+            yield ["" if value is None else str(value) for value in row]
+
+    def _batch(self, rows:list):
+        pa = self.pa
+        columns = list(zip(*rows)) if rows else [[] for _ in self.columns]
+        columns = [values if convert is None else [convert(value) for value in values] for values, convert in zip(columns, self._converters)]
+        return pa.RecordBatch.from_arrays([pa.array(values, type=field.type) for values, field in zip(columns, self.schema)], schema=self.schema)
+
+class ParquetWriter(ArrowWriterBase):
+    extension = "parquet"
+
+    def __init__(self, path:str, description:list) -> None:
+        super().__init__(path, description)
+        parquet = _import_optional("pyarrow.parquet", self.extension)
+        self._writer = parquet.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write_rows(self, rows:list) -> None:
+        self._writer.write_table(self.pa.Table.from_batches([self._batch(rows)]))
+
+    def close(self) -> None:
+        self._writer.close()
+
+    @classmethod
+    def merge(cls, paths:list[str], destination:str) -> None:
+        parquet = _import_optional("pyarrow.parquet", cls.extension)
+        writer = None
+        try:
+            for path in paths:
+                source = parquet.ParquetFile(path)
+                if writer is None:
+                    writer = parquet.ParquetWriter(destination, source.schema_arrow, compression="zstd")
+                for i in range(source.num_row_groups):
+                    writer.write_table(source.read_row_group(i))
+        finally:
+            if writer is not None:
+                writer.close()
+
+    @classmethod
+    def read_rows(cls, path:str) -> Iterator[list[str]]:
+        parquet = _import_optional("pyarrow.parquet", cls.extension)
+        source = parquet.ParquetFile(path)
+        yield source.schema_arrow.names
+        for batch in source.iter_batches(batch_size=MERGE_BATCH_ROWS):
+            yield from cls._text_rows(batch)
+
+    @classmethod
+    def merge_labelled(cls, sources:list[tuple[str, str]], destination:str, column:str) -> None:
+        pa = _import_optional("pyarrow", cls.extension)
+        parquet = _import_optional("pyarrow.parquet", cls.extension)
+        writer = None
+        try:
+            for label, path in sources:
+                source = parquet.ParquetFile(path)
+                for i in range(source.num_row_groups):
+                    table = cls._labelled(pa, source.read_row_group(i), label, column, writer.schema if writer is not None else None)
+                    if writer is None:
+                        writer = parquet.ParquetWriter(destination, table.schema, compression="zstd")
+                    writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+
+class ArrowIpcWriter(ArrowWriterBase):
+    extension = "arrow"
+
+    def __init__(self, path:str, description:list) -> None:
+        super().__init__(path, description)
+        self._sink = self.pa.OSFile(path, "wb")
+        self._writer = self.pa.ipc.new_file(self._sink, self.schema)
+
+    def write_rows(self, rows:list) -> None:
+        self._writer.write_batch(self._batch(rows))
+
+    def close(self) -> None:
+        self._writer.close()
+        self._sink.close()
+
+    @classmethod
+    def merge(cls, paths:list[str], destination:str) -> None:
+        pa = _import_optional("pyarrow", cls.extension)
+        sink = None
+        writer = None
+        try:
+            for path in paths:
+                with pa.memory_map(path) as source:
+                    reader = pa.ipc.open_file(source)
+                    if writer is None:
+                        sink = pa.OSFile(destination, "wb")
+                        writer = pa.ipc.new_file(sink, reader.schema)
+                    for i in range(reader.num_record_batches):
+                        writer.write_batch(reader.get_batch(i))
+        finally:
+            if writer is not None:
+                writer.close()
+            if sink is not None:
+                sink.close()
+
+    @classmethod
+    def read_rows(cls, path:str) -> Iterator[list[str]]:
+        pa = _import_optional("pyarrow", cls.extension)
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            yield reader.schema.names
+            for i in range(reader.num_record_batches):
+                yield from cls._text_rows(reader.get_batch(i))
+
+    @classmethod
+    def merge_labelled(cls, sources:list[tuple[str, str]], destination:str, column:str) -> None:
+        pa = _import_optional("pyarrow", cls.extension)
+        sink = None
+        writer = None
+        schema = None
+        try:
+            for label, path in sources:
+                with pa.memory_map(path) as source:
+                    reader = pa.ipc.open_file(source)
+                    for i in range(reader.num_record_batches):
+                        table = cls._labelled(pa, pa.Table.from_batches([reader.get_batch(i)]), label, column, schema)
+                        if writer is None:
+                            schema = table.schema
+                            sink = pa.OSFile(destination, "wb")
+                            writer = pa.ipc.new_file(sink, schema)
+                        writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+            if sink is not None:
+                sink.close()
+
+OUTPUT_WRITERS = {
+    "csv": CsvWriter,
+    "csv.gz": GzipCsvWriter,
+    "csv.zst": ZstdCsvWriter,
+    "parquet": ParquetWriter,
+    "arrow": ArrowIpcWriter,
+}
+
+def register_output_writer(output_format:str, writer_class:type) -> None:
+    OUTPUT_WRITERS[output_format] = writer_class
+
+def get_output_writer(output_format:Optional[str]) -> type:
+    output_format = (output_format or DEFAULT_OUTPUT_FORMAT).lower()
+    if output_format not in OUTPUT_WRITERS:
+        raise ValueError(f"unknown output format {output_format}, expected one of: {', '.join(OUTPUT_WRITERS)}")
+    return OUTPUT_WRITERS[output_format]
+
+def writer_for_path(path:str) -> Optional[type]:
+    """Returns the writer class that produced an output file, from its extension."""
+    for writer_class in sorted(OUTPUT_WRITERS.values(), key=lambda w: -len(w.extension)):
+        if path.endswith(f".{writer_class.extension}"):
+            return writer_class
+    return None
@@ -0,0 +1,169 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Optional, TYPE_CHECKING
+from liouss_python_oracle_cli.row_index import INDEX_SUFFIX
+
+if TYPE_CHECKING:
+    from liouss_python_sql_connectors.sql_connection import SQLConnection
+
+DEFAULT_CACHE_TTL = 0
+DEFAULT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+INDEX_FILE = "index.json"
+
+_TOKENS = re.compile(r"('(?:[^']|'')*'|\"[^\"]*\")|(?:--[^\n]*|/\*(?!\+).*?\*/|\s+)+", re.DOTALL)
+_READ_ONLY = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+_VOLATILE = re.compile(r"\b(SYSDATE|SYSTIMESTAMP|CURRENT_DATE|CURRENT_TIMESTAMP|LOCALTIMESTAMP|DBMS_RANDOM|SYS_GUID|NEXTVAL|USERENV|SYS_CONTEXT)\b|\bFOR\s+UPDATE\b", re.IGNORECASE)
+
+def normalize_sql(sql:str) -> str:
+    """Drops comments and collapses whitespace outside of quoted literals and identifiers."""
+    return _TOKENS.sub(lambda m: m.group(1) or " ", sql).strip(" ;")
+
+def is_cacheable(sql:str) -> bool:
+    # Only plain queries whose result does not depend on the moment or the session they run in
+    return bool(_READ_ONLY.match(sql)) and not _VOLATILE.search(sql)
+
+def cache_key(sql:str, placeholders, identity:str, extension:str) -> str:
+    payload = json.dumps([normalize_sql(sql), list(placeholders or []), identity, extension], default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def tables_scn(connection:SQLConnection, tables) -> Optional[dict]:
+    """Latest ORA_ROWSCN of each table, None if one of them cannot be read. Scans the tables: meant for small reference tables."""
+    scns = {}
+    cursor = connection.get_db().cursor()
+    try:
+        for table in sorted(tables):
+            cursor.execute(f"SELECT MAX(ORA_ROWSCN) FROM {table}")
+            scn = cursor.fetchone()[0]
+            scns[table] = int(scn) if scn is not None else None
+        return scns
+    except Exception:
+        return None
+    finally:
+        cursor.close()
+
+def link_file(source:str, destination:str) -> None:
+    """Hard links source to destination, falls back to a symbolic link then to a copy across file systems.
+    The row index of source, if any, is linked along."""
+    for source_path, destination_path in ((source, destination), (f"{source}{INDEX_SUFFIX}", f"{destination}{INDEX_SUFFIX}")):
+        if os.path.lexists(destination_path):
+            os.remove(destination_path)
+        if source_path != source and not os.path.exists(source_path):
+            continue
+        try:
+            os.link(source_path, destination_path)
+            continue
+        except OSError:
+            pass
+        try:
+            os.symlink(os.path.abspath(source_path), destination_path)
+        except OSError:
+            shutil.copyfile(source_path, destination_path)
+
+class ResultCache:
+    """Query outputs of a workspace kept for ttl seconds, evicted least recently used first once they use more than max_bytes.
+    Entries are files of the cache folder hard linked to the task outputs, the index maps keys to them.
+    A hit only updates last_used in memory, written with the next change of the index or by flush."""
+
+    def __init__(self, folder:str, ttl:float=DEFAULT_CACHE_TTL, max_bytes:int=DEFAULT_CACHE_MAX_BYTES) -> None:
+        self.folder = folder
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(folder, INDEX_FILE)
+        self._index = None
+        self._dirty = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _load(self) -> dict:
+        # Called with the lock held
+        if self._index is None:
+            try:
+                with open(self._index_path, "r") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save(self) -> None:
+        os.makedirs(self.folder, exist_ok=True)
+        tmp = f"{self._index_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._index, f, default=str)
+        os.replace(tmp, self._index_path)
+        self._dirty = False
+
+    def _drop(self, key:str) -> None:
+        entry = self._index.pop(key)
+        for path in (os.path.join(self.folder, entry["file"]), os.path.join(self.folder, f"{entry['file']}{INDEX_SUFFIX}")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def lookup(self, key:str) -> Optional[dict]:
+        """The entry of key if it is still fresh, with the path of its file. Marks it as recently used."""
+        with self._lock:
+            index = self._load()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            path = os.path.join(self.folder, entry["file"])
+            if time.time() - entry["created"] > self.ttl or not os.path.exists(path):
+                self._drop(key)
+                self._save()
+                return None
+            entry["last_used"] = time.time()
+            self._dirty = True
+            return {**entry, "path": path}
+
+    def flush(self) -> None:
+        """Writes the last_used times of the hits since the index was last written."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def invalidate(self, key:str) -> None:
+        with self._lock:
+            if key in self._load():
+                self._drop(key)
+                self._save()
+
+    def store(self, key:str, path:str, rows:int, scns:Optional[dict]=None) -> None:
+        file_name = f"{key}{path[path.index('.output'):] if '.output' in path else ''}"
+        with self._lock:
+            index = self._load()
+            os.makedirs(self.folder, exist_ok=True)
+            if key in index:
+                self._drop(key)
+            link_file(path, os.path.join(self.folder, file_name))
+            now = time.time()
+            index[key] = {"file": file_name, "created": now, "last_used": now, "bytes": os.path.getsize(path), "rows": rows, "scns": scns}
+            total = sum(entry["bytes"] for entry in index.values())
+            for old_key in sorted(index, key=lambda k: index[k]["last_used"]):
+                if total <= self.max_bytes:
+                    break
+                total -= index[old_key]["bytes"]
+                self._drop(old_key)
+            self._save()
+
+    def clear(self) -> int:
+        with self._lock:
+            keys = list(self._load())
+            for key in keys:
+                self._drop(key)
+            self._save()
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            index = self._load()
+            return {"entries": len(index), "bytes": sum(entry["bytes"] for entry in index.values()), "max_bytes": self.max_bytes, "ttl": self.ttl}
@@ -0,0 +1,156 @@
+import csv
+import hashlib
+import math
+import os
+import shutil
+from typing import Callable, Iterator, Optional
+from liouss_python_oracle_cli import output_writers
+
+DIFF_OUTPUT = "diff"
+DIFF_COLUMN = "DIFF"
+DEFAULT_DIFF_MEMORY_BYTES = 256 * 1024 * 1024
+# Both sides are spilled with one open file per partition
+MAX_PARTITIONS = 256
+CHECK_ROWS = 100000
+# A row loaded in a dict takes several times its size in the file, compressed csv about 8 times its size once read
+MEMORY_FACTOR = 4
+COMPRESSION_FACTOR = 8
+# A partition over the memory budget is split again on the next 4 bytes of the key hash (16 bytes)
+MAX_SPLIT_DEPTH = 3
+
+def _digest(values) -> bytes:
+    return hashlib.blake2b("\x1f".join(values).encode("utf-8"), digest_size=16).digest()
+
+def estimated_bytes(path:str, writer_class:type) -> int:
+    size = os.path.getsize(path)
+    return size if writer_class is output_writers.CsvWriter else size * COMPRESSION_FACTOR
+
+def partition_count(left_bytes:int, memory_bytes:int) -> int:
+    """Partitions needed for one partition of the left side to fit in memory_bytes."""
+    return max(1, min(MAX_PARTITIONS, math.ceil(left_bytes * MEMORY_FACTOR / max(memory_bytes, 1))))
+
+def _spill(rows:Iterator[list[str]], key_positions:list[int], folder:str, side:str, partitions:int, check:Optional[Callable]) -> int:
+    # Rows go to the partition of their key hash, the full row hash when there is no key
+    files = [open(os.path.join(folder, f"{side}.{i}.csv"), "w", newline="", encoding="utf-8") for i in range(partitions)]
+    try:
+        writers = [csv.writer(f) for f in files]
+        count = 0
+        for row in rows:
+            row_hash = _digest(row)
+            key_hash = _digest(row[i] for i in key_positions) if key_positions else row_hash
+            writers[int.from_bytes(key_hash[:4], "big") % partitions].writerow([key_hash.hex(), row_hash.hex()] + row)
+            count += 1
+            if check is not None and count % CHECK_ROWS == 0:
+                check()
+        return count
+    finally:
+        for f in files:
+            f.close()
+
+def _read_partition(path:str) -> Iterator[tuple[str, str, list[str]]]:
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for fields in csv.reader(f):
+            yield fields[0], fields[1], fields[2:]
+
+def _split(path:str, depth:int, partitions:int) -> list[str]:
+    # Same layout as _spill, the partition is chosen by other bytes of the key hash than at the previous depths
+    paths = [f"{path[:-len('.csv')]}.{i}.csv" for i in range(partitions)]
+    files = [open(split_path, "w", newline="", encoding="utf-8") for split_path in paths]
+    try:
+        writers = [csv.writer(f) for f in files]
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            for fields in csv.reader(f):
+                writers[int.from_bytes(bytes.fromhex(fields[0])[4 * depth:4 * depth + 4], "big") % partitions].writerow(fields)
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+def _diff_files(left_path:str, right_path:str, keyed:bool, emit:Callable, counts:dict, memory_bytes:Optional[int], depth:int=0, check:Optional[Callable]=None) -> None:
+    size = os.path.getsize(left_path)
+    if memory_bytes is not None and depth < MAX_SPLIT_DEPTH and size * MEMORY_FACTOR > memory_bytes:
+        # Skewed keys or a low estimate of the left side: the partition would not fit in memory
+        partitions = max(2, partition_count(size, memory_bytes))
+        lefts = _split(left_path, depth + 1, partitions)
+        rights = _split(right_path, depth + 1, partitions)
+        os.remove(left_path)
+        os.remove(right_path)
+        for split_left, split_right in zip(lefts, rights):
+            if check is not None:
+                check()
+            # Rows sharing one key cannot be split: that partition is compared as is
+            _diff_files(split_left, split_right, keyed, emit, counts, None if os.path.getsize(split_left) == size else memory_bytes, depth + 1, check)
+        return
+    _diff_partition(left_path, right_path, keyed, emit, counts)
+    os.remove(left_path)
+    os.remove(right_path)
+
+def _diff_partition(left_path:str, right_path:str, keyed:bool, emit:Callable, counts:dict) -> None:
+    left = {}
+    for key_hash, row_hash, row in _read_partition(left_path):
+        left.setdefault(key_hash, []).append((row_hash, row))
+    for key_hash, row_hash, row in _read_partition(right_path):
+        rows = left.get(key_hash)
+        same = next((i for i, (h, _) in enumerate(rows) if h == row_hash), None) if rows else None
+        if same is not None:
+            rows.pop(same)
+            counts["unchanged"] += 1
+        elif rows and keyed:
+            # Rows sharing a key that were not matched exactly are paired in file order
+            _, old = rows.pop(0)
+            emit("old", old)
+            emit("new", row)
+            counts["changed"] += 1
+        else:
+            emit("added", row)
+            counts["added"] += 1
+        if rows is not None and not rows:
+            del left[key_hash]
+    for rows in left.values():
+        for _, row in rows:
+            emit("removed", row)
+            counts["removed"] += 1
+
+def diff_rows(left:Iterator[list[str]], right:Iterator[list[str]], destination:str, key:Optional[list[str]]=None,
+              partitions:int=1, check:Optional[Callable]=None, memory_bytes:Optional[int]=None) -> dict:
+    """Compares two results given as rows with their header first, in bounded memory: both sides are spilled to hash
+    partitions next to destination and the partitions are compared one at a time, those still over memory_bytes once
+    spilled being split again. Without key, rows are compared as a
+    multiset; with key columns, rows of the same key whose values differ are changed. Writes a csv with a DIFF column
+    (added, removed, or old/new for the two versions of a changed row) to destination and returns the counts."""
+    header = next(left, None)
+    other = next(right, None)
+    if header is None or other is None:
+        raise ValueError("cannot compare an empty file")
+    if header != other:
+        raise ValueError(f"the results do not have the same columns: {', '.join(header)} / {', '.join(other)}")
+    key_positions = []
+    if key:
+        upper = [column.upper() for column in header]
+        missing = [column for column in key if column.upper() not in upper]
+        if missing:
+            raise ValueError(f"unknown key columns: {', '.join(missing)}")
+        key_positions = [upper.index(column.upper()) for column in key]
+    counts = {"left_rows": 0, "right_rows": 0, "added": 0, "removed": 0, "changed": 0, "unchanged": 0}
+    work = f"{destination}.partitions"
+    os.makedirs(work, exist_ok=True)
+    try:
+        counts["left_rows"] = _spill(left, key_positions, work, "left", partitions, check)
+        counts["right_rows"] = _spill(right, key_positions, work, "right", partitions, check)
+        with output_writers.CsvWriter(destination, [(column,) for column in [DIFF_COLUMN] + header]) as writer:
+            pending = []
+
+            def emit(change, row):
+                pending.append([change] + row)
+                if len(pending) >= output_writers.MERGE_BATCH_ROWS:
+                    writer.write_rows(pending)
+                    pending.clear()
+
+            for partition in range(partitions):
+                if check is not None:
+                    check()
+                _diff_files(os.path.join(work, f"left.{partition}.csv"), os.path.join(work, f"right.{partition}.csv"), bool(key_positions), emit, counts, memory_bytes, check=check)
+            writer.write_rows(pending)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return counts
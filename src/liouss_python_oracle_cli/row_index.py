@@ -0,0 +1,217 @@
+import bisect
+import collections
+import csv
+import io
+import itertools
+import json
+import mmap
+import os
+import re
+from typing import Optional
+
+INDEX_SUFFIX = ".idx"
+INDEX_STRIDE = 10000
+# Pattern constructs that can match differently in the raw bytes of the file than in a decoded field: anchors and
+# lookarounds (field boundaries), quotes (doubled by csv), byte-wide dot and classes (multibyte characters)
+_RAW_UNSAFE = re.compile(r'["^$.]|\\[AZbBwWsSdDxuUN0-7]|\(\?')
+
+class RowIndexBuilder:
+    """Sparse row-offset index of a csv output, fed by the writer: the byte offset of a row about every stride rows.
+    Rows are counted after the header, offsets are in bytes from the start of the file."""
+
+    def __init__(self, path:str, stride:int=INDEX_STRIDE) -> None:
+        self.path = path
+        self.stride = stride
+        self.entries = []
+
+    def start(self, offset:int) -> None:
+        self.entries.append([0, offset])
+
+    def needs_entry(self, rows:int) -> bool:
+        return rows - self.entries[-1][0] >= self.stride
+
+    def add(self, rows:int, offset:int) -> None:
+        self.entries.append([rows, offset])
+
+    def save(self, rows:int, size:int) -> None:
+        # Replaced rather than rewritten, the index of a saved output can be a link to the one of the task
+        tmp = f"{self.path}{INDEX_SUFFIX}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"rows": rows, "bytes": size, "entries": self.entries}, f)
+        os.replace(tmp, f"{self.path}{INDEX_SUFFIX}")
+
+def _row_starts(mm, start:int, end:int):
+    """Offsets of the rows starting in [start, end). A newline ends a row only outside of quotes: csv doubles the
+    quotes inside quoted fields, so the parity of the quotes seen tells whether a newline is inside a field."""
+    position = start
+    quotes = 0
+    row_start = start
+    while position < end:
+        newline = mm.find(b"\n", position, end)
+        stop = end if newline == -1 else newline + 1
+        quotes += mm[position:stop].count(b'"')
+        position = stop
+        if newline != -1 and quotes % 2 == 0:
+            yield row_start
+            row_start = stop
+    if row_start < end:
+        yield row_start
+
+def build_index(path:str, stride:int=INDEX_STRIDE) -> dict:
+    """Index of a csv file written without one (older outputs, files appended in place): one pass over the file."""
+    size = os.path.getsize(path)
+    builder = RowIndexBuilder(path, stride)
+    rows = 0
+    if size == 0:
+        builder.save(0, 0)
+        return {"rows": 0, "bytes": 0, "entries": [[0, 0]]}
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        starts = _row_starts(mm, 0, size)
+        next(starts, None)
+        for offset in starts:
+            if rows == 0:
+                builder.start(offset)
+            elif builder.needs_entry(rows):
+                builder.add(rows, offset)
+            rows += 1
+    if not builder.entries:
+        builder.start(size)
+    builder.save(rows, size)
+    return {"rows": rows, "bytes": size, "entries": builder.entries}
+
+def load_index(path:str) -> dict:
+    """The index of a csv file, rebuilt when it is missing or the file changed since it was written."""
+    try:
+        with open(f"{path}{INDEX_SUFFIX}", "r") as f:
+            index = json.load(f)
+        if index["bytes"] == os.path.getsize(path):
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    return build_index(path)
+
+class CsvResult:
+    """Random access to the rows of a csv output through its index: reads start from the closest indexed row."""
+
+    def __init__(self, path:str) -> None:
+        self.path = path
+        self.index = load_index(path)
+        self._rows = [entry[0] for entry in self.index["entries"]]
+
+    @property
+    def row_count(self) -> int:
+        return self.index["rows"]
+
+    def header(self) -> list[str]:
+        with open(self.path, "r", newline="") as f:
+            return next(csv.reader(f), [])
+
+    def rows(self, start:int, count:int) -> list[list[str]]:
+        start = max(0, min(start, self.row_count))
+        entry = self.index["entries"][bisect.bisect_right(self._rows, start) - 1]
+        with open(self.path, "rb") as f:
+            f.seek(entry[1])
+            reader = csv.reader(io.TextIOWrapper(f, newline=""))
+            return list(itertools.islice(reader, start - entry[0], start - entry[0] + count))
+
+    def tail(self, count:int) -> tuple[int, list[list[str]]]:
+        start = max(0, self.row_count - count)
+        return start, self.rows(start, count)
+
+    def grep(self, pattern:str, ignore_case:bool=False, limit:Optional[int]=None) -> list[tuple[int, list[str]]]:
+        """Rows with a field matching the regular expression, with their number, as StreamedResult.grep. The memory mapped
+        file is first searched by the regex engine for the patterns that match the raw bytes wherever they match a field,
+        rows are then only counted from the indexed row closest to each match; other patterns are tried row by row.
+        The header is not searched."""
+        matches = []
+        if self.row_count == 0:
+            return matches
+        regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        if not pattern.isascii() or _RAW_UNSAFE.search(pattern):
+            return self._grep_rows(regex, limit)
+        raw = re.compile(pattern.encode("utf-8"), re.IGNORECASE if ignore_case else 0)
+        entries = self.index["entries"]
+        offsets = [entry[1] for entry in entries]
+        size = self.index["bytes"]
+        row, offset = entries[0]
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            while offset < size and (limit is None or len(matches) < limit):
+                match = raw.search(mm, offset)
+                if match is None:
+                    break
+                closest = entries[bisect.bisect_right(offsets, match.start()) - 1]
+                if closest[1] > offset:
+                    row, offset = closest
+                # The matched row is the last one starting at or before the match
+                matched_row, matched_start, next_start = row - 1, offset, size
+                for start in _row_starts(mm, offset, size):
+                    if start > match.start():
+                        next_start = start
+                        break
+                    matched_row, matched_start = matched_row + 1, start
+                text = mm[matched_start:next_start].decode("utf-8", errors="replace")
+                fields = next(csv.reader(io.StringIO(text, newline="")), [])
+                # The raw match can span several fields
+                if any(regex.search(field) for field in fields):
+                    matches.append((matched_row, fields))
+                row, offset = matched_row + 1, next_start
+        return matches
+
+    def _grep_rows(self, regex, limit:Optional[int]) -> list[tuple[int, list[str]]]:
+        matches = []
+        with open(self.path, "rb") as f:
+            f.seek(self.index["entries"][0][1])
+            for row_number, row in enumerate(csv.reader(io.TextIOWrapper(f, encoding="utf-8", errors="replace", newline=""))):
+                if limit is not None and len(matches) >= limit:
+                    break
+                if any(regex.search(field) for field in row):
+                    matches.append((row_number, row))
+        return matches
+
+class StreamedResult:
+    """The reads of CsvResult over a compressed csv output: every read decompresses the file from its start."""
+
+    def __init__(self, path:str, open_text) -> None:
+        self.path = path
+        self.open_text = open_text
+        self.row_count = None
+
+    def header(self) -> list[str]:
+        with self.open_text(self.path) as f:
+            return next(csv.reader(f), [])
+
+    def rows(self, start:int, count:int) -> list[list[str]]:
+        with self.open_text(self.path) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            return list(itertools.islice(reader, start, start + count))
+
+    def tail(self, count:int) -> tuple[int, list[list[str]]]:
+        with self.open_text(self.path) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            last = collections.deque(enumerate(reader), maxlen=count)
+        return (last[0][0] if last else 0), [row for _, row in last]
+
+    def grep(self, pattern:str, ignore_case:bool=False, limit:Optional[int]=None) -> list[tuple[int, list[str]]]:
+        regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        matches = []
+        with self.open_text(self.path) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row_number, row in enumerate(reader):
+                if limit is not None and len(matches) >= limit:
+                    break
+                if any(regex.search(field) for field in row):
+                    matches.append((row_number, row))
+        return matches
+
+def open_result(path:str, writer_class:type):
+    """CsvResult for plain csv outputs, StreamedResult for the other text formats, None for binary formats."""
+    if getattr(writer_class, "indexed", False):
+        return CsvResult(path)
+    text = writer_class.open_text(path)
+    if text is None:
+        return None
+    text.close()
+    return StreamedResult(path, writer_class.open_text)
@@ -0,0 +1,138 @@
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_KIND_LIMITS = {"query": None, "script": 4, "load": 2, "export": 2}
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+class _QueuedTask:
+    def __init__(self, priority:int, seq:int, kind:str, future:Future, fn, args, kwargs) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.kind = kind
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def __lt__(self, other:"_QueuedTask") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class TaskScheduler:
+    """Runs submitted functions on at most max_concurrency threads, by priority then submission order.
+    kind_limits caps how many tasks of a kind run at once (None = only the global cap); a task whose kind is
+    at its cap is skipped so that tasks of other kinds can start. Futures are regular concurrent.futures.Future."""
+
+    def __init__(self, max_concurrency:int=DEFAULT_MAX_CONCURRENCY, kind_limits:Optional[dict]=None) -> None:
+        self._cond = threading.Condition()
+        self._queue = []
+        self._running = {}
+        self._threads = []
+        self._seq = itertools.count()
+        self._shutdown = False
+        self.max_concurrency = DEFAULT_MAX_CONCURRENCY
+        self.kind_limits = dict(DEFAULT_KIND_LIMITS)
+        self.configure(max_concurrency, kind_limits)
+
+    def configure(self, max_concurrency:Optional[int]=None, kind_limits:Optional[dict]=None) -> None:
+        with self._cond:
+            if max_concurrency is not None:
+                self.max_concurrency = max(1, int(max_concurrency))
+            if kind_limits is not None:
+                self.kind_limits = {**DEFAULT_KIND_LIMITS, **kind_limits}
+            self._cond.notify_all()
+
+    def submit(self, fn, *args, kind:str="query", priority:int=PRIORITY_BATCH, **kwargs) -> Future:
+        future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new tasks after shutdown")
+            heapq.heappush(self._queue, _QueuedTask(priority, next(self._seq), kind, future, fn, args, kwargs))
+            while len(self._threads) < self.max_concurrency:
+                thread = threading.Thread(target=self._work, name=f"oracle-task-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._cond.notify_all()
+        return future
+
+    def _pop_runnable(self) -> Optional[_QueuedTask]:
+        # Called with the lock held
+        if sum(self._running.values()) >= self.max_concurrency:
+            return None
+        for task in sorted(self._queue):
+            if task.future.cancelled():
+                self._queue.remove(task)
+                continue
+            limit = self.kind_limits.get(task.kind)
+            if limit is not None and self._running.get(task.kind, 0) >= limit:
+                continue
+            self._queue.remove(task)
+            heapq.heapify(self._queue)
+            return task
+        heapq.heapify(self._queue)
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    task = self._pop_runnable()
+                    if task is not None:
+                        break
+                    if self._shutdown and not self._queue:
+                        return
+                    self._cond.wait()
+                self._running[task.kind] = self._running.get(task.kind, 0) + 1
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    try:
+                        result = task.fn(*task.args, **task.kwargs)
+                    except BaseException as e:
+                        task.future.set_exception(e)
+                    else:
+                        task.future.set_result(result)
+            finally:
+                with self._cond:
+                    self._running[task.kind] -= 1
+                    self._cond.notify_all()
+
+    def queue_position(self, future:Future) -> Optional[int]:
+        """1-based position of a waiting task among the waiting tasks, None if it is not waiting."""
+        with self._cond:
+            waiting = [task for task in sorted(self._queue) if not task.future.cancelled()]
+        for position, task in enumerate(waiting, 1):
+            if task.future is future:
+                return position
+        return None
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "running": sum(self._running.values()),
+                "queued": sum(1 for task in self._queue if not task.future.cancelled()),
+                "max_concurrency": self.max_concurrency,
+                "running_by_kind": {kind: count for kind, count in self._running.items() if count},
+            }
+
+    def shutdown(self, wait:bool=True, cancel_futures:bool=False) -> None:
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                for task in self._queue:
+                    task.future.cancel()
+                self._queue = []
+            self._cond.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=True)
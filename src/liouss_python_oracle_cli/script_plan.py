@@ -0,0 +1,145 @@
+import re
+from typing import Optional
+
+PARALLEL_ANNOTATION = re.compile(r"^\s*--\s*@parallel\b", re.IGNORECASE | re.MULTILINE)
+BARRIER_ANNOTATION = re.compile(r"^\s*--\s*@barrier\b", re.IGNORECASE | re.MULTILINE)
+
+_NAME = r'((?:"[^"]+"|[\w$#]+)(?:\.(?:"[^"]+"|[\w$#]+))?)'
+_HINT = r"(?:/\*.*?\*/\s*)?"
+_WRITE_PATTERNS = [
+    re.compile(rf"^\s*INSERT\s+{_HINT}(?:ALL\s+)?INTO\s+{_NAME}", re.IGNORECASE | re.DOTALL),
+    re.compile(rf"\bINTO\s+{_NAME}", re.IGNORECASE),
+    re.compile(rf"^\s*UPDATE\s+{_HINT}{_NAME}", re.IGNORECASE | re.DOTALL),
+    re.compile(rf"^\s*DELETE\s+{_HINT}(?:FROM\s+)?{_NAME}", re.IGNORECASE | re.DOTALL),
+    re.compile(rf"^\s*MERGE\s+{_HINT}INTO\s+{_NAME}", re.IGNORECASE | re.DOTALL),
+    re.compile(rf"^\s*TRUNCATE\s+TABLE\s+{_NAME}", re.IGNORECASE),
+    re.compile(rf"^\s*(?:CREATE|DROP|ALTER)\s+(?:OR\s+REPLACE\s+)?(?:GLOBAL\s+TEMPORARY\s+|PRIVATE\s+TEMPORARY\s+)?(?:TABLE|VIEW|MATERIALIZED\s+VIEW|SYNONYM|SEQUENCE)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?{_NAME}", re.IGNORECASE),
+    re.compile(rf"^\s*(?:CREATE|ALTER|DROP)\s+(?:UNIQUE\s+|BITMAP\s+)?INDEX\s+{_NAME}(?:\s+ON\s+{_NAME})?", re.IGNORECASE),
+    re.compile(r"\bDBMS_MVIEW\.REFRESH\s*\(\s*'([^']+)'", re.IGNORECASE),
+    re.compile(r"\bDBMS_STATS\.GATHER_TABLE_STATS\s*\(\s*'[^']*'\s*,\s*'([^']+)'", re.IGNORECASE),
+]
+_READ_PATTERNS = [
+    re.compile(r"\bFROM\s+(.+?)(?=\bWHERE\b|\bGROUP\b|\bORDER\b|\bCONNECT\b|\bSTART\b|\bHAVING\b|\bUNION\b|\bMINUS\b|\bINTERSECT\b|\bFETCH\b|\bFOR\b|\bON\b|\bJOIN\b|\bLEFT\b|\bRIGHT\b|\bINNER\b|\bFULL\b|\bCROSS\b|\bNATURAL\b|\bPARTITION\b|\bLOG\b|\bRETURNING\b|\)|;|$)", re.IGNORECASE | re.DOTALL),
+    re.compile(rf"\bJOIN\s+{_NAME}", re.IGNORECASE),
+    re.compile(rf"\bUSING\s+{_NAME}", re.IGNORECASE),
+]
+_KNOWN_START = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|MERGE|CREATE|DROP|ALTER|TRUNCATE|COMMIT|ROLLBACK|BEGIN|DECLARE|CALL|EXEC|EXECUTE|ANALYZE|GRANT|REVOKE|COMMENT)\b", re.IGNORECASE)
+_COMMENTS = re.compile(r"--[^\n]*|/\*(?!\+).*?\*/", re.DOTALL)
+
+class Statement:
+    """A statement of a script with the tables it reads and writes.
+    barrier statements wait for everything before them and block everything after them."""
+
+    def __init__(self, index:int, sql:str) -> None:
+        self.index = index
+        self.sql = sql
+        self.reads = set()
+        self.writes = set()
+        self.kind = "other"
+        self.barrier = False
+        self.parallel = False
+        analyze(self)
+
+    def conflicts_with(self, other:"Statement") -> bool:
+        return bool(self.writes & (other.reads | other.writes) or other.writes & self.reads)
+
+    def __repr__(self) -> str:
+        return f"Statement({self.index}, {self.kind}, reads={sorted(self.reads)}, writes={sorted(self.writes)}, barrier={self.barrier})"
+
+def _table(name:str) -> str:
+    # Schemas are dropped so that SCOTT.EMP and EMP are treated as the same table: more dependencies, never less
+    return name.split(".")[-1].strip('"').upper()
+
+def analyze(statement:Statement) -> None:
+    sql = statement.sql
+    statement.parallel = bool(PARALLEL_ANNOTATION.search(sql))
+    forced_barrier = bool(BARRIER_ANNOTATION.search(sql))
+    code = _COMMENTS.sub(" ", sql).strip()
+    start = _KNOWN_START.match(code)
+    keyword = start.group(1).upper() if start else ""
+
+    if keyword in ("COMMIT", "ROLLBACK"):
+        statement.kind = "transaction"
+        statement.barrier = True
+        return
+    if statement.parallel:
+        statement.kind = "parallel"
+        return
+
+    for pattern in _WRITE_PATTERNS:
+        for match in pattern.finditer(code):
+            for name in match.groups():
+                if name:
+                    statement.writes.update(_table(n) for n in name.split(","))
+    for pattern in _READ_PATTERNS[1:]:
+        statement.reads.update(_table(m.group(1)) for m in pattern.finditer(code))
+    for match in _READ_PATTERNS[0].finditer(code):
+        for item in match.group(1).split(","):
+            item = item.strip()
+            if item and not item.startswith("("):
+                statement.reads.add(_table(item.split()[0]))
+    statement.reads.discard("DUAL")
+
+    if keyword in ("SELECT", "WITH"):
+        statement.kind = "query"
+    elif keyword in ("INSERT", "UPDATE", "DELETE", "MERGE"):
+        statement.kind = "dml"
+    elif keyword in ("CREATE", "DROP", "ALTER", "TRUNCATE"):
+        statement.kind = "ddl"
+    elif keyword in ("BEGIN", "DECLARE", "CALL", "EXEC", "EXECUTE") and statement.writes:
+        # Only the procedures recognised above (stats, mview refresh) have known side effects
+        statement.kind = "plsql"
+        statement.barrier = not re.fullmatch(r"(?:BEGIN\s+|CALL\s+)?(?:(?:DBMS_STATS\.GATHER_TABLE_STATS|DBMS_MVIEW\.REFRESH)\s*\([^;]*\)\s*;?\s*)+(?:END\s*;?)?", code, re.IGNORECASE | re.DOTALL) is not None
+    else:
+        statement.kind = "other"
+        statement.barrier = True
+    if not (statement.reads or statement.writes) and statement.kind not in ("query",):
+        statement.barrier = True
+    statement.barrier = statement.barrier or forced_barrier
+
+class Phase:
+    """Statements between two barriers. groups are chains of statements that depend on each other and must run
+    in script order on the same session; different groups are independent."""
+
+    def __init__(self, barrier:Optional[Statement]=None) -> None:
+        self.barrier = barrier
+        self.groups = []
+
+def plan_script(queries:list[str]) -> list[Phase]:
+    statements = [Statement(i, query) for i, query in enumerate(queries)]
+    phases = []
+    current = []
+
+    def close_phase():
+        if current:
+            phase = Phase()
+            phase.groups = _group(current)
+            phases.append(phase)
+            current.clear()
+
+    for statement in statements:
+        if statement.barrier:
+            close_phase()
+            phases.append(Phase(barrier=statement))
+        else:
+            current.append(statement)
+    close_phase()
+    return phases
+
+def _group(statements:list[Statement]) -> list[list[Statement]]:
+    parent = list(range(len(statements)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for j, later in enumerate(statements):
+        for i in range(j):
+            if statements[i].conflicts_with(later):
+                parent[find(j)] = find(i)
+    groups = {}
+    for i, statement in enumerate(statements):
+        groups.setdefault(find(i), []).append(statement)
+    return list(groups.values())
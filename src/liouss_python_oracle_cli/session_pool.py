@@ -0,0 +1,229 @@
+from __future__ import annotations
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from liouss_python_sql_connectors.sql_connection import SQLConnection
+
+DEFAULT_POOL_MIN_SIZE = 0
+DEFAULT_POOL_MAX_SIZE = 8
+DEFAULT_POOL_IDLE_TIMEOUT = 300
+
+class SessionPoolError(Exception):
+    pass
+
+class SessionPoolTimeout(SessionPoolError):
+    pass
+
+class SessionPool:
+    """Keeps logged-in sessions around so that tasks do not pay a full login for each query.
+    Sessions are checked for liveness on checkout, rolled back on release and closed once idle for longer than idle_timeout seconds.
+    on_open is called with every new session, its errors are ignored."""
+
+    def __init__(self, factory:Callable[[], Optional[SQLConnection]], min_size:int=DEFAULT_POOL_MIN_SIZE, max_size:int=DEFAULT_POOL_MAX_SIZE, idle_timeout:float=DEFAULT_POOL_IDLE_TIMEOUT, health_check:bool=True, on_open:Optional[Callable[[SQLConnection], object]]=None) -> None:
+        self.factory = factory
+        self.on_open = on_open
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        for _ in range(self.min_size):
+            with self._cond:
+                self._size += 1
+            connection = self._open()
+            if connection is not None:
+                self._idle.append((connection, time.monotonic()))
+
+    def _open(self) -> Optional[SQLConnection]:
+        # The caller has already reserved a slot in self._size
+        try:
+            connection = self.factory()
+            if connection is not None:
+                connection.__enter__()
+        except BaseException:
+            connection = None
+            raise
+        finally:
+            if connection is None:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify_all()
+        if self.on_open is not None:
+            try:
+                self.on_open(connection)
+            except Exception:
+                pass
+        return connection
+
+    def _close(self, connection:SQLConnection) -> None:
+        try:
+            connection.__exit__(None, None, None)
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify_all()
+
+    def _is_alive(self, connection:SQLConnection) -> bool:
+        try:
+            db = connection.get_db()
+            if hasattr(db, "ping"):
+                db.ping()
+            else:
+                cursor = db.cursor()
+                cursor.execute("SELECT 1 FROM DUAL")
+                cursor.fetchall()
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self) -> list:
+        # Called with the lock held, returns the sessions that must be closed outside of it
+        now = time.monotonic()
+        keep, expired = [], []
+        for connection, since in self._idle:
+            if now - since > self.idle_timeout and self._size - len(expired) > self.min_size:
+                expired.append(connection)
+            else:
+                keep.append((connection, since))
+        self._idle = keep
+        return expired
+
+    def acquire(self, timeout:Optional[float]=None) -> Optional[SQLConnection]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise SessionPoolError("session pool is closed")
+                expired = self._evict_idle()
+                connection = None
+                can_open = False
+                if self._idle:
+                    connection, _ = self._idle.pop()
+                elif self._size - len(expired) < self.max_size:
+                    self._size += 1
+                    can_open = True
+                else:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise SessionPoolTimeout(f"no session available after {timeout}s (max_size={self.max_size})")
+                    self._cond.wait(remaining)
+            for expired_connection in expired:
+                self._close(expired_connection)
+            if can_open:
+                return self._open()
+            if connection is None:
+                continue
+            if self.health_check and not self._is_alive(connection):
+                self._close(connection)
+                continue
+            return connection
+
+    def acquire_many(self, count:int, timeout:Optional[float]=None) -> list:
+        """Checks out count sessions at once, or none: waits until that many are idle or can be opened. Tasks taking
+        several sessions one at a time could each hold part of the pool while waiting for the rest."""
+        if count > self.max_size:
+            raise SessionPoolError(f"{count} sessions asked, max_size={self.max_size}")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise SessionPoolError("session pool is closed")
+                expired = self._evict_idle()
+                if len(self._idle) + self.max_size - (self._size - len(expired)) >= count:
+                    taken = [self._idle.pop()[0] for _ in range(min(count, len(self._idle)))]
+                    to_open = count - len(taken)
+                    self._size += to_open
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise SessionPoolTimeout(f"{count} sessions not available after {timeout}s (max_size={self.max_size})")
+                if not expired:
+                    self._cond.wait(remaining)
+            for expired_connection in expired:
+                self._close(expired_connection)
+        for expired_connection in expired:
+            self._close(expired_connection)
+        sessions = []
+        try:
+            for connection in taken:
+                if self.health_check and not self._is_alive(connection):
+                    # The slot of the dead session is kept for a new one
+                    try:
+                        connection.__exit__(None, None, None)
+                    except Exception:
+                        pass
+                    to_open += 1
+                    continue
+                sessions.append(connection)
+            while to_open:
+                # _open gives the slot back if it fails
+                to_open -= 1
+                connection = self._open()
+                if connection is None:
+                    raise SessionPoolError("could not open a session")
+                sessions.append(connection)
+        except BaseException:
+            with self._cond:
+                self._size -= to_open
+                self._cond.notify_all()
+            for connection in sessions:
+                self.release(connection)
+            raise
+        return sessions
+
+    def release(self, connection:Optional[SQLConnection], discard:bool=False) -> None:
+        if connection is None:
+            return
+        if not discard:
+            try:
+                connection.get_db().rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            if not discard and not self._closed:
+                self._idle.append((connection, time.monotonic()))
+                self._cond.notify_all()
+                return
+        self._close(connection)
+
+    def release_many(self, connections:list, failed:bool=False) -> None:
+        # After a failure, the sessions that do not answer anymore are closed instead of kept
+        for connection in connections:
+            self.release(connection, discard=failed and connection is not None and not self._is_alive(connection))
+
+    @contextmanager
+    def session(self, timeout:Optional[float]=None):
+        connection = self.acquire(timeout)
+        discard = False
+        try:
+            yield connection
+        except BaseException:
+            discard = connection is not None and not self._is_alive(connection)
+            raise
+        finally:
+            self.release(connection, discard=discard)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "busy": self._size - len(self._idle), "max_size": self.max_size}
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._close(connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
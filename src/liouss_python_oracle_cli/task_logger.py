@@ -0,0 +1,107 @@
+import atexit
+import queue
+import threading
+import time
+from typing import Optional
+from liouss_python_toolkit.printer import beautiful_print
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LOG_LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+DEFAULT_PROGRESS_INTERVAL = 1.0
+FLUSH_TIMEOUT = 30
+
+class LogWriter:
+    """Background thread writing the task log files. Tasks only append their messages to an in-memory queue,
+    the file writes never run in a fetch or insert loop."""
+
+    def __init__(self) -> None:
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="task-log-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, path:str, message:str, color:Optional[str]=None) -> None:
+        self._ensure_started()
+        self._queue.put((path, message, color))
+
+    def flush(self, timeout:Optional[float]=FLUSH_TIMEOUT) -> None:
+        """Waits until every message submitted before the call is written."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            path, message, color = item
+            try:
+                beautiful_print(message, color=color, log=path, log_only=True)
+            except Exception:
+                # A log that cannot be written (task folder removed, disk full) must not stop the others
+                pass
+
+WRITER = LogWriter()
+atexit.register(WRITER.flush, 5)
+
+class TaskLogger:
+    """Log of one task. Messages below level are dropped, progress messages are written at most every
+    progress_interval seconds per file: the last skipped one is written before the next message or on flush."""
+
+    def __init__(self, level:int=INFO, progress_interval:float=DEFAULT_PROGRESS_INTERVAL, writer:LogWriter=WRITER) -> None:
+        self.level = level
+        self.progress_interval = progress_interval
+        self.writer = writer
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_progress = {}
+
+    def write(self, message:str, color:Optional[str]=None, log:Optional[str]=None, log_only:bool=False, level:int=INFO) -> None:
+        if not log_only:
+            beautiful_print(message, color=color)
+        if log is None or level < self.level:
+            return
+        self._release_progress(log)
+        self.writer.submit(log, message, color)
+        if level >= ERROR:
+            # Errors are on disk before the task goes on, in case the process does not survive them
+            self.writer.flush()
+
+    def progress(self, message:str, log:str) -> None:
+        if INFO < self.level:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_progress.get(log, float("-inf")) < self.progress_interval:
+                self._pending[log] = message
+                return
+            self._last_progress[log] = now
+            self._pending.pop(log, None)
+        self.writer.submit(log, message)
+
+    def _release_progress(self, log:Optional[str]=None) -> None:
+        with self._lock:
+            if log is None:
+                pending, self._pending = self._pending, {}
+            else:
+                pending = {log: self._pending.pop(log)} if log in self._pending else {}
+        for path, message in pending.items():
+            self.writer.submit(path, message)
+
+    def flush(self) -> None:
+        self._release_progress()
+        self.writer.flush()
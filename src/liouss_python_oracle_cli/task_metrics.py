@@ -0,0 +1,136 @@
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from liouss_python_sql_connectors.sql_connection import SQLConnection
+
+METRICS_FILE = "metrics.json"
+METRICS_WRITE_INTERVAL = 1.0
+SESSION_STATS = (
+    "bytes sent via SQL*Net to client",
+    "bytes received via SQL*Net from client",
+    "SQL*Net roundtrips to/from client",
+    "session logical reads",
+    "physical reads",
+    "redo size",
+)
+SESSION_TIME_MODEL = ("DB time", "DB CPU", "sql execute elapsed time")
+
+class SubTaskMetrics:
+    """Timings of one sub-task. Durations are accumulated in seconds under keys ending with _seconds."""
+
+    def __init__(self) -> None:
+        self.values = {}
+        self._start = time.perf_counter()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def add(self, key:str, seconds:float) -> None:
+        self.values[key] = self.values.get(key, 0.0) + seconds
+
+    def set(self, key:str, value) -> None:
+        self.values[key] = value
+
+    @contextmanager
+    def timer(self, key:str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(key, time.perf_counter() - start)
+
+    def timed(self, key:str, func, *args, **kwargs):
+        with self.timer(key):
+            return func(*args, **kwargs)
+
+    def finish(self, rows:int) -> dict:
+        elapsed = self.elapsed()
+        self.values["rows"] = rows
+        self.values["elapsed_seconds"] = elapsed
+        self.values["rows_per_second"] = rows / elapsed if elapsed > 0 else None
+        return {key: round(value, 6) if isinstance(value, float) else value for key, value in self.values.items()}
+
+class MetricsFile:
+    """metrics.json of a task: task level values and one entry per sub-task. Rewritten at most every
+    write_interval seconds so that running tasks can be inspected, flush() writes the final state. Safe to update from several threads."""
+
+    def __init__(self, folder:str, task_id:str, description:Optional[str]=None, write_interval:float=METRICS_WRITE_INTERVAL) -> None:
+        self.path = os.path.join(folder, METRICS_FILE)
+        self.data = {"task_id": task_id, "description": description, "sub_tasks": {}}
+        self.write_interval = write_interval
+        self._lock = threading.Lock()
+        self._written = None
+        self._dirty = False
+
+    def set(self, key:str, value) -> None:
+        with self._lock:
+            self.data[key] = round(value, 6) if isinstance(value, float) else value
+            self._maybe_write()
+
+    def record(self, sub_task_id, values:dict) -> None:
+        with self._lock:
+            self.data["sub_tasks"][str(sub_task_id)] = values
+            self._maybe_write()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._dirty:
+                self._write()
+
+    def _maybe_write(self) -> None:
+        # A script of thousands of statements would otherwise rewrite the whole file after each of them
+        self._dirty = True
+        if self._written is None or time.monotonic() - self._written >= self.write_interval:
+            self._write()
+
+    def _write(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f, indent=2, default=str)
+        os.replace(tmp, self.path)
+        self._written = time.monotonic()
+        self._dirty = False
+
+def read_session_stats(connection:SQLConnection, sid) -> Optional[dict]:
+    """Snapshot of the V$SESSTAT and V$SESS_TIME_MODEL counters of the session, None without the privileges to read them."""
+    binds = ", ".join(f":{i}" for i in range(2, len(SESSION_STATS) + 2))
+    time_binds = ", ".join(f":{i}" for i in range(2, len(SESSION_TIME_MODEL) + 2))
+    cursor = connection.get_db().cursor()
+    try:
+        cursor.execute(f"""
+            SELECT n.name, s.value
+            FROM v$sesstat s JOIN v$statname n ON n.statistic# = s.statistic#
+            WHERE s.sid = :1 AND n.name IN ({binds})
+        """, [int(sid), *SESSION_STATS])
+        stats = {name: value for name, value in cursor.fetchall()}
+        cursor.execute(f"""
+            SELECT stat_name, value
+            FROM v$sess_time_model
+            WHERE sid = :1 AND stat_name IN ({time_binds})
+        """, [int(sid), *SESSION_TIME_MODEL])
+        # The time model is in microseconds
+        stats.update({f"{name} (s)": value / 1e6 for name, value in cursor.fetchall()})
+        return stats
+    except Exception:
+        return None
+    finally:
+        cursor.close()
+
+def session_stats_delta(before:Optional[dict], after:Optional[dict]) -> Optional[dict]:
+    if before is None or after is None:
+        return None
+    return {name: after[name] - before.get(name, 0) for name in after}
+
+def load_metrics(folder:str) -> Optional[dict]:
+    path = os.path.join(folder, METRICS_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
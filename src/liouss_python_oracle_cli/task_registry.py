@@ -0,0 +1,115 @@
+import datetime
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+INDEX_FILE = "tasks.sqlite3"
+DEFAULT_TASK_HISTORY = 500
+INDEX_COLUMNS = ("task_id", "description", "status", "error", "sid", "serial", "started", "ended", "seconds", "folder")
+
+class TaskIndex:
+    """SQLite index of the finished tasks of a workspace, so that they can be found after a restart without scanning
+    the query folders. Shared by the CLI processes using the workspace."""
+
+    def __init__(self, path:str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Called with the lock held
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS tasks ({', '.join(INDEX_COLUMNS)}, PRIMARY KEY (task_id))")
+            self._db.execute("CREATE INDEX IF NOT EXISTS tasks_ended ON tasks (ended)")
+        return self._db
+
+    def record(self, values:dict) -> None:
+        with self._lock:
+            self._connect().execute(
+                f"INSERT OR REPLACE INTO tasks ({', '.join(INDEX_COLUMNS)}) VALUES ({', '.join('?' * len(INDEX_COLUMNS))})",
+                [values.get(column) for column in INDEX_COLUMNS],
+            )
+
+    def get(self, task_id:str) -> Optional[dict]:
+        with self._lock:
+            row = self._connect().execute(f"SELECT {', '.join(INDEX_COLUMNS)} FROM tasks WHERE task_id = ?", [task_id]).fetchone()
+        return dict(zip(INDEX_COLUMNS, row)) if row is not None else None
+
+    def recent(self, limit:int) -> list[dict]:
+        with self._lock:
+            rows = self._connect().execute(f"SELECT {', '.join(INDEX_COLUMNS)} FROM tasks ORDER BY ended DESC LIMIT ?", [limit]).fetchall()
+        return [dict(zip(INDEX_COLUMNS, row)) for row in rows]
+
+class TaskRegistry(dict):
+    """Tasks of the session by id. Finished tasks release their sessions and are written to the workspace index;
+    only the last max_finished of them stay in memory."""
+
+    def __init__(self, max_finished:int=DEFAULT_TASK_HISTORY) -> None:
+        super().__init__()
+        self.max_finished = max_finished
+        self.index = None
+
+    def set_index(self, workspace_path:str) -> None:
+        # Tasks keep the index they were started with, so that a workspace switch does not move their history
+        self.index = TaskIndex(os.path.join(workspace_path, INDEX_FILE))
+
+    def add(self, task_id:str, task:dict) -> dict:
+        task.setdefault("status", None)
+        task["started"] = datetime.datetime.now()
+        task["index"] = self.index
+        self[task_id] = task
+        # Evicted from the thread starting tasks only, so that readers iterating the registry from it see a stable dict
+        finished = [tid for tid, t in self.items() if t["status"] is not None]
+        for tid in finished[:max(0, len(finished) - self.max_finished)]:
+            del self[tid]
+        return task
+
+    def finish(self, task_id:str, status:str, error:Optional[str]=None) -> None:
+        task = self.get(task_id)
+        if task is None:
+            return
+        if error and not task.get("error"):
+            task["error"] = error
+        task["status"] = status
+        task["ended"] = datetime.datetime.now()
+        # Drops the driver handles and the per run state of the finished task
+        task["connection"] = None
+        task["connections"] = None
+        task.pop("metrics", None)
+        task.pop("logger", None)
+        if task["index"] is None:
+            return
+        try:
+            task["index"].record({
+                "task_id": task_id,
+                "description": task["description"],
+                "status": status,
+                "error": task.get("error"),
+                "sid": str(task["SID"]),
+                "serial": str(task["SERIAL"]),
+                "started": task["started"].isoformat(timespec="milliseconds"),
+                "ended": task["ended"].isoformat(timespec="milliseconds"),
+                "seconds": round((task["ended"] - task["started"]).total_seconds(), 3),
+                "folder": task.get("folder"),
+            })
+        except sqlite3.Error:
+            # The history is best effort, a locked or read-only index must not fail the task
+            pass
+
+    def lookup(self, task_id:str) -> Optional[dict]:
+        """Index entry of a finished task of the workspace, None if it is unknown."""
+        if self.index is None:
+            return None
+        try:
+            return self.index.get(task_id)
+        except sqlite3.Error:
+            return None
+
+    def history(self, limit:int) -> list[dict]:
+        if self.index is None:
+            return []
+        return self.index.recent(limit)
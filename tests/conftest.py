@@ -0,0 +1,44 @@
+import contextlib
+import sqlite3
+import time
+import pytest
+from liouss_python_oracle_cli import bench
+from liouss_python_oracle_cli import oracle_cli
+from liouss_python_oracle_cli.scheduler import TaskScheduler
+from liouss_python_oracle_cli.session_pool import SessionPool
+
+TABLE_ROWS = 25
+
+@pytest.fixture
+def identifiers(tmp_path):
+    """Identifiers of the SQLite stand-in of oracle-bench, with a table T (A, B) of TABLE_ROWS rows."""
+    identifiers = {"path": str(tmp_path / "db.sqlite")}
+    with contextlib.closing(sqlite3.connect(identifiers["path"])) as setup:
+        setup.execute("CREATE TABLE t (a INTEGER, b TEXT)")
+        setup.executemany("INSERT INTO t VALUES (?, ?)", [(i, f"x{i}") for i in range(TABLE_ROWS)])
+        setup.commit()
+    return identifiers
+
+@pytest.fixture
+def cli(tmp_path, identifiers):
+    """Prompt running its tasks on the stand-in, with a workspace in tmp_path."""
+    workspace = str(tmp_path / "workspace")
+    with SessionPool(lambda: oracle_cli.generateConnection(bench.STAND_IN_TYPE, identifiers), max_size=4) as session_pool, \
+            TaskScheduler(4) as pool, \
+            oracle_cli.generateConnection(bench.STAND_IN_TYPE, identifiers) as connection:
+        cli = oracle_cli.OracleCmd(identifiers, connection, bench.STAND_IN_TYPE, pool, session_pool)
+        cli.workspace_path = workspace
+        cli.workspace_config = {"path": workspace}
+        cli.query_save_path = str(tmp_path / "workspace" / "fav")
+        yield cli
+        cli.do_exit("")
+
+def wait_task(cli, task_id=None, timeout=30) -> str:
+    """Waits for a task, the last started one by default, to be finished and returns its id."""
+    task_id = task_id or list(cli.tasks.keys())[-1]
+    deadline = time.monotonic() + timeout
+    # The status is set by a callback of the future, after result() returns
+    while cli.tasks[task_id]["status"] is None:
+        assert time.monotonic() < deadline, f"task {task_id} still running"
+        time.sleep(0.01)
+    return task_id
@@ -0,0 +1,77 @@
+import contextlib
+import csv
+import sqlite3
+import pytest
+from liouss_python_oracle_cli import bench
+from liouss_python_oracle_cli import bind_sets
+from conftest import wait_task
+
+def test_bind_names_skip_literals_and_comments():
+    assert bind_sets.bind_names("SELECT ':x' FROM t WHERE a = :a -- :c\n AND b = :B AND c = :a") == ["a", "B"]
+
+def test_positional_binds_are_kept_per_occurrence():
+    sql = "SELECT :1, :2 FROM t WHERE a = :1"
+    assert bind_sets.bind_names(sql) == ["1", "2", "1"]
+    assert bind_sets.label_positions(sql) == [0, 1]
+    assert bind_sets.label_positions("SELECT :a FROM t") is None
+
+def test_csv_sets_match_named_binds_by_name(tmp_path):
+    path = tmp_path / "params.csv"
+    path.write_text("B,A,UNUSED\nx,1,z\n,2,z\n")
+    labels, sets = bind_sets.open_bind_sets(str(path), "SELECT * FROM t WHERE a = :a AND b = :b")
+    assert labels == ["a", "b"]
+    assert list(sets) == [{"a": "1", "b": "x"}, {"a": "2", "b": None}]
+
+def test_repeated_positional_bind_takes_the_same_field(tmp_path):
+    path = tmp_path / "params.csv"
+    path.write_text("FIRST,SECOND\n1,x\n")
+    labels, sets = bind_sets.open_bind_sets(str(path), "SELECT :1, :2 FROM t WHERE a = :1")
+    assert labels == ["FIRST", "SECOND"]
+    values = next(sets)
+    assert values == ["1", "x", "1"]
+    assert bind_sets.label_values(values, labels, bind_sets.label_positions("SELECT :1, :2 FROM t WHERE a = :1")) == ["1", "x"]
+
+def test_jsonl_sets_accept_objects_lists_and_values(tmp_path):
+    path = tmp_path / "params.jsonl"
+    path.write_text('{"A": 1}\n\n[2]\n3\n')
+    labels, sets = bind_sets.open_bind_sets(str(path), "SELECT * FROM t WHERE a = :1")
+    assert labels == ["A"] and list(sets) == [[1], [2], [3]]
+
+def test_missing_named_value_is_an_error(tmp_path):
+    path = tmp_path / "params.csv"
+    path.write_text("A\n1\n")
+    _, sets = bind_sets.open_bind_sets(str(path), "SELECT * FROM t WHERE a = :a AND b = :b")
+    with pytest.raises(ValueError):
+        next(sets)
+
+def test_batches_split_the_sets():
+    assert list(bind_sets.batches(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+
+def test_query_results_of_every_set_go_to_one_output(cli, tmp_path):
+    params = tmp_path / "params.csv"
+    params.write_text("FIRST,SECOND\n1,x5\n2,x2\n")
+    task_id = cli.start_task("binds", cli.run_bind_sets, True, cli.oracle_identifiers, "SELECT a, b FROM t WHERE a = :1 OR b = :2 ORDER BY a", str(params), 1, 10, False)
+    wait_task(cli, task_id)
+    with open(cli.find_result_file(task_id), newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["BIND_FIRST", "BIND_SECOND", "a", "b"]
+    assert rows[1:] == [["1", "x5", "1", "x1"], ["1", "x5", "5", "x5"], ["2", "x2", "2", "x2"]]
+
+def test_dml_runs_once_per_set_in_batches(cli, identifiers, tmp_path):
+    params = tmp_path / "params.csv"
+    params.write_text("A\n" + "".join(f"{i}\n" for i in range(10)))
+    # One session: SQLite takes a single writer at a time
+    task_id = cli.start_task("binds", cli.run_bind_sets, True, cli.oracle_identifiers, "UPDATE t SET b = 'u' || :1 WHERE a = :1", str(params), 1, 3, True)
+    wait_task(cli, task_id)
+    assert cli.tasks[task_id]["status"] == "done"
+    with contextlib.closing(sqlite3.connect(identifiers["path"])) as db:
+        assert db.execute("SELECT COUNT(*) FROM t WHERE b LIKE 'u%'").fetchone() == (10,)
+
+def test_failed_dml_stops_every_lane_and_releases_the_sessions(cli, identifiers, tmp_path):
+    params = tmp_path / "params.csv"
+    params.write_text("A\n" + "".join(f"{i}\n" for i in range(100)))
+    # Batches of 5 on 2 lanes: the round trip latency lets the queue of pending batches fill up before both lanes fail
+    cli.session_pool.factory = lambda: bench.StandInConnection(identifiers["path"], latency=0.2)
+    task_id = cli.start_task("binds", cli.run_bind_sets, False, cli.oracle_identifiers, "INSERT INTO missing VALUES (:1)", str(params), 2, 5, True)
+    assert cli.tasks[wait_task(cli, task_id)]["status"] == "failed"
+    assert cli.session_pool.stats()["busy"] == 0
@@ -0,0 +1,103 @@
+import os
+import re
+from liouss_python_oracle_cli import blob_store
+from conftest import wait_task
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+def test_identical_files_share_one_blob(tmp_path):
+    store = blob_store.BlobStore(str(tmp_path / "blobs"))
+    first = write(str(tmp_path / "a" / "0.output.csv"), "A\n1\n")
+    second = write(str(tmp_path / "b" / "0.output.csv"), "A\n1\n")
+    digest = store.put(first)
+    assert store.put(second) == digest == blob_store.file_digest(first)
+    assert os.path.samefile(first, second) and os.path.samefile(first, store.path(digest))
+
+def test_put_tree_hashes_each_new_file_once(tmp_path):
+    store = blob_store.BlobStore(str(tmp_path / "blobs"))
+    write(str(tmp_path / "q" / "a" / "0.output.csv"), "A\n1\n")
+    write(str(tmp_path / "q" / "b" / "0.output.csv"), "A\n1\n")
+    write(str(tmp_path / "q" / "b" / "0.log.txt"), "log")
+    selected = lambda path: path.endswith(".csv")
+    assert store.put_tree(str(tmp_path / "q"), selected) == (2, 4)
+    assert store.put_tree(str(tmp_path / "q"), selected) == (0, 0)
+    assert len(store.inodes()) == 1
+
+def test_link_tree_links_only_the_selected_files(tmp_path):
+    write(str(tmp_path / "task" / "0.output.csv"), "A\n")
+    write(str(tmp_path / "task" / "query.sql"), "SELECT 1")
+    blob_store.link_tree(str(tmp_path / "task"), str(tmp_path / "saved"), lambda path: path.endswith(".csv"))
+    assert os.path.samefile(tmp_path / "task" / "0.output.csv", tmp_path / "saved" / "0.output.csv")
+    assert not os.path.samefile(tmp_path / "task" / "query.sql", tmp_path / "saved" / "query.sql")
+
+def test_break_link_leaves_the_other_names_unchanged(tmp_path):
+    original = write(str(tmp_path / "a.csv"), "A\n")
+    os.link(original, tmp_path / "b.csv")
+    blob_store.break_link(str(tmp_path / "b.csv"))
+    with open(tmp_path / "b.csv", "a") as f:
+        f.write("1\n")
+    with open(original) as f:
+        assert f.read() == "A\n"
+
+def test_plan_gc_removes_old_folders_and_counts_shared_files_in_parts(tmp_path):
+    queries = str(tmp_path / "queries")
+    store = blob_store.BlobStore(str(tmp_path / "blobs"))
+    old = write(os.path.join(queries, "2024_01_01", "old", "0.output.csv"), "x" * 100)
+    os.link(old, os.path.join(queries, "2024_01_01", "old", "copy.output.csv"))
+    recent = write(os.path.join(queries, "2024_01_02", "recent", "0.output.csv"), "y" * 50)
+    kept = write(os.path.join(queries, "2024_01_01", "kept", "0.output.csv"), "z" * 10)
+    os.utime(old, (0, 1000))
+    os.utime(kept, (0, 1000))
+    os.utime(recent, (0, 5000))
+    removed, freed, left, released = blob_store.plan_gc(queries, store, max_age=2000, now=5000, keep=[os.path.dirname(kept)])
+    assert removed == [os.path.dirname(old)]
+    assert (freed, left) == (100, 60)
+    assert sum(released.values()) == 2
+
+def test_plan_gc_frees_nothing_for_a_file_kept_by_a_saved_query(tmp_path):
+    queries = str(tmp_path / "queries")
+    store = blob_store.BlobStore(str(tmp_path / "blobs"))
+    output = write(os.path.join(queries, "2024_01_01", "task", "0.output.csv"), "x" * 100)
+    os.makedirs(tmp_path / "fav" / "saved")
+    os.link(output, tmp_path / "fav" / "saved" / "0.output.csv")
+    store.put(output)
+    removed, freed, _, released = blob_store.plan_gc(queries, store, max_age=0, now=os.path.getmtime(output) + 1)
+    assert removed == [os.path.dirname(output)] and freed == 0
+    assert store.sweep(dry_run=True, released=released) == (0, 0)
+
+def test_dry_run_counts_the_blobs_the_removed_folders_release(tmp_path):
+    queries = str(tmp_path / "queries")
+    store = blob_store.BlobStore(str(tmp_path / "blobs"))
+    output = write(os.path.join(queries, "2024_01_01", "task", "0.output.csv"), "x" * 100)
+    store.put(output)
+    _, _, _, released = blob_store.plan_gc(queries, store, max_bytes=0)
+    assert store.sweep(dry_run=True) == (0, 0)
+    assert store.sweep(dry_run=True, released=released) == (1, 100)
+    assert len(store.inodes()) == 1
+
+def test_gc_dry_run_announces_what_gc_removes(cli, capsys):
+    cli.workspace_config["blob_store"] = True
+    for _ in range(2):
+        cli.do_q("SELECT a, b FROM t")
+        wait_task(cli)
+    cli.do_saveq("snap")
+    cli.do_q("SELECT a FROM t WHERE a < 3")
+    wait_task(cli)
+    cli.do_gc("")
+    assert "Stored" in capsys.readouterr().out
+    # The two identical outputs and the saved query share one blob
+    assert len(cli.get_blob_store().inodes()) == 2
+    # gc keeps the folder of the last query for saveq
+    cli.last_query = None
+    cli.do_gc("-n --max-bytes 0")
+    planned = re.search(r"(\d+) task folders .* (\d+) unreferenced stored outputs", capsys.readouterr().out)
+    cli.do_gc("--max-bytes 0")
+    done = re.search(r"Removed (\d+) task folders .* Removed (\d+) unreferenced stored outputs", capsys.readouterr().out)
+    assert planned.groups() == done.groups() == ("3", "1")
+    # The saved query keeps its output
+    assert len(cli.get_blob_store().inodes()) == 1
+    assert os.path.exists(cli.find_result_file("snap"))
@@ -0,0 +1,182 @@
+import contextlib
+import csv
+import os
+import signal
+import sqlite3
+import threading
+import time
+from conftest import TABLE_ROWS, wait_task
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+def table_rows(identifiers, query):
+    with contextlib.closing(sqlite3.connect(identifiers["path"])) as db:
+        return db.execute(query).fetchall()
+
+def test_sync_query_writes_its_output(cli):
+    cli.do_q("SELECT a, b FROM t ORDER BY a")
+    task_id = wait_task(cli)
+    assert cli.tasks[task_id]["status"] == "done"
+    rows = read_rows(cli.find_result_file(task_id))
+    assert rows[0] == ["a", "b"] and len(rows) == TABLE_ROWS + 1 and rows[1] == ["0", "x0"]
+
+def test_async_query_runs_on_a_pooled_session(cli):
+    cli.do_q("-a SELECT a FROM t WHERE a < 3")
+    task_id = wait_task(cli)
+    assert cli.tasks[task_id]["status"] == "done"
+    assert read_rows(cli.find_result_file(task_id))[1:] == [["0"], ["1"], ["2"]]
+    assert cli.session_pool.stats()["busy"] == 0
+
+def test_failed_query_marks_the_task_failed(cli):
+    cli.do_q("-a SELECT missing FROM t")
+    task_id = wait_task(cli)
+    assert cli.tasks[task_id]["status"] == "failed"
+
+def test_head_page_and_grep_read_the_output(cli, capsys):
+    cli.do_q("SELECT a, b FROM t ORDER BY a")
+    task_id = wait_task(cli)
+    capsys.readouterr()
+    cli.do_head(f"{task_id} -n 2")
+    out = capsys.readouterr().out
+    assert "1: 0,x0" in out and "2: 1,x1" in out and "rows 1-2 of 25" in out
+    cli.do_page(f"{task_id} 24")
+    assert "24: 23,x23" in capsys.readouterr().out
+    cli.do_grep(f"{task_id} ^x1[0-9]$")
+    out = capsys.readouterr().out
+    assert "11: 10,x10" in out and "10 matching rows" in out
+
+def test_head_of_an_unknown_task_fails_the_command(cli):
+    cli.do_head("sync_missing")
+    assert cli.command_failed
+
+def test_compressed_output_is_readable(cli, capsys):
+    cli.do_q("--format csv.gz SELECT a FROM t")
+    task_id = wait_task(cli)
+    assert cli.find_result_file(task_id).endswith(".csv.gz")
+    capsys.readouterr()
+    cli.do_tail(f"{task_id} -n 1")
+    assert "25: 24" in capsys.readouterr().out
+
+def test_cached_result_is_served_without_running_the_query(cli, identifiers):
+    cli.workspace_config["cache_ttl"] = 60
+    cli.do_q("SELECT a FROM t WHERE a < 5")
+    first = wait_task(cli)
+    with contextlib.closing(sqlite3.connect(identifiers["path"])) as db:
+        db.execute("DELETE FROM t")
+        db.commit()
+    cli.do_q("SELECT a FROM t WHERE a < 5")
+    second = wait_task(cli)
+    assert second != first
+    assert read_rows(cli.find_result_file(second)) == read_rows(cli.find_result_file(first))
+    cli.do_q("--refresh SELECT a FROM t WHERE a < 5")
+    assert read_rows(cli.find_result_file(wait_task(cli))) == [["a"]]
+
+def test_parallel_script_runs_every_statement(cli, identifiers, tmp_path):
+    script = tmp_path / "script.sql"
+    # SQLite has a single writer: the statements writing to u depend on each other and share a session
+    script.write_text(
+        "CREATE TABLE u (a INTEGER);\n"
+        "INSERT INTO u SELECT a FROM t WHERE a < 10;\n"
+        "SELECT COUNT(*) FROM t;\n"
+        "SELECT a FROM t WHERE a < 3;\n"
+        "COMMIT;\n"
+    )
+    cli.do_runscript(f"-p 2 {script}")
+    task_id = wait_task(cli)
+    assert cli.tasks[task_id]["status"] == "done"
+    assert table_rows(identifiers, "SELECT COUNT(*) FROM u") == [(10,)]
+    assert read_rows(cli.find_result_file(f"{task_id}:2")) == [["COUNT(*)"], ["25"]]
+
+def test_concurrent_parallel_scripts_share_the_pool(cli, tmp_path):
+    # 2 x 3 lanes on a pool of 4: taken one by one, each script could hold two sessions and wait for a third forever
+    script = tmp_path / "script.sql"
+    script.write_text("SELECT COUNT(*) FROM t;\nSELECT MAX(a) FROM t;\nSELECT MIN(a) FROM t;\n")
+    cli.do_runscript(f"-p 3 {script}")
+    cli.do_runscript(f"-p 3 {script}")
+    task_ids = list(cli.tasks.keys())[-2:]
+    assert [cli.tasks[wait_task(cli, task_id)]["status"] for task_id in task_ids] == ["done", "done"]
+    for task_id in task_ids:
+        assert read_rows(cli.find_result_file(f"{task_id}:1")) == [["MAX(a)"], ["24"]]
+    assert cli.session_pool.stats()["busy"] == 0
+
+def test_parallel_script_waiting_for_sessions_can_be_stopped(cli, tmp_path):
+    script = tmp_path / "script.sql"
+    script.write_text("SELECT 1 FROM t;\n")
+    held = cli.session_pool.acquire_many(2)
+    try:
+        cli.do_runscript(f"-p 3 {script}")
+        task_id = list(cli.tasks.keys())[-1]
+        time.sleep(0.2)
+        cli.do_stoptsk(task_id)
+        assert cli.tasks[wait_task(cli, task_id)]["status"] == "cancelled"
+    finally:
+        cli.session_pool.release_many(held)
+    assert cli.session_pool.stats()["busy"] == 0
+
+def test_fast_load_writes_rejected_rows(cli, identifiers, tmp_path):
+    with contextlib.closing(sqlite3.connect(identifiers["path"])) as db:
+        db.execute("CREATE TABLE loaded (a INTEGER CHECK (a <> 13), b TEXT)")
+    source = tmp_path / "load.csv"
+    source.write_text("A,B\n" + "".join(f"{i},v{i}\n" for i in range(20)) + "abc,x\n")
+    cli.do_insertmany(f"-f {source} LOADED")
+    task_id = wait_task(cli)
+    assert cli.tasks[task_id]["status"] == "done"
+    assert table_rows(identifiers, "SELECT COUNT(*) FROM loaded") == [(19,)]
+    rejected = read_rows(os.path.join(cli.find_task_folder(task_id), "0.rejected.csv"))
+    assert sorted(row[:2] for row in rejected[1:]) == [["13", "v13"], ["abc", "x"]]
+
+def test_concurrent_parallel_loads_share_the_pool(cli, identifiers, tmp_path):
+    # 2 x 3 sessions on a pool of 4: each load takes its sessions all at once instead of holding part of the pool
+    with contextlib.closing(sqlite3.connect(identifiers["path"])) as db:
+        db.execute("CREATE TABLE loaded (a INTEGER, b TEXT)")
+    sources = []
+    for i in range(2):
+        sources.append(tmp_path / f"load{i}.csv")
+        sources[-1].write_text("A,B\n" + "".join(f"{j},v{j}\n" for j in range(30)))
+    for source in sources:
+        cli.do_insertmany(f"-p 3 {source} LOADED")
+    task_ids = list(cli.tasks.keys())[-2:]
+    assert [cli.tasks[wait_task(cli, task_id)]["status"] for task_id in task_ids] == ["done", "done"]
+    assert table_rows(identifiers, "SELECT COUNT(*) FROM loaded") == [(60,)]
+    assert cli.session_pool.stats()["busy"] == 0
+
+def test_interrupted_sync_task_goes_on_detached_and_releases_its_session(cli):
+    cli.interactive = True
+    release = threading.Event()
+    sessions = []
+
+    def slow(task_id=None, sync=False, default_connection=None):
+        sessions.append(default_connection)
+        assert release.wait(10)
+        default_connection.query_one("SELECT COUNT(*) FROM t")
+
+    def run_detached():
+        # Ctrl-C while the prompt waits for the task
+        threading.Timer(0.2, signal.pthread_kill, args=(threading.main_thread().ident, signal.SIGINT)).start()
+        task_id = cli.start_task("slow", slow, True)
+        assert cli.tasks[task_id]["detached"] and cli.connection is not sessions[-1]
+        release.set()
+        assert cli.tasks[wait_task(cli, task_id)]["status"] == "done"
+        release.clear()
+
+    run_detached()
+    # The session the prompt started with stays open, the ones opened after a detach are closed with their task
+    assert not sessions[0].db.closed
+    run_detached()
+    assert sessions[1] is not sessions[0]
+    # Closed by a callback of the task future that runs after the one setting the status
+    deadline = time.monotonic() + 5
+    while not sessions[1].db.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sessions[1].db.closed
+    cli.do_q("SELECT a FROM t WHERE a < 2")
+    assert cli.tasks[wait_task(cli)]["status"] == "done"
+
+def test_taskstats_shows_the_rows(cli, capsys):
+    cli.do_q("SELECT a FROM t")
+    task_id = wait_task(cli)
+    capsys.readouterr()
+    cli.do_taskstats(task_id)
+    assert "rows=25" in capsys.readouterr().out
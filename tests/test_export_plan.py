@@ -0,0 +1,56 @@
+import csv
+import os
+import pytest
+from liouss_python_oracle_cli import export_plan
+from conftest import TABLE_ROWS, wait_task
+
+def test_table_names_follow_the_dictionary_case():
+    assert export_plan.split_table_name("scott.emp") == ("SCOTT", "EMP")
+    assert export_plan.split_table_name('"Mixed"') == (None, "Mixed")
+
+def test_key_chunks_cover_the_range_and_the_nulls(cli):
+    chunks = export_plan.plan_export(cli.connection, "t", "key:a", 4)
+    assert [chunk["label"] for chunk in chunks] == ["a in [0, 6)", "a in [6, 12)", "a in [12, 18)", "a in [18, 24]", "a is null"]
+    assert chunks[-1]["sql"] == "SELECT * FROM t WHERE (a IS NULL)"
+    assert all(chunk["status"] == "pending" for chunk in chunks)
+
+def test_key_chunks_skip_empty_integer_ranges(cli):
+    chunks = export_plan.plan_key_chunks(cli.connection, "t", "a", 8, where="a < 3")
+    assert [chunk["label"] for chunk in chunks] == ["a in [0, 1)", "a in [1, 2]", "a is null"]
+    assert chunks[0]["sql"] == "SELECT * FROM t WHERE (a < 3) AND (a >= :1 AND a < :2)"
+
+def test_unknown_split_is_refused(cli):
+    with pytest.raises(ValueError):
+        export_plan.plan_export(cli.connection, "t", "key", 4)
+
+def test_manifest_keeps_the_chunk_states(tmp_path):
+    manifest = export_plan.Manifest(str(tmp_path), {"chunks": [export_plan._chunk(0, "a", "SELECT 1"), export_plan._chunk(1, "b", "SELECT 2")]})
+    manifest.update(manifest.chunks[0], status="done", rows=1)
+    loaded = export_plan.Manifest.load(str(tmp_path))
+    assert [chunk["index"] for chunk in loaded.pending()] == [1]
+    assert loaded.chunks[0]["rows"] == 1
+
+def test_merged_export_is_the_default_output(cli, capsys):
+    cli.do_export("-p 2 --by key:a --chunks 3 --merge t")
+    task_id = wait_task(cli)
+    assert cli.tasks[task_id]["status"] == "done"
+    merged = cli.find_result_file(task_id)
+    assert os.path.basename(merged) == "export.output.csv"
+    with open(merged, newline="") as f:
+        rows = list(csv.reader(f))
+    assert len(rows) == TABLE_ROWS + 1 and sorted(int(row[0]) for row in rows[1:]) == list(range(TABLE_ROWS))
+    capsys.readouterr()
+    cli.do_head(f"{task_id} -n 1")
+    assert f"rows 1-1 of {TABLE_ROWS}" in capsys.readouterr().out
+
+def test_retry_runs_the_chunks_that_did_not_succeed(cli):
+    cli.do_export("-p 2 --by key:a --chunks 2 t")
+    first = wait_task(cli)
+    manifest = export_plan.Manifest.load(cli.find_task_folder(first))
+    manifest.update(manifest.chunks[1], status="failed", error="ORA-01555")
+    cli.do_export(f"--retry {first} --merge")
+    retry = wait_task(cli)
+    assert cli.tasks[retry]["status"] == "done"
+    assert export_plan.Manifest.load(cli.find_task_folder(retry)).pending() == []
+    with open(cli.find_result_file(retry), newline="") as f:
+        assert sum(1 for _ in csv.reader(f)) == TABLE_ROWS + 1
@@ -0,0 +1,53 @@
+import csv
+import os
+from liouss_python_oracle_cli import bench
+from conftest import TABLE_ROWS, wait_task
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+def use_profiles(cli, identifiers, **extra):
+    # Profiles equal to the main identifiers go through the session pool, the others open their own session
+    cli.workspace_config["profiles"] = {"emea": identifiers, "apac": {**identifiers, "latency": 0.01}, **extra}
+
+def test_merge_labels_the_rows_of_each_profile(cli, identifiers):
+    use_profiles(cli, identifiers)
+    cli.do_fanout("--merge emea,apac SELECT a FROM t WHERE a < 2 ORDER BY a")
+    task_id = wait_task(cli)
+    assert cli.tasks[task_id]["status"] == "done"
+    folder = cli.find_task_folder(task_id)
+    assert read_rows(os.path.join(folder, "apac.output.csv")) == [["a"], ["0"], ["1"]]
+    assert read_rows(os.path.join(folder, "fanout.output.csv")) == [["PROFILE", "a"], ["emea", "0"], ["emea", "1"], ["apac", "0"], ["apac", "1"]]
+
+def test_failed_profile_is_left_out_of_the_merge(cli, identifiers, tmp_path):
+    use_profiles(cli, identifiers, broken={"path": str(tmp_path / "missing" / "db.sqlite")})
+    cli.do_fanout("--merge all SELECT COUNT(*) FROM t")
+    task_id = wait_task(cli)
+    assert cli.tasks[task_id]["status"] == "failed"
+    folder = cli.find_task_folder(task_id)
+    assert not os.path.exists(os.path.join(folder, "broken.output.csv"))
+    assert read_rows(os.path.join(folder, "fanout.output.csv")) == [["PROFILE", "COUNT(*)"], ["emea", str(TABLE_ROWS)], ["apac", str(TABLE_ROWS)]]
+
+def test_slow_profile_times_out_without_stopping_the_others(cli, identifiers):
+    use_profiles(cli, identifiers, slow={**identifiers, "latency": 0.5})
+    cli.do_fanout("-t 0.2 --merge all SELECT a FROM t")
+    task_id = wait_task(cli)
+    assert cli.tasks[task_id]["status"] == "failed"
+    folder = cli.find_task_folder(task_id)
+    with open(os.path.join(folder, "fanout.log.txt")) as f:
+        assert "slow: failed (timeout after 0.2s)" in f.read()
+    assert not os.path.exists(os.path.join(folder, "slow.output.csv"))
+    assert len(read_rows(os.path.join(folder, "fanout.output.csv"))) == 2 * TABLE_ROWS + 1
+
+def test_profiles_past_the_session_limit_wait_for_a_lane(cli, identifiers, monkeypatch):
+    monkeypatch.setattr(bench.StandInConnection, "instances", [])
+    use_profiles(cli, identifiers, third={**identifiers, "latency": 0.01})
+    cli.do_fanout("-p 1 all SELECT a FROM t")
+    task_id = wait_task(cli)
+    assert cli.tasks[task_id]["status"] == "done"
+    with open(os.path.join(cli.find_task_folder(task_id), "fanout.log.txt")) as f:
+        assert "3 profiles (emea, apac, third), 1 at a time" in f.read()
+    spans = sorted((calls[0][1], calls[-1][2]) for calls in (c.db.calls for c in bench.StandInConnection.instances) if calls)
+    assert len(spans) == 3
+    assert all(earlier[1] <= later[0] for earlier, later in zip(spans, spans[1:]))
@@ -0,0 +1,34 @@
+import json
+import pytest
+from liouss_python_oracle_cli import bench
+from liouss_python_oracle_cli import headless
+from liouss_python_oracle_cli import oracle_cli
+
+@pytest.fixture
+def oracle_run(tmp_path, identifiers, monkeypatch):
+    """Runs oracle run against the stand-in with a workspace in tmp_path, returns the exit code and whether the prompt was exited."""
+    ids_path, config_path = tmp_path / "ids.json", tmp_path / "config.json"
+    ids_path.write_text(json.dumps(identifiers))
+    config_path.write_text(json.dumps({"workspaces": {"test": {"path": str(tmp_path / "workspace")}}}))
+    monkeypatch.setattr(oracle_cli, "ORACLE_ID_PATH", str(ids_path))
+    monkeypatch.setattr(oracle_cli, "CONFIG_PATH", str(config_path))
+    monkeypatch.setattr(oracle_cli, "CONNECTION_TYPE", bench.STAND_IN_TYPE)
+    exits = []
+    do_exit = oracle_cli.OracleCmd.do_exit
+    monkeypatch.setattr(oracle_cli.OracleCmd, "do_exit", lambda cli, arg: exits.append(arg) or do_exit(cli, arg))
+
+    def run(*argv):
+        return headless.run_headless(["-w", "test", *argv]), bool(exits)
+    return run
+
+def test_successful_commands_exit_with_0(oracle_run):
+    assert oracle_run("-c", "q SELECT a FROM t", "-c", "q -a SELECT b FROM t") == (headless.EXIT_OK, True)
+
+def test_failed_command_exits_with_1(oracle_run):
+    assert oracle_run("-c", "head 999") == (headless.EXIT_FAILED, True)
+
+def test_failed_task_exits_with_1(oracle_run):
+    assert oracle_run("-c", "q -a SELECT missing FROM t") == (headless.EXIT_FAILED, True)
+
+def test_unknown_workspace_exits_with_3(oracle_run):
+    assert oracle_run("-w", "missing", "-c", "q SELECT a FROM t")[0] == headless.EXIT_CONFIG
@@ -0,0 +1,88 @@
+import contextlib
+import csv
+import datetime
+import decimal
+import os
+import sqlite3
+from liouss_python_oracle_cli import incremental
+from liouss_python_oracle_cli import output_writers
+from conftest import TABLE_ROWS, wait_task
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+def write_rows(path, rows):
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows(rows)
+    return str(path)
+
+def execute(identifiers, *statements):
+    with contextlib.closing(sqlite3.connect(identifiers["path"])) as db:
+        for statement in statements:
+            db.execute(statement)
+        db.commit()
+
+def test_watermarks_keep_their_type():
+    for value in (datetime.datetime(2024, 5, 1, 12, 30), datetime.date(2024, 5, 1), decimal.Decimal("12.50"), 7, 1.5, "A"):
+        decoded = incremental.decode_value(incremental.encode_value(value))
+        assert decoded == value and type(decoded) is type(value)
+
+def test_delta_query_is_bounded_on_both_sides():
+    assert incremental.delta_query("SELECT * FROM t", "a", None, 9) == ("SELECT q.* FROM (SELECT * FROM t) q WHERE q.a <= :1", [9])
+    assert incremental.delta_query("SELECT * FROM t", "a", 9, 12)[1] == [9, 12]
+
+def test_append_drops_what_an_interrupted_run_appended(tmp_path):
+    output = write_rows(tmp_path / "out.csv", [["A"], ["1"]])
+    committed = len("A\r\n1\r\n")
+    with open(output, "a") as f:
+        f.write("partial\r\n")
+    incremental.append_csv(output, write_rows(tmp_path / "delta.csv", [["A"], ["2"]]), committed)
+    assert read_rows(output) == [["A"], ["1"], ["2"]]
+
+def test_merge_replaces_the_rows_of_the_delta_keys(tmp_path):
+    previous = write_rows(tmp_path / "previous.csv", [["ID", "V"], ["1", "a"], ["2", "b"]])
+    delta = write_rows(tmp_path / "delta.csv", [["ID", "V"], ["2", "B"], ["3", "c"]])
+    incremental.merge_by_key(output_writers.CsvWriter, previous, delta, ["id"], str(tmp_path / "merged.csv"))
+    assert read_rows(tmp_path / "merged.csv") == [["ID", "V"], ["1", "a"], ["2", "B"], ["3", "c"]]
+
+def test_rerun_appends_the_new_rows(cli, identifiers):
+    cli.do_q("SELECT a, b FROM t")
+    wait_task(cli)
+    cli.do_saveq("--incremental a snap")
+    cli.do_rerun("snap")
+    assert cli.tasks[wait_task(cli)]["status"] == "done"
+    assert len(read_rows(cli.find_result_file("snap"))) == TABLE_ROWS + 1
+    execute(identifiers, "INSERT INTO t VALUES (100, 'new')")
+    cli.do_rerun("snap")
+    wait_task(cli)
+    rows = read_rows(cli.find_result_file("snap"))
+    assert len(rows) == TABLE_ROWS + 2 and rows[-1] == ["100", "new"]
+    state = incremental.load_state(os.path.dirname(cli.find_result_file("snap")))
+    assert state["runs"] == 2 and incremental.decode_value(state["value"]) == 100
+
+def test_rerun_with_a_key_replaces_changed_rows(cli, identifiers):
+    execute(identifiers, "ALTER TABLE t ADD COLUMN version INTEGER DEFAULT 0")
+    cli.do_q("SELECT a, b, version FROM t")
+    wait_task(cli)
+    cli.do_saveq("--incremental version --key a snap")
+    cli.do_rerun("snap")
+    wait_task(cli)
+    execute(identifiers, "UPDATE t SET b = 'changed', version = 1 WHERE a = 3")
+    cli.do_rerun("snap")
+    assert cli.tasks[wait_task(cli)]["status"] == "done"
+    rows = read_rows(cli.find_result_file("snap"))
+    assert len(rows) == TABLE_ROWS + 1
+    assert [row for row in rows if row[0] == "3"] == [["3", "changed", "1"]]
+
+def test_gzip_append_adds_a_member_and_drops_an_interrupted_one(tmp_path):
+    output = str(tmp_path / "out.csv.gz")
+    with output_writers.GzipCsvWriter(output, [("A",)]) as writer:
+        writer.write_rows([["1"]])
+    committed = os.path.getsize(output)
+    with output_writers.GzipCsvWriter(str(tmp_path / "delta.csv.gz"), [("A",)]) as writer:
+        writer.write_rows([["2"], ["3"]])
+    with open(output, "ab") as f:
+        f.write(b"partial")
+    incremental.append_csv(output, str(tmp_path / "delta.csv.gz"), committed, compressed=True)
+    assert list(output_writers.GzipCsvWriter.read_rows(output)) == [["A"], ["1"], ["2"], ["3"]]
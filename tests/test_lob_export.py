@@ -0,0 +1,59 @@
+import os
+from liouss_python_oracle_cli import lob_export
+
+class FakeLob:
+    """Locator of a LOB: size() and read(offset, amount) with offsets starting at 1, like python-oracledb."""
+    def __init__(self, data, chunk_size=None):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.reads = []
+
+    def size(self):
+        return len(self.data)
+
+    def read(self, offset=1, amount=None):
+        self.reads.append((offset, amount))
+        return self.data[offset - 1:] if amount is None else self.data[offset - 1:offset - 1 + amount]
+
+    def getchunksize(self):
+        if self.chunk_size is None:
+            raise NotImplementedError
+        return self.chunk_size
+
+DESCRIPTION = [("ID", "DB_TYPE_NUMBER"), ("DOC", "DB_TYPE_CLOB"), ("RAW DATA", "DB_TYPE_BLOB")]
+
+def test_lob_columns_are_found_by_type():
+    assert lob_export.lob_columns(DESCRIPTION + [("F", "DB_TYPE_BFILE")]) == {1: False, 2: True, 3: True}
+
+def test_small_lobs_stay_in_the_cell(tmp_path):
+    spool = lob_export.LobSpool(str(tmp_path), 0, DESCRIPTION, inline_size=8)
+    assert spool.spool([(1, FakeLob("short"), FakeLob(b"\x00\xff"))]) == [[1, "short", "00ff"]]
+    assert spool.files == 0 and not os.path.exists(tmp_path / lob_export.LOB_FOLDER)
+    assert spool.description[1][1] == lob_export.LOB_REFERENCE_TYPE and spool.description[0] == DESCRIPTION[0]
+
+def test_empty_lobs_stay_in_the_cell(tmp_path):
+    spool = lob_export.LobSpool(str(tmp_path), 0, DESCRIPTION)
+    assert spool.spool([(1, FakeLob(""), FakeLob(b"")), (2, None, None)]) == [[1, "", ""], [2, None, None]]
+    assert spool.files == 0
+
+def test_large_lobs_are_read_in_chunks_into_files(tmp_path):
+    text, data = "é" * 10, bytes(range(25))
+    clob, blob = FakeLob(text), FakeLob(data, chunk_size=4)
+    spool = lob_export.LobSpool(str(tmp_path), 3, DESCRIPTION, chunk_bytes=10, inline_size=8)
+    spool.spool([(1, "inline", None)])
+    row = spool.spool([(2, clob, blob)])[0]
+    text_path = os.path.join(lob_export.LOB_FOLDER, "3", "2.DOC.txt")
+    binary_path = os.path.join(lob_export.LOB_FOLDER, "3", "2.RAW_DATA.bin")
+    assert row == [2, lob_export.reference(text_path, 10), lob_export.reference(binary_path, 25)]
+    assert (tmp_path / text_path).read_text(encoding="utf-8") == text
+    assert (tmp_path / binary_path).read_bytes() == data
+    # Reads of the chunk size rounded down to a multiple of the LOB chunk size
+    assert clob.reads == [(1, 10)]
+    assert blob.reads == [(1, 8), (9, 8), (17, 8), (25, 8)]
+    assert spool.files == 2 and spool.bytes == 35
+
+def test_fetched_values_are_written_without_locator(tmp_path):
+    spool = lob_export.LobSpool(str(tmp_path), 0, DESCRIPTION)
+    row = spool.spool([(1, "text", b"\x01\x02")])[0]
+    assert row[1] == lob_export.reference(os.path.join(lob_export.LOB_FOLDER, "0", "1.DOC.txt"), 4)
+    assert (tmp_path / lob_export.LOB_FOLDER / "0" / "1.RAW_DATA.bin").read_bytes() == b"\x01\x02"
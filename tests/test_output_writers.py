@@ -0,0 +1,26 @@
+import decimal
+import pytest
+from liouss_python_oracle_cli import output_writers
+
+def number(name, precision=0, scale=output_writers.UNDEFINED_SCALE):
+    return (name, "DB_TYPE_NUMBER", None, None, precision, scale, True)
+
+@pytest.mark.parametrize("output_format", ["csv", "csv.gz"])
+def test_csv_keeps_line_breaks_inside_values(tmp_path, output_format):
+    writer_class = output_writers.get_output_writer(output_format)
+    path = str(tmp_path / f"out.{writer_class.extension}")
+    with writer_class(path, [("A",), ("B",)]) as writer:
+        writer.write_rows([["multi\r\nline", "x"], ["lf\nonly", "y"]])
+    assert list(writer_class.read_rows(path)) == [["A", "B"], ["multi\r\nline", "x"], ["lf\nonly", "y"]]
+
+def test_unscaled_number_is_a_double_in_parquet(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    parquet = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "out.parquet")
+    description = [number("ANY_NUMBER"), number("AMOUNT", 10, 2), number("ID", 9, 0)]
+    with output_writers.ParquetWriter(path, description) as writer:
+        writer.write_rows([[2.5, 1.25, 7], [2**60 + 1, None, 8], [None, 3.0, None]])
+    table = parquet.read_table(path)
+    assert table.schema.types == [pa.float64(), pa.decimal128(10, 2), pa.int64()]
+    assert table.column("ANY_NUMBER").to_pylist() == [2.5, float(2**60), None]
+    assert table.column("AMOUNT").to_pylist() == [decimal.Decimal("1.25"), None, decimal.Decimal("3.00")]
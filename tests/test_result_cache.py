@@ -0,0 +1,68 @@
+import json
+import os
+from liouss_python_oracle_cli.result_cache import ResultCache, cache_key, is_cacheable, normalize_sql, INDEX_FILE
+
+def write_output(folder, name, content="A\n1\n"):
+    path = os.path.join(folder, name)
+    with open(path, "w") as f:
+        f.write(content)
+    with open(f"{path}.idx", "w") as f:
+        f.write("{}")
+    return path
+
+def read_index(folder):
+    with open(os.path.join(folder, INDEX_FILE)) as f:
+        return json.load(f)
+
+def test_normalized_sql_keeps_literals():
+    assert normalize_sql("SELECT  a -- comment\n FROM /* note */ t WHERE b = 'x  y';") == "SELECT a FROM t WHERE b = 'x  y'"
+    assert cache_key("select a from t", [], "scott@db", ".csv") == cache_key("select a\n  from t;", [], "scott@db", ".csv")
+    assert cache_key("select a from t", [], "scott@db", ".csv") != cache_key("select a from t", [1], "scott@db", ".csv")
+
+def test_only_stable_queries_are_cacheable():
+    assert is_cacheable("WITH x AS (SELECT 1 FROM dual) SELECT * FROM x")
+    assert not is_cacheable("SELECT sysdate FROM dual")
+    assert not is_cacheable("SELECT * FROM t FOR UPDATE")
+    assert not is_cacheable("DELETE FROM t")
+
+def test_stored_output_is_linked_with_its_row_index(tmp_path):
+    output = write_output(tmp_path, "0.output.csv")
+    cache = ResultCache(str(tmp_path / "cache"), ttl=60)
+    cache.store("k", output, rows=1)
+    entry = cache.lookup("k")
+    assert entry["rows"] == 1 and entry["path"].endswith("k.output.csv")
+    assert os.path.samefile(entry["path"], output)
+    assert os.path.samefile(f"{entry['path']}.idx", f"{output}.idx")
+
+def test_hits_are_written_on_flush_only(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), ttl=60)
+    cache.store("k", write_output(tmp_path, "0.output.csv"), rows=1)
+    stored = read_index(cache.folder)["k"]["last_used"]
+    assert cache.lookup("k") is not None
+    assert read_index(cache.folder)["k"]["last_used"] == stored
+    cache.flush()
+    assert read_index(cache.folder)["k"]["last_used"] > stored
+
+def test_expired_entry_is_dropped(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), ttl=60)
+    cache.store("k", write_output(tmp_path, "0.output.csv"), rows=1)
+    cache.ttl = -1
+    assert cache.lookup("k") is None
+    assert read_index(cache.folder) == {}
+    assert not os.path.exists(os.path.join(cache.folder, "k.output.csv.idx"))
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), ttl=60, max_bytes=10)
+    cache.store("old", write_output(tmp_path, "1.output.csv", "A\n1\n"), rows=1)
+    cache.store("used", write_output(tmp_path, "2.output.csv", "A\n2\n"), rows=1)
+    assert cache.lookup("old") is not None
+    cache.store("new", write_output(tmp_path, "3.output.csv", "A\n3\n"), rows=1)
+    assert cache.lookup("used") is None
+    assert cache.lookup("old") is not None and cache.lookup("new") is not None
+    assert cache.stats()["entries"] == 2
+
+def test_clear_removes_every_entry(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), ttl=60)
+    cache.store("k", write_output(tmp_path, "0.output.csv"), rows=1)
+    assert cache.clear() == 1
+    assert os.listdir(cache.folder) == [INDEX_FILE]
@@ -0,0 +1,65 @@
+import collections
+import contextlib
+import csv
+import os
+import sqlite3
+import pytest
+from liouss_python_oracle_cli import result_diff
+from conftest import wait_task
+
+HEADER = ["ID", "V"]
+
+def diff(tmp_path, left, right, **options):
+    destination = str(tmp_path / "diff.output.csv")
+    counts = result_diff.diff_rows(iter([HEADER] + left), iter([HEADER] + right), destination, **options)
+    with open(destination, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == [result_diff.DIFF_COLUMN] + HEADER
+    assert not os.path.exists(f"{destination}.partitions")
+    return counts, rows[1:]
+
+def test_rows_are_compared_as_a_multiset_without_key(tmp_path):
+    counts, rows = diff(tmp_path, [["1", "a"], ["1", "a"], ["2", "b"]], [["1", "a"], ["2", "B"]], partitions=4)
+    assert counts == {"left_rows": 3, "right_rows": 2, "added": 1, "removed": 2, "changed": 0, "unchanged": 1}
+    assert sorted(rows) == [["added", "2", "B"], ["removed", "1", "a"], ["removed", "2", "b"]]
+
+def test_rows_of_a_key_with_other_values_are_changed(tmp_path):
+    counts, rows = diff(tmp_path, [["1", "a"], ["2", "b"]], [["2", "B"], ["3", "c"], ["1", "a"]], key=["id"])
+    assert (counts["changed"], counts["added"], counts["removed"], counts["unchanged"]) == (1, 1, 0, 1)
+    assert ["old", "2", "b"] in rows and ["new", "2", "B"] in rows
+    assert rows.index(["old", "2", "b"]) + 1 == rows.index(["new", "2", "B"])
+
+def test_partitions_over_the_memory_budget_are_split(tmp_path):
+    left = [[str(i), f"value {i}"] for i in range(2000)]
+    right = [[str(i), f"value {i}" if i % 10 else "changed"] for i in range(2000)] + [["x", "y"]]
+    counts, rows = diff(tmp_path, left, right, key=["ID"], memory_bytes=4096)
+    assert (counts["changed"], counts["added"], counts["unchanged"]) == (200, 1, 1800)
+    assert collections.Counter(row[0] for row in rows) == {"old": 200, "new": 200, "added": 1}
+
+def test_skewed_key_is_compared_without_endless_splits(tmp_path):
+    left = [["same", str(i)] for i in range(500)]
+    counts, _ = diff(tmp_path, left, left[1:], key=["ID"], memory_bytes=1024)
+    assert counts["removed"] == 1 and counts["unchanged"] == 499
+
+def test_different_columns_are_refused(tmp_path):
+    with pytest.raises(ValueError):
+        result_diff.diff_rows(iter([["A"]]), iter([["B"]]), str(tmp_path / "diff.output.csv"))
+    with pytest.raises(ValueError):
+        result_diff.diff_rows(iter([HEADER]), iter([HEADER]), str(tmp_path / "diff.output.csv"), key=["missing"])
+
+def test_diff_task_output_is_read_by_head(cli, identifiers, capsys):
+    cli.do_q("SELECT a, b FROM t ORDER BY a")
+    old = wait_task(cli)
+    with contextlib.closing(sqlite3.connect(identifiers["path"])) as db:
+        db.execute("UPDATE t SET b = 'changed' WHERE a = 3")
+        db.commit()
+    cli.do_q("SELECT a, b FROM t ORDER BY a")
+    new = wait_task(cli)
+    cli.do_diff(f"--key a {old} {new}")
+    task_id = wait_task(cli)
+    assert cli.tasks[task_id]["status"] == "done"
+    capsys.readouterr()
+    cli.do_head(task_id)
+    out = capsys.readouterr().out
+    assert not cli.command_failed
+    assert "1: old,3,x3" in out and "2: new,3,changed" in out and "rows 1-2 of 2" in out
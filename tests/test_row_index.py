@@ -0,0 +1,71 @@
+import csv
+import gzip
+import io
+import os
+import re
+import pytest
+from liouss_python_oracle_cli import output_writers
+from liouss_python_oracle_cli import row_index
+
+ROWS = [[str(i), f"value {i}", "multi\nline" if i % 7 == 0 else 'say "hi"' if i % 5 == 0 else "plain"] for i in range(100)]
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / "0.output.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID", "NAME", "NOTE"])
+        writer.writerows(ROWS)
+    return path
+
+def test_index_points_at_row_starts_past_quoted_newlines(csv_path):
+    index = row_index.build_index(csv_path, stride=10)
+    assert index["rows"] == len(ROWS) and index["bytes"] == os.path.getsize(csv_path)
+    with open(csv_path, "r", newline="") as f:
+        content = f.read()
+    for rows, offset in index["entries"]:
+        assert next(csv.reader(io.StringIO(content[offset:], newline="")))[0] == str(rows)
+    assert os.path.exists(csv_path + row_index.INDEX_SUFFIX)
+
+def test_stale_index_is_rebuilt(csv_path):
+    row_index.build_index(csv_path, stride=10)
+    with open(csv_path, "a", newline="") as f:
+        csv.writer(f).writerow(["100", "value 100", "plain"])
+    assert row_index.load_index(csv_path)["rows"] == len(ROWS) + 1
+
+def test_rows_and_tail_read_from_the_index(csv_path):
+    row_index.build_index(csv_path, stride=10)
+    result = row_index.CsvResult(csv_path)
+    assert result.header() == ["ID", "NAME", "NOTE"]
+    assert result.rows(35, 3) == ROWS[35:38]
+    assert result.rows(99, 10) == ROWS[99:]
+    assert result.tail(2) == (98, ROWS[98:])
+
+@pytest.mark.parametrize("pattern, ignore_case", [
+    ("value 4", False),
+    ("VALUE 1[0-2]", True),
+    ("^plain$", False),
+    ('"hi"', False),
+    ("multi.line", False),
+    ("5,value", False),
+])
+def test_grep_matches_each_field_like_a_row_by_row_search(csv_path, pattern, ignore_case):
+    regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+    expected = [(i, row) for i, row in enumerate(ROWS) if any(regex.search(field) for field in row)]
+    row_index.build_index(csv_path, stride=10)
+    assert row_index.CsvResult(csv_path).grep(pattern, ignore_case) == expected
+
+def test_grep_stops_at_the_limit(csv_path):
+    assert [i for i, _ in row_index.CsvResult(csv_path).grep("value", limit=3)] == [0, 1, 2]
+
+def test_compressed_outputs_are_streamed(tmp_path):
+    path = str(tmp_path / "0.output.csv.gz")
+    with gzip.open(path, "wt", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID"])
+        writer.writerows([[str(i)] for i in range(10)])
+    result = row_index.open_result(path, output_writers.writer_for_path(path))
+    assert isinstance(result, row_index.StreamedResult)
+    assert result.rows(2, 2) == [["2"], ["3"]]
+    assert result.tail(1) == (9, [["9"]])
+    assert result.grep("^[78]$") == [(7, ["7"]), (8, ["8"])]
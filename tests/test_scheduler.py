@@ -0,0 +1,73 @@
+import threading
+import pytest
+from liouss_python_oracle_cli.scheduler import TaskScheduler, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+
+@pytest.fixture
+def gate():
+    # Set at teardown so that a failed test does not leave a worker blocked
+    gate = threading.Event()
+    yield gate
+    gate.set()
+
+def block(scheduler, gate, kind="query"):
+    # Occupies a worker until gate is set
+    started = threading.Event()
+    future = scheduler.submit(lambda: started.set() or gate.wait(), kind=kind)
+    assert started.wait(5)
+    return future
+
+def test_results_and_exceptions_go_to_the_future():
+    with TaskScheduler(2) as scheduler:
+        assert scheduler.submit(lambda a, b=0: a + b, 1, b=2).result(5) == 3
+        with pytest.raises(ZeroDivisionError):
+            scheduler.submit(lambda: 1 / 0).result(5)
+
+def test_waiting_tasks_run_by_priority_then_submission_order(gate):
+    order = []
+    scheduler = TaskScheduler(1)
+    block(scheduler, gate)
+    futures = [
+        scheduler.submit(order.append, "batch 1", priority=PRIORITY_BATCH),
+        scheduler.submit(order.append, "batch 2", priority=PRIORITY_BATCH),
+        scheduler.submit(order.append, "interactive", priority=PRIORITY_INTERACTIVE),
+    ]
+    assert scheduler.queue_position(futures[2]) == 1
+    assert scheduler.stats()["queued"] == 3
+    gate.set()
+    for future in futures:
+        future.result(5)
+    scheduler.shutdown()
+    assert order == ["interactive", "batch 1", "batch 2"]
+
+def test_kind_at_its_limit_lets_other_kinds_start(gate):
+    scheduler = TaskScheduler(3, kind_limits={"load": 1})
+    running = block(scheduler, gate, kind="load")
+    waiting = scheduler.submit(lambda: "load", kind="load")
+    assert scheduler.submit(lambda: "query", kind="query").result(5) == "query"
+    assert not waiting.done() and scheduler.queue_position(waiting) == 1
+    assert scheduler.stats()["running_by_kind"] == {"load": 1}
+    gate.set()
+    assert running.result(5) and waiting.result(5) == "load"
+    scheduler.shutdown()
+
+def test_cancelled_task_never_runs(gate):
+    ran = []
+    scheduler = TaskScheduler(1)
+    block(scheduler, gate)
+    future = scheduler.submit(ran.append, 1)
+    assert future.cancel()
+    assert scheduler.stats()["queued"] == 0
+    gate.set()
+    scheduler.shutdown()
+    assert ran == []
+
+def test_shutdown_cancels_waiting_tasks_and_refuses_new_ones(gate):
+    scheduler = TaskScheduler(1)
+    running = block(scheduler, gate)
+    waiting = scheduler.submit(lambda: None)
+    scheduler.shutdown(wait=False, cancel_futures=True)
+    assert waiting.cancelled()
+    with pytest.raises(RuntimeError):
+        scheduler.submit(lambda: None)
+    gate.set()
+    assert running.result(5)
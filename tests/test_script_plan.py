@@ -0,0 +1,42 @@
+from liouss_python_oracle_cli.script_plan import Statement, plan_script
+
+def test_statement_reads_and_writes():
+    statement = Statement(0, "INSERT INTO scott.emp_copy SELECT * FROM emp e JOIN dept d ON d.deptno = e.deptno")
+    assert statement.kind == "dml"
+    assert statement.writes == {"EMP_COPY"}
+    assert {"EMP", "DEPT"} <= statement.reads
+    assert not statement.barrier
+
+def test_dual_is_not_a_table():
+    statement = Statement(0, "SELECT sysdate FROM dual")
+    assert statement.kind == "query" and statement.reads == set() and not statement.barrier
+
+def test_transaction_control_and_unknown_statements_are_barriers():
+    assert Statement(0, "COMMIT").barrier
+    assert Statement(0, "BEGIN my_package.run; END;").barrier
+    assert Statement(0, "-- @barrier\nSELECT 1 FROM t").barrier
+
+def test_gather_stats_is_not_a_barrier():
+    statement = Statement(0, "BEGIN DBMS_STATS.GATHER_TABLE_STATS('SCOTT', 'EMP'); END;")
+    assert statement.kind == "plsql" and statement.writes == {"EMP"} and not statement.barrier
+
+def test_independent_statements_get_their_own_group():
+    phases = plan_script([
+        "INSERT INTO a SELECT * FROM src",
+        "UPDATE b SET x = 1",
+        "DELETE FROM a WHERE x = 2",
+        "SELECT * FROM c",
+    ])
+    assert len(phases) == 1 and phases[0].barrier is None
+    groups = [[statement.index for statement in group] for group in phases[0].groups]
+    assert sorted(groups) == [[0, 2], [1], [3]]
+
+def test_barriers_split_the_script_into_phases():
+    phases = plan_script(["UPDATE a SET x = 1", "UPDATE b SET x = 1", "COMMIT", "SELECT * FROM a"])
+    assert [phase.barrier.index if phase.barrier else None for phase in phases] == [None, 2, None]
+    assert len(phases[0].groups) == 2
+    assert [[s.index for s in group] for group in phases[2].groups] == [[3]]
+
+def test_schema_prefix_does_not_hide_a_dependency():
+    phases = plan_script(["UPDATE scott.emp SET sal = sal * 2", "SELECT * FROM emp"])
+    assert len(phases[0].groups) == 1
@@ -0,0 +1,138 @@
+import threading
+import time
+import pytest
+from liouss_python_oracle_cli.session_pool import SessionPool, SessionPoolError
+
+class FakeDB:
+    def __init__(self):
+        self.alive = True
+        self.rollbacks = 0
+
+    def ping(self):
+        if not self.alive:
+            raise ConnectionError("lost contact")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+class FakeConnection:
+    def __init__(self):
+        self.db = FakeDB()
+        self.opened = False
+        self.closed = False
+
+    def __enter__(self):
+        self.opened = True
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.closed = True
+
+    def get_db(self):
+        return self.db
+
+def test_min_size_sessions_are_opened_upfront():
+    opened = []
+    with SessionPool(lambda: opened.append(FakeConnection()) or opened[-1], min_size=2) as pool:
+        assert len(opened) == 2 and all(c.opened for c in opened)
+        assert pool.stats() == {"size": 2, "idle": 2, "busy": 0, "max_size": 8}
+
+def test_released_session_is_rolled_back_and_reused():
+    with SessionPool(FakeConnection, max_size=2) as pool:
+        first = pool.acquire()
+        pool.release(first)
+        assert first.db.rollbacks == 1
+        assert pool.acquire() is first
+        assert pool.stats()["size"] == 1
+
+def test_dead_session_is_replaced_on_checkout():
+    with SessionPool(FakeConnection, max_size=1) as pool:
+        first = pool.acquire()
+        pool.release(first)
+        first.db.alive = False
+        second = pool.acquire()
+        assert second is not first and first.closed
+        assert pool.stats()["size"] == 1
+
+def test_acquire_times_out_at_max_size():
+    with SessionPool(FakeConnection, max_size=1) as pool:
+        pool.acquire()
+        with pytest.raises(SessionPoolError):
+            pool.acquire(timeout=0.05)
+
+def test_waiting_acquire_gets_the_released_session():
+    with SessionPool(FakeConnection, max_size=1) as pool:
+        first = pool.acquire()
+        threading.Timer(0.05, pool.release, args=(first,)).start()
+        assert pool.acquire(timeout=5) is first
+
+def test_idle_sessions_over_min_size_expire():
+    with SessionPool(FakeConnection, min_size=1, max_size=3, idle_timeout=0) as pool:
+        sessions = [pool.acquire() for _ in range(3)]
+        for session in sessions:
+            pool.release(session)
+        time.sleep(0.01)
+        pool.release(pool.acquire())
+        assert pool.stats()["size"] == 1
+        assert sum(session.closed for session in sessions) == 2
+
+def test_session_is_discarded_when_it_died_in_the_block():
+    with SessionPool(FakeConnection, max_size=1) as pool:
+        with pytest.raises(RuntimeError):
+            with pool.session() as connection:
+                connection.db.alive = False
+                raise RuntimeError("query failed")
+        assert connection.closed and pool.stats()["size"] == 0
+
+def test_closed_pool_closes_idle_sessions_and_refuses_checkouts():
+    pool = SessionPool(FakeConnection, min_size=1)
+    idle = pool.acquire()
+    pool.release(idle)
+    pool.close()
+    assert idle.closed
+    with pytest.raises(SessionPoolError):
+        pool.acquire()
+
+def test_acquire_many_takes_idle_and_new_sessions():
+    with SessionPool(FakeConnection, max_size=3) as pool:
+        idle = pool.acquire()
+        pool.release(idle)
+        sessions = pool.acquire_many(3)
+        assert idle in sessions and len(set(sessions)) == 3
+        assert pool.stats() == {"size": 3, "idle": 0, "busy": 3, "max_size": 3}
+
+def test_acquire_many_takes_nothing_when_it_times_out():
+    with SessionPool(FakeConnection, max_size=3) as pool:
+        held = pool.acquire()
+        with pytest.raises(SessionPoolError):
+            pool.acquire_many(3, timeout=0.05)
+        assert pool.stats()["busy"] == 1
+        pool.release(held)
+        assert len(pool.acquire_many(3, timeout=1)) == 3
+
+def test_acquire_many_replaces_dead_idle_sessions():
+    with SessionPool(FakeConnection, max_size=2) as pool:
+        first, second = pool.acquire_many(2)
+        pool.release_many([first, second])
+        first.db.alive = False
+        sessions = pool.acquire_many(2)
+        assert first.closed and first not in sessions and second in sessions
+        assert pool.stats()["size"] == 2
+
+def test_concurrent_acquire_many_do_not_share_the_pool():
+    # Taking sessions one by one, each thread could hold two and wait forever for a third
+    with SessionPool(FakeConnection, max_size=4) as pool:
+        done = []
+        def lane():
+            for _ in range(20):
+                sessions = pool.acquire_many(3, timeout=5)
+                time.sleep(0.001)
+                pool.release_many(sessions)
+            done.append(True)
+        threads = [threading.Thread(target=lane) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        assert done == [True, True]
+        assert pool.stats()["busy"] == 0